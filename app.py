@@ -2,524 +2,148 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
+import click
 import babel
+import babel.dates
+import hashlib
 import logging
-import datetime
+import os
+import subprocess
 
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, timezone
+from functools import lru_cache
+from flask import Flask
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from flask_migrate import Migrate
-
-from forms import *
-# from models import Venue, Show, Artist
-
-#----------------------------------------------------------------------------#
-# App Config.
-#----------------------------------------------------------------------------#
-
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-
-
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    
-    image_link = db.Column(db.String(500))
-    website = db.Column(db.String(120))
-    facebook_link = db.Column(db.String(120))
-    
-    genres = db.Column(db.ARRAY(db.String))
-    seeking_talent = db.Column(db.Boolean, default=False)
-    seeking_description = db.Column(db.String)
-
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow())
-
-    show = db.relationship("Show", backref="venue", lazy=True)
-
-    def __repr__(self):
-      return f"<Venue {self.name} {self.seeking_talent}>"
-
-    @property
-    def area(self):
-      return {
-        "city": self.city,
-        "state": self.state
-      }
-
-    @property
-    def serialize(self):
-      return {
-        "id": self.id,
-        "name": self.name, 
-      }
-
-    @property
-    def complete(self):
-      upcoming_shows = db.session.query(Show).filter(Show.venue_id == self.id, Show.start_time > datetime.utcnow())
-      past_shows = db.session.query(Show).filter(Show.venue_id == self.id, Show.start_time < datetime.utcnow())
-      
-      return {
-        "id": self.id,
-        "name": self.name,
-        "genres": self.genres,
-        "city": self.city,
-        "state": self.state,
-        "address": self.address,
-        "phone": self.phone,
-        "website": self.website,
-        "facebook_link": self.facebook_link,
-        "seeking_talent": self.seeking_talent,
-        "seeking_description": self.seeking_description,
-        "image_link": self.image_link,
-        "upcoming_shows": [{ 
-          "artist_id": show.artist_id, 
-          "artist_name": show.artist.name,
-          "artist_image_link": show.artist.image_link,
-          "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-        } for show in upcoming_shows.all()],
-        "upcoming_shows_count": upcoming_shows.count(),
-        "past_shows": [{ 
-          "artist_id": show.artist_id, 
-          "artist_name": show.artist.name,
-          "artist_image_link": show.artist.image_link,
-          "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-        } for show in past_shows.all()],
-        "past_shows_count": past_shows.count()
-      }
-
-    @property
-    def search(self):
-      upcoming_shows = db.session.query(Show).filter(Show.venue_id == self.id, Show.start_time > datetime.utcnow())
-      return {
-        "id": self.id,
-        "name": self.name,
-        "num_of_upcoming_shows": upcoming_shows.count()
-      }
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String(120)))
-    image_link = db.Column(db.String(500))
-    website = db.Column(db.String(120))
-    facebook_link = db.Column(db.String(120))
-    
-    seeking_venue = db.Column(db.Boolean, nullable=True, default=False)
-    seeking_description = db.Column(db.String(120), nullable=True)
-
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow())
-    
-    show = db.relationship("Show", backref="artist", lazy=True)
-
-
-    @property
-    def complete(self):
-      upcoming_shows = db.session.query(Show).filter(Show.artist_id == self.id, Show.start_time > datetime.utcnow())
-      past_shows = db.session.query(Show).filter(Show.artist_id == self.id, Show.start_time < datetime.utcnow())
-
-      return {
-        "id": self.id,
-        "name": self.name,
-        "city": self.city,
-        "state": self.state,
-        "phone": self.phone,
-        "website": self.website,
-        "image_link": self.image_link,
-        "facebook_link": self.facebook_link,
-        "seeking_venue": self.seeking_venue,
-        "seeking_description": self.seeking_description,
-        "upcoming_shows": [{ 
-          "venue_id": show.venue_id,
-          "venue_name": show.venue.name,
-          "venue_image_link": show.venue.image_link,
-          "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-        } for show in upcoming_shows.all()],
-        "upcoming_shows_count": upcoming_shows.count(),
-        "past_shows": [{ 
-          "venue_id": show.venue_id,
-          "venue_name": show.venue.name,
-          "venue_image_link": show.venue.image_link,
-          "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-        } for show in past_shows.all()],
-        "past_shows_count": past_shows.count()
-      }
-
-    @property
-    def search(self):
-      upcoming_shows = db.session.query(Show).filter(Show.venue_id == self.id, Show.start_time > datetime.utcnow())
-      return {
-        "id": self.id,
-        "name": self.name,
-        "num_of_upcoming_shows": upcoming_shows.count()
-      }
-
-class Show(db.Model):
-    __tablename__ = 'Show'
-
-    id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow())
-
-    def __repr__(self):
-        return f"<Show {self.start_time}>"
 
+from assets import MANIFEST
+from config import get_config
+from commands import register_commands
+from extensions import (
+  compression, fragment_cache, image_proxy, jobs, moment, query_diagnostics, request_metrics,
+  response_cache, static_assets
+)
+from metrics import request_log
+from models import db
+from startup import enable_bytecode_cache
+from views import register_blueprints
+import tasks  # noqa: F401, registers the job handlers
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format,  locale='en')
-
-app.jinja_env.filters['datetime'] = format_datetime
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # compiled once per format and locale instead of on every call
+  format = DATETIME_FORMATS.get(format, format)
+  if format in ('long', 'short'):
+    # named Babel formats depend on the locale and are resolved by Babel
+    return None, babel.Locale.parse(locale)
+  return babel.dates.parse_pattern(format), babel.Locale.parse(locale)
+
+@lru_cache(maxsize=8192)
+def _format_datetime(value, format, locale):
+  pattern, locale = datetime_pattern(format, locale)
+  if pattern is None:
+    return babel.dates.format_datetime(value, format, locale=locale)
+  if value.tzinfo is None:
+    # naive datetimes are UTC, as babel.dates.format_datetime assumes
+    value = value.replace(tzinfo=timezone.utc)
+  return pattern.apply(value, locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # show tiles repeat the same few start times, so formatted strings are
+  # memoized; strings are still accepted and parsed
+  if not isinstance(value, datetime):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  return _format_datetime(value, format, locale)
 
 #----------------------------------------------------------------------------#
-# Controllers.
+# App Config.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
-def index():
-  return render_template('pages/home.html')
-
-#  ----------------------------------------------------------------
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-  areas = [v.area for v in Venue.query.distinct(Venue.city, Venue.state).all()]
-  for area in areas:
-    area["venues"] = [
-      v.serialize for v in Venue.query.filter_by(
-        city = area["city"], 
-        state = area["state"]
-      ).all()
-    ]
-  return render_template('pages/venues.html', areas=areas, raw=str(areas))
-
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-  term = request.form.get("search_term", " ")
-  query = Venue.query.filter(Venue.name.ilike(f"%{term}%")).all()
-  response = {
-    "count": len(query),
-    "data": [
-      venue.search for venue in query
-    ]
-  }
-  
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-  # shows the venue page with the given venue_id
-  venue = Venue.query.get(venue_id).complete
-  return render_template('pages/show_venue.html', venue=venue)
-
-#  ----------------------------------------------------------------
-#  Create Venue
-#  ----------------------------------------------------------------
-
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-  form = VenueForm()
-  return render_template('forms/new_venue.html', form=form)
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-  form = VenueForm(request.form)
-
-  try:
-      new_venue = Venue(
-        name=request.form["name"],
-        city=request.form["city"],
-        state=request.form["state"],
-        address=request.form["address"],
-        phone=request.form["phone"],
-        genres=request.form.getlist("genres"),
-        facebook_link=request.form["facebook_link"],
-        seeking_talent=form["seeking_talent"].data,
-        seeking_description=request.form["seeking_description"]
-      )
-
-      db.session.add(new_venue)
-      db.session.commit()
-      # on successful db insert, flash success
-      flash('Venue ' + request.form['name'] + ' was successfully listed!')
-  except:
-      flash('An error occurred. Venue ' +
-            request.form['name'] + " could not be listed")
-      db.session.rollback()
-  finally:
-      db.session.close()
-  return render_template('pages/home.html')
-
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-  try:
-      venue = Venue.query.get(venue_id)
-      db.session.delete(venue)
-      db.session.commit()
-      flash('Venue was successfully deleted!')
-      jsonify({ "error": None, "data": "ok" })
-  except:
-      flash("An error occurred. Venue could not be deleted")
-      db.session.rollback()
-      jsonify({ "error": 400, "data": None })
-  finally:
-      db.session.close()
-  return render_template('pages/home.html')
-
-#  ----------------------------------------------------------------
-#  Artists
-#  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-  artists = Artist.query.all()
-  return render_template('pages/artists.html', artists=artists)
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-  term = request.form.get("search_term", " ")
-  query = Artist.query.filter(Artist.name.ilike(f"%{term}%")).all()
-  response = {
-    "count": len(query),
-    "data": [
-      artist.search for artist in query
-    ]
-  }
-  
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  artist = Artist.query.get(artist_id).complete
-  return render_template("pages/show_artist.html", artist=artist)
-
-#  ----------------------------------------------------------------
-#  Update
-#  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-  form = ArtistForm()
-  artist = Artist.query.get(artist_id).first().complete
-  return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-  form = ArtistForm(request.form)
+# Nothing is created on import: every call builds a new app, so tests can
+# have one each and a preforking server can build it once before forking
+# (see gunicorn.conf.py). Models are in models.py, the extensions shared by
+# views, jobs and commands in extensions.py, and the controllers in the
+# blueprints of views/.
+
+def create_app(config=None):
+  """Builds the app with the settings of `config`, a profile name or a
+  settings object; FYYUR_ENV picks the profile by default."""
+  app = Flask(__name__)
+  if config is None or isinstance(config, str):
+    config = get_config(config)
+  app.config.from_object(config)
+  if not app.config.get("ETAG_SALT"):
+    app.config["ETAG_SALT"] = build_id(app)
+
+  moment.init_app(app)
+  db.init_app(app)
+  response_cache.init_app(app)
+  fragment_cache.init_app(app)
+  request_metrics.init_app(app)
+  query_diagnostics.init_app(app)
+  image_proxy.init_app(app)
+  static_assets.init_app(app)
+  compression.init_app(app)
+  jobs.init_app(app)
+  enable_bytecode_cache(app)
+
+  # alembic takes longer to import than the rest of the app and only the
+  # `flask db` commands need it, so web workers skip it
+  if click.get_current_context(silent=True) is not None:
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+  app.jinja_env.filters['datetime'] = format_datetime
+  register_blueprints(app)
+  register_commands(app)
+  configure_logging(app)
+  return app
+
+def build_id(app):
+  # the deployed code: the git revision of a checkout, else the assets
+  # manifest, which names the hash of every bundle
   try:
-      artist = Artist.query.filter_by(id = artist_id).first()
-
-      artist.name = form.name.data
-      artist.city = form.city.data
-      artist.state = form.state.data
-      artist.phone = form.phone.data
-      artist.genres = form.genres.data
-      artist.facebook_link = form.facebook_link.data
-      artist.seeking_venue = form.seeking_venue.data
-      artist.seeking_description = form.seeking_description.data
-
-      artist.updated_at = datetime.utcnow()
-
-      db.session.commit()
-      # on successful db insert, flash success
-      flash('Artist ' + request.form['name'] + ' was succesfully edited!')
-  except:
-      flash('An error occurred. Artist ' +
-            request.form['name'] + "could not be listed")
-      db.session.rollback()
-  finally:
-      db.session.close()
-  
-  return redirect(url_for('show_artist', artist_id=artist_id))
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-  form = VenueForm()
-  venue = Venue.query.get(venue_id).first().complete
-  return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-  form = VenueForm(request.form)
+    return subprocess.run(
+      ["git", "rev-parse", "HEAD"], cwd=app.root_path, capture_output=True, text=True, check=True, timeout=5
+    ).stdout.strip()
+  except (OSError, subprocess.SubprocessError):
+    pass
   try:
-      venue = Venue.query.get(venue_id).first()
-
-      venue.name = form.name.data
-      venue.city = form.city.data
-      venue.state = form.state.data
-      venue.address = form.address.data
-      venue.phone = form.phone.data
-      venue.genres = form.genres.data
-      venue.facebook_link = form.facebook_link.data
-      venue.seeking_talent = form.seeking_talent.data
-      venue.seeking_description = form.seeking_description.data
-
-      venue.updated_at = datetime.utcnow()
-
-      db.session.commit()
-      # on successful db insert, flash success
-      flash('Venue ' + request.form['name'] + ' was succesfully edited!')
-  except:
-      flash('An error occurred. Venue ' +
-            request.form['name'] + "could not be listed")
-      db.session.rollback()
-  finally:
-      db.session.close()
-  
-  return redirect(url_for('show_venue', venue_id=venue_id))
-
-@app.route('/artists/<artist_id>', methods=['DELETE'])
-def delete_artist(artist_id):
-  try:
-      artist = artist.query.get(artist_id)
-      db.session.delete(artist)
-      db.session.commit()
-      flash('artist was successfully deleted!')
-  except:
-      flash("An error occurred. artist could not be deleted")
-      db.session.rollback()
-  finally:
-      db.session.close()
-  return render_template('pages/home.html')
-
-#  ----------------------------------------------------------------
-#  Create Artist
-#  ----------------------------------------------------------------
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-  form = ArtistForm()
-  return render_template('forms/new_artist.html', form=form)
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-  # called upon submitting the new artist listing form
-  form = ArtistForm(request.form)
-  try:
-      new_artist = Artist(
-        name=request.form["name"],
-        city=request.form["city"],
-        state=request.form["state"],
-        phone=request.form["phone"],
-        genres=request.form.getlist("genres"),
-        facebook_link=request.form["facebook_link"],
-        
-        seeking_venue=form["seeking_venue"].data,
-        seeking_description=request.form["seeking_description"]
+    with open(os.path.join(app.static_folder, "dist", MANIFEST), "rb") as file:
+      return hashlib.sha1(file.read()).hexdigest()
+  except OSError:
+    return ""
+
+def configure_logging(app):
+  # app.logger is named after the import name, so every app of the process
+  # shares it and only the first one gives it a file handler
+  if (not app.debug and app.config.get("ERROR_LOG")
+      and not any(isinstance(handler, FileHandler) for handler in app.logger.handlers)):
+      file_handler = FileHandler(app.config["ERROR_LOG"])
+      file_handler.setFormatter(
+          Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
       )
-
-      db.session.add(new_artist)
-      db.session.commit()
-      # on successful db insert, flash success
-      flash('Artist ' + request.form['name'] + ' was successfully listed!')
-  except:
-      flash('An error occurred. Venue ' +
-            request.form['name'] + "could not be listed")
-      db.session.rollback()
-  finally:
-      db.session.close()
-
-  return render_template('pages/home.html')
-
-#  ----------------------------------------------------------------
-#  Shows
-#  ----------------------------------------------------------------
-
-@app.route('/shows')
-def shows():  
-  shows = [{
-    "venue_id": show.venue_id,
-    "artist_id": show.artist_id,
-    "artist_name": Artist.query.filter_by(id=show.artist_id).one().name,
-    "venue_name": Venue.query.filter_by(id=show.venue_id).one().name,
-    "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-  } for show in Show.query.order_by(Show.start_time.desc()).all()]
-  return render_template('pages/shows.html', shows=shows)
-
-@app.route('/shows/create')
-def create_shows():
-  # renders form. do not touch.
-  form = ShowForm()
-  return render_template('forms/new_show.html', form=form)
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-  # called to create new shows in the db, upon submitting new show listing form
-  form = ShowForm(request.form)
-  try:
-      new_show = Show(
-        artist_id=request.form["artist_id"],
-        venue_id=request.form["venue_id"],
-        start_time=request.form["start_time"]
-      )
-
-      db.session.add(new_show)
-      db.session.commit()
-      # on successful db insert, flash success
-      flash('Show was successfully listed!')
-  except:
-      flash('An error occurred. Venue ' +
-            request.form['name'] + "could not be listed")
-      db.session.rollback()
-  finally:
-      db.session.close()
-  return render_template('pages/home.html')
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+      app.logger.setLevel(logging.INFO)
+      file_handler.setLevel(logging.INFO)
+      app.logger.addHandler(file_handler)
+      app.logger.info('errors')
+
+  if app.config.get("REQUEST_LOG") and not request_log.handlers:
+      # one JSON object per request, see metrics.py; the logger is shared
+      # by every app of the process
+      request_handler = FileHandler(app.config["REQUEST_LOG"])
+      request_handler.setFormatter(Formatter('%(message)s'))
+      request_log.setLevel(logging.INFO)
+      request_log.addHandler(request_handler)
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -527,11 +151,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,258 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import abort, current_app, request, send_from_directory, url_for
+
+from conditional import IMMUTABLE
+from diagnostics import query_budget
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# `flask assets build` concatenates the stylesheets and scripts of
+# layouts/main.html into one bundle each. It minifies them, names each
+# bundle after a hash of its content, and writes gzip and brotli copies next
+# to it in static/dist. manifest.json maps bundle names to the files built.
+#
+# Templates ask asset_urls("app.css") for the URLs to load. After a build
+# that is the one fingerprinted file, served from /assets with a year long,
+# immutable Cache-Control and precompressed when the client accepts it. A
+# changed file gets a new name, so nothing has to be invalidated. Without a
+# build, as in development, the source files are linked one by one.
+#
+# rcssmin and rjsmin minify better where installed, and brotli output needs
+# the brotli package. Without them the CSS is minified by the conservative
+# minify_css below, and scripts, mostly minified libraries already, are only
+# concatenated.
+
+log = logging.getLogger("fyyur.assets")
+
+# bundle name -> source files under static/, in load order
+BUNDLES = {
+  "app.css": [
+    "css/bootstrap.min.css",
+    "css/layout.main.css",
+    "css/main.css",
+    "css/main.responsive.css",
+    "css/main.quickfix.css",
+  ],
+  # modernizr is not bundled: it has to run in <head> before the page
+  # renders, and the bundle is deferred
+  "app.js": [
+    "js/libs/moment.min.js",
+    "js/libs/jquery-1.11.1.min.js",
+    "js/libs/bootstrap-3.1.1.min.js",
+    "js/plugins.js",
+    "js/script.js",
+  ],
+}
+
+MANIFEST = "manifest.json"
+
+# preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_css_strings_or_comments = re.compile(r'''("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')|(/\*.*?\*/)''', re.S)
+_css_strings = re.compile(r'''("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')''')
+_css_spaces = re.compile(r"\s+")
+_css_punctuation = re.compile(r"\s*([{};,>])\s*")
+_css_urls = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_source_maps = re.compile(r"^\s*(?://|/\*)[#@] sourceMappingURL=.*$", re.M)
+
+
+def minify_css(text):
+  """Drops comments (but /*! licences) and whitespace that has no meaning."""
+  def drop_comment(match):
+    string, comment = match.groups()
+    if string:
+      return string
+    return comment if comment.startswith("/*!") else ""
+  text = _css_strings_or_comments.sub(drop_comment, text)
+  # the odd parts are string literals, left as they are
+  parts = _css_strings.split(text)
+  for i in range(0, len(parts), 2):
+    part = _css_spaces.sub(" ", parts[i])
+    parts[i] = _css_punctuation.sub(r"\1", part).replace(";}", "}")
+  return "".join(parts).strip()
+
+
+def rebase_css_urls(text, source, static_url="/static"):
+  """Rewrites the relative url()s of a stylesheet at `source`, a path under
+  static/, into absolute URLs under `static_url`.
+
+  Bundles are served from /assets, not from next to their sources, so a
+  relative url() would resolve against the wrong directory.
+  """
+  def rebase(match):
+    quote, url = match.groups()
+    if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+      return match.group(0)
+    path, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+    return f"url({quote}{static_url.rstrip('/')}/{resolved}{suffix}{quote})"
+  return _css_urls.sub(rebase, text)
+
+
+def _minifier(kind):
+  try:
+    if kind == "css":
+      from rcssmin import cssmin
+      return cssmin
+    from rjsmin import jsmin
+    return jsmin
+  except ImportError:
+    return minify_css if kind == "css" else None
+
+
+def bundle(static_folder, name, sources, static_url="/static"):
+  """Returns the content of bundle `name`, its sources concatenated."""
+  kind = name.rsplit(".", 1)[-1]
+  minify = _minifier(kind)
+  parts = []
+  for source in sources:
+    with open(os.path.join(static_folder, source), encoding="utf-8") as file:
+      text = _source_maps.sub("", file.read())
+    if kind == "css":
+      text = rebase_css_urls(text, source, static_url)
+    if minify is not None:
+      text = minify(text)
+    parts.append(text.strip())
+  # a script missing its final semicolon must not run into the next one
+  return (";\n" if kind == "js" else "\n").join(parts) + "\n"
+
+
+def compress(path, data):
+  """Writes the gzip and, when available, brotli copies of a built file."""
+  with open(path + ".gz", "wb") as file:
+    # mtime 0 makes builds reproducible
+    with gzip.GzipFile(fileobj=file, mode="wb", compresslevel=9, mtime=0) as compressed:
+      compressed.write(data)
+  try:
+    import brotli
+  except ImportError:
+    return
+  with open(path + ".br", "wb") as file:
+    file.write(brotli.compress(data, quality=11))
+
+
+def read_manifest(output):
+  try:
+    with open(os.path.join(output, MANIFEST)) as file:
+      return json.load(file)
+  except (OSError, ValueError):
+    return {}
+
+
+def build(static_folder, bundles=BUNDLES, static_url="/static"):
+  """Builds every bundle into static/dist and writes the manifest.
+
+  `static_url` is where static/ is served, for the url()s of stylesheets.
+  Files of the previous build are kept, so pages rendered just before a
+  deploy still load; older ones are removed.
+  """
+  output = os.path.join(static_folder, "dist")
+  os.makedirs(output, exist_ok=True)
+  previous = read_manifest(output)
+  manifest = {}
+  for name, sources in bundles.items():
+    data = bundle(static_folder, name, sources, static_url).encode("utf-8")
+    stem, extension = name.rsplit(".", 1)
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}.{extension}"
+    path = os.path.join(output, filename)
+    if not os.path.exists(path):
+      with open(path, "wb") as file:
+        file.write(data)
+      compress(path, data)
+    manifest[name] = filename
+
+  with open(os.path.join(output, MANIFEST), "w") as file:
+    json.dump(manifest, file, indent=2, sort_keys=True)
+  keep = set(manifest.values()) | set(previous.values())
+  for filename in os.listdir(output):
+    base = re.sub(r"\.(gz|br)$", "", filename)
+    if filename != MANIFEST and base not in keep:
+      os.remove(os.path.join(output, filename))
+  return manifest
+
+
+class AssetsState:
+  """The build output of one app and the manifest last read from it."""
+
+  def __init__(self, output):
+    self.output = output
+    self.manifest = None
+    self.manifest_mtime = None
+
+
+class Assets:
+  """Flask extension linking and serving the built bundles. Each app bound
+  with init_app() keeps its AssetsState in app.extensions."""
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.extensions["assets"] = AssetsState(os.path.join(app.static_folder, "dist"))
+    app.add_template_global(self.urls, "asset_urls")
+
+    @query_budget(0)
+    def asset(filename):
+      # the bundles of `flask assets build`, rendered as asset_urls(name)
+      return self.response(filename)
+
+    app.add_url_rule("/assets/<path:filename>", "asset", asset)
+
+  @property
+  def output(self):
+    return current_app.extensions["assets"].output
+
+  def build(self):
+    manifest = build(current_app.static_folder, static_url=current_app.static_url_path)
+    current_app.extensions["assets"].manifest = None
+    return manifest
+
+  @property
+  def manifest(self):
+    # read once; in debug again whenever a build rewrote it
+    state = current_app.extensions["assets"]
+    if state.manifest is None or current_app.debug:
+      try:
+        mtime = os.stat(os.path.join(state.output, MANIFEST)).st_mtime
+      except OSError:
+        mtime = None
+      if state.manifest is None or mtime != state.manifest_mtime:
+        state.manifest = read_manifest(state.output)
+        state.manifest_mtime = mtime
+    return state.manifest
+
+  def urls(self, name):
+    """The URLs a page loads for bundle `name`, for templates as asset_urls()."""
+    filename = self.manifest.get(name) if current_app.config.get("ASSETS_BUNDLED", True) else None
+    if filename is None:
+      return [url_for("static", filename=source) for source in BUNDLES[name]]
+    return [url_for("asset", filename=filename)]
+
+  def response(self, filename):
+    """Serves a built file, precompressed when the client accepts it."""
+    if filename == MANIFEST or filename.endswith((".gz", ".br")):
+      abort(404)
+    output = self.output
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+      if request.accept_encodings[encoding] and os.path.exists(os.path.join(output, filename + suffix)):
+        response = send_from_directory(output, filename + suffix, mimetype=mimetype)
+        response.headers["Content-Encoding"] = encoding
+        break
+    else:
+      response = send_from_directory(output, filename, mimetype=mimetype)
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.vary.add("Accept-Encoding")
+    return response
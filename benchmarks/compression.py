@@ -0,0 +1,116 @@
+"""Bytes on the wire and CPU cost of compressing the rendered pages.
+
+Renders one request of every read route through the test client (see
+routes.py; run `flask seed` first) and compresses each body with gzip and,
+when installed, brotli at a few levels, printing the compressed size and the
+CPU time per response of each. The `min` column applies the HTML_MINIFY
+whitespace rule to the page first. The last table times whole requests
+through the middleware, identity against the configured encoding.
+
+  $ python benchmarks/compression.py --repeat 20
+  $ python benchmarks/compression.py --routes shows,venues --exports
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from compression import minify_html, negotiate  # noqa: E402
+from routes import Client, routes  # noqa: E402
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+
+def codecs():
+  """{name: compress(data)}, fastest first per algorithm."""
+  table = {f"gzip-{level}": (lambda data, level=level: gzip.compress(data, level, mtime=0)) for level in (1, 6, 9)}
+  if brotli is not None:
+    table.update({f"br-{quality}": (lambda data, quality=quality: brotli.compress(data, quality=quality))
+                  for quality in (1, 4, 11)})
+  return table
+
+
+def cpu_ms(fn, data, repeat):
+  started = time.process_time()
+  for _ in range(repeat):
+    fn(data)
+  return (time.process_time() - started) / repeat * 1000
+
+
+def request_ms(client, path, encoding, repeat):
+  app_client = client.app.test_client()
+  samples = []
+  for _ in range(repeat):
+    started = time.perf_counter()
+    response = app_client.get(path, headers={"Accept-Encoding": encoding}, buffered=True)
+    response.get_data()
+    samples.append((time.perf_counter() - started) * 1000)
+  return statistics.median(samples), response.headers.get("Content-Encoding", "identity"), len(response.get_data())
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--repeat", type=int, default=10, help="compressions timed per body")
+  parser.add_argument("--exports", action="store_true", help="include the streamed exports")
+  parser.add_argument("--routes", help="comma separated route names to run, all by default")
+  args = parser.parse_args()
+
+  client = Client(cache=False)
+  table = routes(client, args.exports)
+  if args.routes:
+    wanted = set(args.routes.split(","))
+    table = {name: variants for name, variants in table.items() if name in wanted}
+  compressors = codecs()
+
+  bodies = {}
+  for name, variants in sorted(table.items()):
+    method, path, data = variants[0]
+    status, _, body = client.request(method, path, data)
+    if status == 200:
+      bodies[name] = (path, body)
+
+  print(f"bytes per response, and CPU ms per response in brackets ({args.repeat} runs)\n")
+  header = f"{'route':<22}{'raw':>9}{'min':>9}" + "".join(f"{name:>18}" for name in compressors)
+  print(header)
+  totals = {name: [0, 0.0] for name in ["raw", "min"] + list(compressors)}
+  for name, (path, body) in bodies.items():
+    minified = body
+    if body.lstrip()[:9].lower() == b"<!doctype":
+      minified = minify_html(body.decode("utf-8")).encode("utf-8")
+    totals["raw"][0] += len(body)
+    totals["min"][0] += len(minified)
+    line = f"{name:<22}{len(body):>9}{len(minified):>9}"
+    for codec, compress in compressors.items():
+      size = len(compress(body))
+      cost = cpu_ms(compress, body, args.repeat)
+      totals[codec][0] += size
+      totals[codec][1] += cost
+      line += f"{size:>10} ({cost:>5.2f})"
+    print(line)
+  line = f"{'total':<22}{totals['raw'][0]:>9}{totals['min'][0]:>9}"
+  for codec in compressors:
+    size, cost = totals[codec]
+    line += f"{size:>10} ({cost:>5.2f})"
+  print(line)
+
+  encoding = negotiate("gzip, br", brotli is not None)
+  print(f"\nmedian request ms, identity against {encoding} through the middleware\n")
+  print(f"{'route':<22}{'identity':>10}{encoding:>10}{'bytes':>16}")
+  for name, (path, _) in bodies.items():
+    if table[name][0][0] != "GET":
+      continue
+    plain, _, plain_size = request_ms(client, path, "identity", args.repeat)
+    compressed, used, size = request_ms(client, path, "gzip, br", args.repeat)
+    sizes = f"{plain_size}->{size}" if used != "identity" else str(plain_size)
+    print(f"{name:<22}{plain:>10.2f}{compressed:>10.2f}{sizes:>16}")
+
+
+if __name__ == "__main__":
+  main()
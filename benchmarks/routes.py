@@ -0,0 +1,296 @@
+"""Latency, throughput and SQL statement counts of every read route.
+
+Drives the pages and the JSON API either in process through the Flask test
+client, or with --url over HTTP against a running server from --concurrency
+threads, and records p50/p95/p99 latency, throughput and statements per
+request (read from the Server-Timing header) for each route. Write routes
+are left out so that runs do not change the dataset; the streamed exports
+are included with --exports.
+
+Results are written as a JSON baseline that a later run can be compared
+with; the comparison exits with status 1 when a route got slower than
+--tolerance or runs more statements.
+
+  $ flask seed --venues 10000 --artists 100000 --shows 5000000
+  $ python benchmarks/routes.py --requests 200 --output baseline.json
+  $ git checkout my-branch
+  $ python benchmarks/routes.py --requests 200 --compare baseline.json
+
+  $ gunicorn -w 4 wsgi:app &
+  $ python benchmarks/routes.py --url http://localhost:8000 --concurrency 16 \\
+      --requests 500 --output baseline-http.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SEARCH_TERMS = ("blue", "the", "fox", "velvet lounge", "raven", "x")
+
+_statements = re.compile(r'desc="(\d+) statements"')
+_shows_cursor = re.compile(r'href="/shows\?cursor=([^"&]+)"')
+_artists_next = re.compile(r'data-next="([^"]+)"')
+
+
+class Client:
+  """The app in process, through the Flask test client."""
+
+  def __init__(self, cache):
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from config import get_config
+
+    config = get_config()
+    if not cache:
+      config.CACHE_TYPE = "null"
+    self.app = create_app(config)
+    self.local = threading.local()
+
+  def request(self, method, path, data=None):
+    client = getattr(self.local, "client", None)
+    if client is None:
+      client = self.local.client = self.app.test_client()
+    response = client.open(path, method=method, data=data)
+    body = response.get_data()
+    return response.status_code, response.headers.get("Server-Timing", ""), body
+
+
+class HTTPClient:
+  """A running server, over HTTP."""
+
+  def __init__(self, url):
+    self.url = url.rstrip("/")
+
+  def request(self, method, path, data=None):
+    body = urllib.parse.urlencode(data).encode() if data else None
+    request = urllib.request.Request(self.url + path, data=body, method=method)
+    try:
+      with urllib.request.urlopen(request) as response:
+        return response.status, response.headers.get("Server-Timing", ""), response.read()
+    except urllib.error.HTTPError as error:
+      return error.code, error.headers.get("Server-Timing", ""), error.read()
+
+
+def sample_ids(client, resource, count):
+  status, _, body = client.request("GET", f"/api/v1/{resource}?fields=id&limit=500")
+  if status != 200:
+    raise SystemExit(f"/api/v1/{resource} answered {status}")
+  ids = [item["id"] for item in json.loads(body)["data"]]
+  if not ids:
+    raise SystemExit(f"no {resource} to benchmark, run `flask seed` first")
+  return random.sample(ids, min(count, len(ids)))
+
+
+def routes(client, exports):
+  """Returns {name: [(method, path, data), ...]}, every request of a route."""
+  venue_ids = sample_ids(client, "venues", 50)
+  artist_ids = sample_ids(client, "artists", 50)
+
+  _, _, body = client.request("GET", "/shows")
+  shows_cursor = _shows_cursor.search(body.decode())
+  _, _, body = client.request("GET", "/artists")
+  artists_next = _artists_next.search(body.decode())
+
+  def get(*paths):
+    return [("GET", path, None) for path in paths]
+
+  table = {
+    "index": get("/"),
+    "venues": get("/venues"),
+    "venue": get(*(f"/venues/{id}" for id in venue_ids)),
+    "venue_edit": get(*(f"/venues/{id}/edit" for id in venue_ids)),
+    "venue_search": [("POST", "/venues/search", {"search_term": term}) for term in SEARCH_TERMS],
+    "artists": get("/artists"),
+    "artists_filtered": get("/artists?state=CA", "/artists?genre=Jazz", "/artists?seeking_venue=y&state=NY"),
+    "artist": get(*(f"/artists/{id}" for id in artist_ids)),
+    "artist_edit": get(*(f"/artists/{id}/edit" for id in artist_ids)),
+    "artist_search": [("POST", "/artists/search", {"search_term": term}) for term in SEARCH_TERMS],
+    "shows": get("/shows"),
+    "venue_create_form": get("/venues/create"),
+    "artist_create_form": get("/artists/create"),
+    "show_create_form": get("/shows/create"),
+    "api_venues": get("/api/v1/venues", "/api/v1/venues?fields=id,name&limit=500"),
+    "api_venue": get(*(f"/api/v1/venues/{id}" for id in venue_ids)),
+    "api_artists": get("/api/v1/artists", "/api/v1/artists?fields=id,name&limit=500"),
+    "api_artist": get(*(f"/api/v1/artists/{id}" for id in artist_ids)),
+    "api_shows": get("/api/v1/shows"),
+  }
+  if shows_cursor:
+    table["shows_older"] = get("/shows?cursor=" + shows_cursor.group(1))
+  if artists_next:
+    table["artists_page"] = get(artists_next.group(1).replace("&amp;", "&"))
+  if exports:
+    table.update({
+      f"export_{resource}_{format}": get(f"/export/{resource}?format={format}")
+      for resource in ("venues", "artists", "shows") for format in ("ndjson", "csv")
+    })
+  return table
+
+
+def percentile(values, q):
+  ordered = sorted(values)
+  index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+  return ordered[index]
+
+
+def summarize(samples, wall):
+  latencies = [sample["ms"] for sample in samples]
+  statements = [sample["statements"] for sample in samples if sample["statements"] is not None]
+  return {
+    "requests": len(samples),
+    "errors": sum(1 for sample in samples if sample["status"] >= 400),
+    "p50_ms": round(percentile(latencies, 50), 3),
+    "p95_ms": round(percentile(latencies, 95), 3),
+    "p99_ms": round(percentile(latencies, 99), 3),
+    "mean_ms": round(statistics.mean(latencies), 3),
+    "throughput_rps": round(len(samples) / wall, 1) if wall else None,
+    "statements": max(statements) if statements else None,
+  }
+
+
+def run(client, table, requests, warmup, concurrency):
+  # every route gets `requests` requests, cycling through its variants, and
+  # all of them are shuffled so that routes share the server evenly
+  jobs = []
+  for name, variants in table.items():
+    for i in range(warmup + requests):
+      jobs.append((name, i < warmup, variants[i % len(variants)]))
+  warm = [job for job in jobs if job[1]]
+  measured = [job for job in jobs if not job[1]]
+  random.shuffle(measured)
+
+  samples = {name: [] for name in table}
+  busy = {name: 0.0 for name in table}
+  lock = threading.Lock()
+
+  def perform(job):
+    name, is_warmup, (method, path, data) = job
+    started = time.perf_counter()
+    status, timing, _ = client.request(method, path, data)
+    elapsed = time.perf_counter() - started
+    if is_warmup:
+      return
+    match = _statements.search(timing)
+    with lock:
+      samples[name].append({
+        "ms": elapsed * 1000,
+        "status": status,
+        "statements": int(match.group(1)) if match else None,
+      })
+      busy[name] += elapsed
+
+  for job in warm:
+    perform(job)
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    list(pool.map(perform, measured))
+  wall = time.perf_counter() - started
+
+  # a route's throughput is what one worker sustains on it alone
+  results = {name: summarize(samples[name], busy[name]) for name in table}
+  return results, round(len(measured) / wall, 1)
+
+
+def git_commit():
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def compare(baseline, current, tolerance):
+  """Prints route by route changes; returns the names of regressed routes."""
+  regressed = []
+  print(f"{'route':<24}{'p50 ms':>18}{'p95 ms':>18}{'statements':>14}")
+  for name, now in sorted(current["routes"].items()):
+    before = baseline["routes"].get(name)
+    if before is None:
+      print(f"{name:<24}{'new':>18}")
+      continue
+
+    def change(key):
+      if not before[key]:
+        return f"{now[key]:>8.2f}"
+      return f"{now[key]:>8.2f} {100 * (now[key] - before[key]) / before[key]:+6.1f}%"
+
+    slower = before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + tolerance)
+    more_statements = (now["statements"] or 0) > (before["statements"] or 0)
+    flag = "  <-- regressed" if slower or more_statements else ""
+    if flag:
+      regressed.append(name)
+    print(f"{name:<24}{change('p50_ms'):>18}{change('p95_ms'):>18}"
+          f"{before['statements']!s:>7} -> {now['statements']!s:<4}{flag}")
+  print(f"throughput {baseline['throughput_rps']} -> {current['throughput_rps']} requests/s")
+  return regressed
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--url", help="benchmark a running server instead of the app in process")
+  parser.add_argument("--requests", type=int, default=100, help="measured requests per route")
+  parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per route")
+  parser.add_argument("--concurrency", type=int, default=1)
+  parser.add_argument("--cache", action="store_true", help="keep the response cache on (in process only)")
+  parser.add_argument("--exports", action="store_true", help="include the streamed exports")
+  parser.add_argument("--routes", help="comma separated route names to run, all by default")
+  parser.add_argument("--seed", type=int, default=0, help="random seed of the sampled ids")
+  parser.add_argument("--output", help="write the results to this JSON file")
+  parser.add_argument("--compare", help="compare with this JSON baseline")
+  parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown, 0.2 = 20%%")
+  args = parser.parse_args()
+
+  random.seed(args.seed)
+  client = HTTPClient(args.url) if args.url else Client(cache=args.cache)
+  table = routes(client, args.exports)
+  if args.routes:
+    wanted = set(args.routes.split(","))
+    table = {name: variants for name, variants in table.items() if name in wanted}
+
+  results, throughput = run(client, table, args.requests, args.warmup, args.concurrency)
+  current = {
+    "meta": {
+      "commit": git_commit(),
+      "date": datetime.utcnow().isoformat(timespec="seconds"),
+      "target": args.url or "test client",
+      "requests": args.requests,
+      "concurrency": args.concurrency,
+      "cache": None if args.url else args.cache,
+    },
+    "throughput_rps": throughput,
+    "routes": results,
+  }
+
+  print(f"{'route':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'statements':>12}{'errors':>8}")
+  for name, result in sorted(results.items()):
+    print(f"{name:<24}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+          f"{result['throughput_rps'] or 0:>10.1f}{result['statements']!s:>12}{result['errors']:>8}")
+  print(f"throughput {throughput} requests/s with concurrency {args.concurrency}")
+
+  if args.output:
+    with open(args.output, "w") as output:
+      json.dump(current, output, indent=2, sort_keys=True)
+  if args.compare:
+    with open(args.compare) as baseline:
+      regressed = compare(json.load(baseline), current, args.tolerance)
+    if regressed:
+      print("regressed: " + ", ".join(regressed))
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
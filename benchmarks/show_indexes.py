@@ -0,0 +1,195 @@
+"""Measures the Show and Venue indexes added in migration 12d2abb8af44.
+
+Seeds a synthetic dataset (optional), then runs the hot queries of the detail
+pages, /shows and /venues without the indexes and with them, printing the
+EXPLAIN plan and the median wall time of each.
+
+Run it against a scratch PostgreSQL database migrated to head; it drops and
+recreates the indexes it measures:
+
+  $ flask db upgrade
+  $ python benchmarks/show_indexes.py --database-url postgresql://localhost/fyyur_bench \
+      --seed --venues 2000 --artists 20000 --shows 2000000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+INDEXES = {
+  "ix_show_venue_id_start_time": 'CREATE INDEX ix_show_venue_id_start_time ON "Show" (venue_id, start_time)',
+  "ix_show_artist_id_start_time": 'CREATE INDEX ix_show_artist_id_start_time ON "Show" (artist_id, start_time)',
+  "ix_show_start_time_id": 'CREATE INDEX ix_show_start_time_id ON "Show" (start_time DESC, id DESC)',
+  "ix_venue_state_city": 'CREATE INDEX ix_venue_state_city ON "Venue" (state, city)',
+}
+
+QUERIES = {
+  "venue_detail": """
+    SELECT v.*, s.start_time, a.id, a.name, a.image_link
+    FROM "Venue" v
+    LEFT JOIN "Show" s ON s.venue_id = v.id
+    LEFT JOIN "Artist" a ON s.artist_id = a.id
+    WHERE v.id = :venue_id
+    ORDER BY s.start_time, s.id
+  """,
+  "artist_detail": """
+    SELECT a.*, s.start_time, v.id, v.name, v.image_link
+    FROM "Artist" a
+    LEFT JOIN "Show" s ON s.artist_id = a.id
+    LEFT JOIN "Venue" v ON s.venue_id = v.id
+    WHERE a.id = :artist_id
+    ORDER BY s.start_time, s.id
+  """,
+  "shows_first_page": """
+    SELECT s.id, s.start_time, s.venue_id, v.name, s.artist_id, a.name, a.image_link
+    FROM "Show" s
+    JOIN "Venue" v ON s.venue_id = v.id
+    JOIN "Artist" a ON s.artist_id = a.id
+    ORDER BY s.start_time DESC, s.id DESC
+    LIMIT 51
+  """,
+  "shows_deep_page": """
+    SELECT s.id, s.start_time, s.venue_id, v.name, s.artist_id, a.name, a.image_link
+    FROM "Show" s
+    JOIN "Venue" v ON s.venue_id = v.id
+    JOIN "Artist" a ON s.artist_id = a.id
+    WHERE (s.start_time, s.id) < (:cursor_time, :cursor_id)
+    ORDER BY s.start_time DESC, s.id DESC
+    LIMIT 51
+  """,
+  "venue_directory": """
+    SELECT v.id, v.name, v.city, v.state, count(s.id)
+    FROM "Venue" v
+    LEFT JOIN "Show" s ON s.venue_id = v.id AND s.start_time > now()
+    GROUP BY v.id
+    ORDER BY v.state, v.city, v.name, v.id
+  """,
+}
+
+SEED = [
+  """
+  INSERT INTO "Venue" (name, city, state, address, genres, seeking_talent, created_at, updated_at)
+  SELECT 'Venue ' || i, 'City ' || (i % :cities), 'S' || (i % 50), i || ' Main St',
+         ARRAY['Jazz', 'Rock'], i % 3 = 0, now(), now()
+  FROM generate_series(1, :venues) AS i
+  """,
+  """
+  INSERT INTO "Artist" (name, city, state, genres, seeking_venue, created_at, updated_at)
+  SELECT 'Artist ' || i, 'City ' || (i % :cities), 'S' || (i % 50),
+         ARRAY['Folk'], i % 2 = 0, now(), now()
+  FROM generate_series(1, :artists) AS i
+  """,
+  """
+  INSERT INTO "Show" (venue_id, artist_id, start_time)
+  SELECT v.min + (random() * (v.max - v.min))::int,
+         a.min + (random() * (a.max - a.min))::int,
+         now() + (random() * 730 - 365) * interval '1 day'
+  FROM generate_series(1, :shows) AS i,
+       (SELECT min(id), max(id) FROM "Venue") AS v,
+       (SELECT min(id), max(id) FROM "Artist") AS a
+  """,
+]
+
+
+def seed(conn, args):
+  params = {
+    "venues": args.venues,
+    "artists": args.artists,
+    "shows": args.shows,
+    "cities": max(args.venues // 10, 1),
+  }
+  for statement in SEED:
+    started = time.perf_counter()
+    conn.execute(text(statement), params)
+    print(f"seeded in {time.perf_counter() - started:.1f}s: {statement.split()[2]}")
+
+
+def sample_params(conn):
+  # the busiest venue and artist, and a cursor half way down /shows
+  venue_id = conn.execute(text(
+    'SELECT venue_id FROM "Show" GROUP BY venue_id ORDER BY count(*) DESC LIMIT 1')).scalar()
+  artist_id = conn.execute(text(
+    'SELECT artist_id FROM "Show" GROUP BY artist_id ORDER BY count(*) DESC LIMIT 1')).scalar()
+  cursor = conn.execute(text(
+    'SELECT start_time, id FROM "Show" ORDER BY start_time DESC, id DESC '
+    'OFFSET (SELECT count(*) / 2 FROM "Show") LIMIT 1')).first()
+  return {
+    "venue_id": venue_id,
+    "artist_id": artist_id,
+    "cursor_time": cursor.start_time if cursor else None,
+    "cursor_id": cursor.id if cursor else None,
+  }
+
+
+def measure(conn, params, repeat):
+  results = {}
+  for name, sql in QUERIES.items():
+    plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params).scalars().all()
+    timings = []
+    for _ in range(repeat):
+      started = time.perf_counter()
+      conn.execute(text(sql), params).fetchall()
+      timings.append((time.perf_counter() - started) * 1000)
+    results[name] = {"median_ms": statistics.median(timings), "plan": plan}
+  return results
+
+
+def set_indexes(conn, present):
+  for name, ddl in INDEXES.items():
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if present:
+      conn.execute(text(ddl))
+  conn.execute(text('ANALYZE "Show"'))
+  conn.execute(text('ANALYZE "Venue"'))
+
+
+def report(before, after, verbose):
+  print(f"\n{'query':<20}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+  for name in QUERIES:
+    b, a = before[name]["median_ms"], after[name]["median_ms"]
+    print(f"{name:<20}{b:>12.2f}{a:>12.2f}{b / a if a else float('inf'):>9.1f}x")
+  if verbose:
+    for label, results in (("before", before), ("after", after)):
+      for name in QUERIES:
+        print(f"\n-- {name} ({label})")
+        print("\n".join(results[name]["plan"]))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+  parser.add_argument("--seed", action="store_true", help="insert synthetic rows first")
+  parser.add_argument("--venues", type=int, default=2000)
+  parser.add_argument("--artists", type=int, default=20000)
+  parser.add_argument("--shows", type=int, default=1000000)
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--json", help="also write the results to this file")
+  parser.add_argument("--quiet", action="store_true", help="omit the EXPLAIN plans")
+  args = parser.parse_args()
+  if not args.database_url:
+    parser.error("--database-url or DATABASE_URL is required")
+
+  engine = create_engine(args.database_url)
+  with engine.begin() as conn:
+    if args.seed:
+      seed(conn, args)
+  with engine.begin() as conn:
+    params = sample_params(conn)
+    set_indexes(conn, present=False)
+  with engine.begin() as conn:
+    before = measure(conn, params, args.repeat)
+    set_indexes(conn, present=True)
+  with engine.begin() as conn:
+    after = measure(conn, params, args.repeat)
+
+  report(before, after, verbose=not args.quiet)
+  if args.json:
+    with open(args.json, "w") as f:
+      json.dump({"params": params, "before": before, "after": after}, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+  main()
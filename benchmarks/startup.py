@@ -0,0 +1,102 @@
+"""Cold start: time to import the app and to answer a new worker's first requests.
+
+Starts a fresh interpreter per run, as a new worker would, and times
+importing and building the app, then the first and a second request of a few pages through the
+test client (run `flask seed` first). Runs alternate between an empty
+template bytecode cache, where the first render compiles its templates, and
+the cache those runs filled. Medians of --runs runs are printed.
+
+--imports adds the modules slowest to import, from `python -X importtime`,
+counting each package with everything it imports.
+
+  $ python benchmarks/startup.py --runs 10
+  $ python benchmarks/startup.py --paths /,/venues,/shows --imports 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# runs in the fresh interpreter; prints one JSON object
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+timings = {"import": (time.perf_counter() - started) * 1000}
+client = app.test_client()
+for path in sys.argv[1:]:
+  for request in ("first", "second"):
+    started = time.perf_counter()
+    response = client.get(path, buffered=True)
+    response.get_data()
+    timings[f"{path} {request}"] = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+      raise SystemExit(f"{path} answered {response.status_code}")
+print(json.dumps(timings))
+"""
+
+
+def probe(paths, cache_dir):
+  environ = dict(os.environ, JINJA_BYTECODE_CACHE="true", JINJA_BYTECODE_CACHE_DIR=cache_dir)
+  output = subprocess.run(
+    [sys.executable, "-c", PROBE] + paths, cwd=ROOT, env=environ,
+    check=True, capture_output=True, text=True).stdout
+  return json.loads(output.strip().splitlines()[-1])
+
+
+def _local(name):
+  return os.path.exists(os.path.join(ROOT, name + ".py")) or os.path.isdir(os.path.join(ROOT, name))
+
+
+def slowest_imports(count):
+  """[(cumulative ms, module)] of the top level packages imported by app."""
+  stderr = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", "import wsgi"], cwd=ROOT,
+    check=True, capture_output=True, text=True).stderr
+  packages = {}
+  for line in stderr.splitlines():
+    if not line.startswith("import time:") or "cumulative" in line:
+      continue
+    _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+    # a package's line comes after those of its submodules and includes
+    # them; the app's own modules would only repeat their dependencies
+    if "." not in name and not _local(name):
+      packages[name] = int(cumulative) / 1000
+  return sorted(((ms, name) for name, ms in packages.items()), reverse=True)[:count]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--runs", type=int, default=5, help="interpreters started per cache state")
+  parser.add_argument("--paths", default="/,/venues,/artists,/shows", help="comma separated pages requested")
+  parser.add_argument("--imports", type=int, default=0, help="list the N slowest imports")
+  args = parser.parse_args()
+  paths = args.paths.split(",")
+
+  results = {"cold": [], "warm": []}
+  for _ in range(args.runs):
+    with tempfile.TemporaryDirectory() as cache_dir:
+      results["cold"].append(probe(paths, cache_dir))
+      results["warm"].append(probe(paths, cache_dir))
+
+  print(f"median ms of {args.runs} fresh interpreters, empty and filled template bytecode cache\n")
+  print(f"{'step':<28}{'cold':>10}{'warm':>10}")
+  for step in results["cold"][0]:
+    cold = statistics.median(run[step] for run in results["cold"])
+    warm = statistics.median(run[step] for run in results["warm"])
+    print(f"{step:<28}{cold:>10.1f}{warm:>10.1f}")
+
+  if args.imports:
+    print("\nslowest imports, cumulative ms\n")
+    for ms, name in slowest_imports(args.imports):
+      print(f"{name:<28}{ms:>10.1f}")
+
+
+if __name__ == "__main__":
+  main()
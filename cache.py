@@ -0,0 +1,378 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, g, make_response, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#----------------------------------------------------------------------------#
+
+# Backends store str or bytes values under string keys and share one small
+# interface: get, set, delete, delete_prefix and clear.
+
+
+def _size(value):
+  return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+class LRUCache:
+  """In-process cache bounded by total value size, with per-entry TTL.
+
+  Every worker process holds its own copy, so invalidations only reach the
+  process that performed the write; other workers serve stale entries for at
+  most their TTL.
+  """
+
+  def __init__(self, max_bytes=64 * 1024 * 1024, default_ttl=60):
+    self.max_bytes = max_bytes
+    self.default_ttl = default_ttl
+    self.bytes = 0
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._entries)
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires, size = entry
+      if expires is not None and expires <= time.monotonic():
+        self._remove(key)
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    size = _size(value)
+    if size > self.max_bytes:
+      return False
+    ttl = self.default_ttl if ttl is None else ttl
+    expires = time.monotonic() + ttl if ttl else None
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+      self._entries[key] = (value, expires, size)
+      self.bytes += size
+      while self.bytes > self.max_bytes:
+        self._remove(next(iter(self._entries)))
+    return True
+
+  def delete(self, *keys):
+    with self._lock:
+      for key in keys:
+        if key in self._entries:
+          self._remove(key)
+
+  def delete_prefix(self, prefix):
+    with self._lock:
+      for key in [key for key in self._entries if key.startswith(prefix)]:
+        self._remove(key)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.bytes = 0
+
+  def _remove(self, key):
+    _, _, size = self._entries.pop(key)
+    self.bytes -= size
+
+
+_GLOB_SPECIAL = re.compile(r"([\\*?\[\]])")
+
+
+class RedisCache:
+  """Cache shared by every worker, kept in Redis.
+
+  `client` is anything exposing the redis-py get, set(ex=), delete and
+  scan_iter methods, which lets tests hand in a local stand-in.
+  """
+
+  def __init__(self, client, prefix="fyyur:", default_ttl=60):
+    self.client = client
+    self.prefix = prefix
+    self.default_ttl = default_ttl
+
+  @classmethod
+  def from_url(cls, url, **kwargs):
+    try:
+      import redis
+    except ImportError:
+      raise RuntimeError("CACHE_TYPE 'redis' requires the redis package, pip install redis")
+    return cls(redis.Redis.from_url(url), **kwargs)
+
+  def get(self, key):
+    return self.client.get(self.prefix + key)
+
+  def set(self, key, value, ttl=None):
+    ttl = self.default_ttl if ttl is None else ttl
+    self.client.set(self.prefix + key, value, ex=ttl or None)
+    return True
+
+  def delete(self, *keys):
+    if keys:
+      self.client.delete(*(self.prefix + key for key in keys))
+
+  def delete_prefix(self, prefix):
+    # MATCH is a glob: the "?" ending page prefixes must not match any
+    # character, or dropping venue:1's pages would drop venue:10's
+    pattern = _GLOB_SPECIAL.sub(r"\\\1", self.prefix + prefix) + "*"
+    keys = list(self.client.scan_iter(match=pattern))
+    if keys:
+      self.client.delete(*keys)
+
+  def clear(self):
+    self.delete_prefix("")
+
+
+class NullCache:
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value, ttl=None):
+    return False
+
+  def delete(self, *keys):
+    pass
+
+  def delete_prefix(self, prefix):
+    pass
+
+  def clear(self):
+    pass
+
+
+def create_backend(config, name="CACHE", key_prefix="fyyur:"):
+  """Builds the backend named by CACHE_TYPE: lru, redis or null. Other caches
+  pass their own `name` to read FRAGMENT_CACHE_TYPE and so on."""
+  kind = config.get(f"{name}_TYPE", "lru")
+  ttl = config.get(f"{name}_DEFAULT_TTL", 60)
+  if kind == "lru":
+    return LRUCache(max_bytes=config.get(f"{name}_MAX_BYTES", 64 * 1024 * 1024), default_ttl=ttl)
+  if kind == "redis":
+    url = config.get(f"{name}_REDIS_URL") or config["CACHE_REDIS_URL"]
+    return RedisCache.from_url(url, prefix=key_prefix, default_ttl=ttl)
+  if kind == "null":
+    return NullCache()
+  raise ValueError(f"unknown {name}_TYPE {kind!r}")
+
+
+class CacheState:
+  """The backend and counts of one cache for one app."""
+
+  def __init__(self, backend):
+    self.backend = backend
+    self.counts = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+    self.lock = threading.Lock()
+
+
+class CountingCache:
+  """Base of the caches below, which count hits, misses, stores and
+  invalidations for /cache/stats.
+
+  Every app bound with init_app() gets its own backend and counts, kept in
+  app.extensions under `extension`, and the methods act on those of the
+  current app. A backend handed to the constructor is shared by all apps.
+  """
+
+  extension = None
+
+  def __init__(self, backend=None):
+    self._backend = backend
+
+  def create_backend(self, config):
+    raise NotImplementedError
+
+  def init_app(self, app):
+    app.extensions[self.extension] = CacheState(self._backend or self.create_backend(app.config))
+
+  @property
+  def _state(self):
+    return current_app.extensions[self.extension]
+
+  @property
+  def backend(self):
+    return self._state.backend
+
+  def _count(self, name, n=1):
+    state = self._state
+    with state.lock:
+      state.counts[name] += n
+
+  def stats(self):
+    state = self._state
+    with state.lock:
+      stats = dict(state.counts)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    stats["backend"] = type(state.backend).__name__
+    if isinstance(state.backend, LRUCache):
+      stats["entries"] = len(state.backend)
+      stats["bytes"] = state.backend.bytes
+    return stats
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+
+class ResponseCache(CountingCache):
+  """Caches the rendered body of read-only pages.
+
+  Pages are cached under a key naming the route and entity, e.g. "venues" or
+  "venue:3"; query strings are appended so every page of a listing gets its
+  own entry. Write handlers call invalidate() with the keys they affect.
+
+  Behind conditional() each entry also holds the ETag of the state it was
+  rendered from. A page whose fingerprint has moved on is a miss, so the body
+  sent never lags the ETag sent with it, even when an invalidation did not
+  reach this worker.
+  """
+
+  extension = "response_cache"
+
+  def __init__(self, app=None, backend=None):
+    super().__init__(backend)
+    if app is not None:
+      self.init_app(app)
+
+  def create_backend(self, config):
+    return create_backend(config)
+
+  def cached(self, key, ttl=None):
+    """Decorator caching a view under `key`, a format string filled from the
+    view arguments, e.g. "venue:{venue_id}"."""
+    def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+        # pending flash messages are rendered into the page, which then must
+        # neither be served from nor stored in the cache
+        if request.method != "GET" or "_flashes" in session:
+          return view(*args, **kwargs)
+
+        cache_key = key.format(**kwargs)
+        if request.query_string:
+          cache_key += "?" + request.query_string.decode("utf-8", "replace")
+        etag = g.get("etag", "").encode("ascii")
+        entry = self.backend.get(cache_key)
+        if entry is not None:
+          stored_etag, _, body = entry.partition(b"\n")
+          if stored_etag == etag:
+            self._count("hits")
+            return Response(body, mimetype="text/html")
+
+        self._count("misses")
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough and "_flashes" not in session:
+          if self.backend.set(cache_key, etag + b"\n" + response.get_data(), ttl):
+            self._count("stores")
+        return response
+      return wrapper
+    return decorator
+
+  def clear(self):
+    """Drops every cached page, for writes touching too many to list."""
+    self.backend.clear()
+    self._count("invalidations")
+
+  def invalidate(self, *keys):
+    """Drops the pages cached under `keys`, with every query string variant."""
+    for key in keys:
+      self.backend.delete(key)
+      self.backend.delete_prefix(key + "?")
+    self._count("invalidations", len(keys))
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+
+class FragmentCache(CountingCache):
+  """Caches rendered parts of templates, see FragmentCacheExtension.
+
+  Keys name what a fragment shows, including the updated_at of its entities,
+  so an edit makes new keys and the old entries age out. A key must change
+  with everything its fragment shows: invalidate() only reaches the lru
+  backend of the worker that calls it, and write handlers use it to drop the
+  fragments of a deleted venue or artist early, not to keep pages correct.
+  """
+
+  extension = "fragment_cache"
+
+  def __init__(self, app=None, backend=None):
+    super().__init__(backend)
+    if app is not None:
+      self.init_app(app)
+
+  def create_backend(self, config):
+    return create_backend(config, "FRAGMENT_CACHE", key_prefix="fyyur-fragment:")
+
+  def init_app(self, app):
+    super().init_app(app)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = self
+
+  def render(self, key, ttl, render):
+    value = self.backend.get(key)
+    if value is not None:
+      self._count("hits")
+      return value.decode("utf-8") if isinstance(value, bytes) else value
+    self._count("misses")
+    value = render()
+    if self.backend.set(key, str(value), ttl):
+      self._count("stores")
+    return value
+
+  def invalidate(self, *prefixes):
+    """Drops every fragment whose key starts with one of `prefixes`."""
+    for prefix in prefixes:
+      self.backend.delete_prefix(prefix)
+    self._count("invalidations", len(prefixes))
+
+
+def fragment_key(key):
+  # ["venue", 3, "show", 12] -> "venue:3:show:12"
+  if isinstance(key, (list, tuple)):
+    return ":".join(str(part) for part in key)
+  return str(key)
+
+
+class FragmentCacheExtension(Extension):
+  """{% cache key[, ttl] %}...{% endcache %} renders its body once per key.
+
+  `key` is a string or a list of parts joined with ":"; `ttl` defaults to
+  FRAGMENT_CACHE_DEFAULT_TTL. Without a FragmentCache on the environment the
+  body is rendered every time.
+  """
+
+  tags = {"cache"}
+
+  def __init__(self, environment):
+    super().__init__(environment)
+    environment.extend(fragment_cache=None)
+
+  def parse(self, parser):
+    lineno = next(parser.stream).lineno
+    args = [parser.parse_expression()]
+    if parser.stream.skip_if("comma"):
+      args.append(parser.parse_expression())
+    else:
+      args.append(nodes.Const(None))
+    body = parser.parse_statements(["name:endcache"], drop_needle=True)
+    return nodes.CallBlock(self.call_method("_render", args), [], [], body).set_lineno(lineno)
+
+  def _render(self, key, ttl, caller):
+    cache = self.environment.fragment_cache
+    if cache is None:
+      return caller()
+    return Markup(cache.render(fragment_key(key), ttl, caller))
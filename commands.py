@@ -0,0 +1,198 @@
+import io
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from assets import ENCODINGS
+from extensions import jobs, response_cache, search_service, static_assets
+from models import Artist, Job, Show, Venue, db, recount_shows, rollover_shows
+from startup import warm_up
+from streaming import FORMATS
+from views.transfer import EXPORT_MODELS, IMPORTERS, export_rows, import_format, parse_since, run_import
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+# `flask <command>`; register_commands() adds them to the app's CLI.
+
+def register_commands(app):
+  for command in (
+    jobs_command, export_command, import_command, seed_command,
+    rollover_shows_command, assets_command, warmup_command
+  ):
+    app.cli.add_command(command)
+
+#----------------------------------------------------------------------------#
+# Jobs.
+#----------------------------------------------------------------------------#
+
+@click.group("jobs", cls=AppGroup)
+def jobs_command():
+  """Inspects and runs the background job queue."""
+
+@jobs_command.command("work")
+@click.option("--once", is_flag=True, help="Exit when no job is due instead of polling.")
+def jobs_work_command(once):
+  """Runs queued jobs, for a worker outside the web processes."""
+  interval = current_app.config.get("JOBS_POLL_SECONDS", 5)
+  while True:
+    ran = jobs.work()
+    if ran:
+      click.echo(f"{ran} jobs run")
+    if once:
+      return
+    time.sleep(interval)
+
+@jobs_command.command("status")
+def jobs_status_command():
+  """Counts jobs per status and lists the latest failures."""
+  for status, count in sorted(jobs.counts().items()):
+    click.echo(f"{status}: {count}")
+  for job in Job.query.filter_by(status="failed").order_by(Job.id.desc()).limit(10):
+    click.echo(f"#{job.id} {job.name} {job.payload} after {job.attempts} attempts: {job.last_error}")
+
+@jobs_command.command("purge")
+@click.option("--days", default=7, show_default=True, help="Keep finished jobs this many days.")
+def jobs_purge_command(days):
+  """Deletes finished jobs."""
+  deleted = Job.query.filter(
+    Job.status.in_(["done", "failed"]),
+    Job.finished_at < datetime.utcnow() - timedelta(days=days)
+  ).delete(synchronize_session=False)
+  db.session.commit()
+  click.echo(f"{deleted} jobs deleted")
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+@click.command("export")
+@with_appcontext
+@click.argument("table", type=click.Choice(sorted(EXPORT_MODELS)))
+@click.option("--format", "format", type=click.Choice(sorted(FORMATS)), default="ndjson")
+@click.option("--updated-since", help="Only rows updated since this ISO date or datetime.")
+@click.option("--output", "-o", type=click.File("w"), default="-", help="Defaults to stdout.")
+def export_command(table, format, updated_since, output):
+  """Streams TABLE (venues, artists or shows) as NDJSON or CSV."""
+  try:
+    columns, rows = export_rows(table, parse_since(updated_since))
+  except ValueError as error:
+    raise click.UsageError(str(error))
+  lines, _ = FORMATS[format]
+  for line in lines(columns, rows):
+    output.write(line)
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+@click.command("import")
+@with_appcontext
+@click.argument("table", type=click.Choice(sorted(IMPORTERS)))
+@click.argument("source", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--format", "format", type=click.Choice(["csv", "ndjson"]), help="Defaults to the file extension.")
+def import_command(table, source, format):
+  """Loads TABLE (venues, artists or shows) from a CSV or NDJSON file."""
+  format = format or import_format(source)
+  if format is None:
+    raise click.UsageError("can not tell the format from the file name, pass --format")
+  if source == "-":
+    report = run_import(table, io.TextIOWrapper(click.get_binary_stream("stdin"), encoding="utf-8", newline=""), format)
+  else:
+    with open(source, encoding="utf-8", newline="") as stream:
+      report = run_import(table, stream, format)
+
+  click.echo(f"{report.inserted} of {report.rows} rows imported, {report.failed} rejected")
+  for error in report.errors:
+    click.echo(f"line {error['line']}: {json.dumps(error['errors'])}", err=True)
+  if report.failed:
+    raise SystemExit(1)
+
+#----------------------------------------------------------------------------#
+# Seeding.
+#----------------------------------------------------------------------------#
+
+@click.command("seed")
+@with_appcontext
+@click.option("--venues", default=100, show_default=True)
+@click.option("--artists", default=1000, show_default=True)
+@click.option("--shows", default=10000, show_default=True)
+@click.option("--batch-size", default=10000, show_default=True, help="Rows inserted per transaction.")
+@click.option("--seed", type=int, help="Random seed, for a reproducible dataset.")
+def seed_command(venues, artists, shows, batch_size, seed):
+  """Adds synthetic venues, artists and shows to the database."""
+  from seeding import artist_rows, chunked, show_rows, venue_rows
+  rng = random.Random(seed)
+
+  def insert(model, rows, total):
+    inserted = 0
+    for chunk in chunked(rows, batch_size):
+      db.session.execute(model.__table__.insert(), chunk)
+      db.session.commit()
+      inserted += len(chunk)
+      click.echo(f"{model.__tablename__}: {inserted}/{total}\r", nl=False)
+    click.echo()
+
+  insert(Venue, venue_rows(venues, rng), venues)
+  insert(Artist, artist_rows(artists, rng), artists)
+  if shows:
+    venue_ids = [row.id for row in db.session.query(Venue.id)]
+    artist_ids = [row.id for row in db.session.query(Artist.id)]
+    if not venue_ids or not artist_ids:
+      raise click.UsageError("shows need at least one venue and one artist")
+    insert(Show, show_rows(shows, venue_ids, artist_ids, rng, datetime.utcnow()), shows)
+  recount_shows()
+  search_service.invalidate()
+  response_cache.clear()
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+@click.command("rollover-shows")
+@with_appcontext
+@click.option("--batch-size", default=1000, show_default=True, help="Shows moved per transaction.")
+def rollover_shows_command(batch_size):
+  """Counts shows that have started as past shows; run it every few minutes."""
+  moved = rollover_shows(batch_size=batch_size)
+  if moved:
+    response_cache.invalidate("venues")
+  click.echo(f"{moved} shows moved from upcoming to past")
+
+#----------------------------------------------------------------------------#
+# Deployment.
+#----------------------------------------------------------------------------#
+
+@click.group("assets", cls=AppGroup)
+def assets_command():
+  """Builds the static asset bundles."""
+
+@assets_command.command("build")
+def assets_build_command():
+  """Bundles, minifies and precompresses the stylesheets and scripts."""
+  for name, filename in sorted(static_assets.build().items()):
+    path = os.path.join(static_assets.output, filename)
+    sizes = [f"{os.path.getsize(path)} bytes"] + [
+      f"{os.path.getsize(path + suffix)} {encoding}"
+      for encoding, suffix in ENCODINGS if os.path.exists(path + suffix)
+    ]
+    click.echo(f"{name} -> {filename} ({', '.join(sizes)})")
+
+@click.command("warmup")
+@with_appcontext
+def warmup_command():
+  """Compiles the templates into the bytecode cache and opens the pools."""
+  report = warm_up(current_app._get_current_object(), db)
+  cache = current_app.jinja_env.bytecode_cache
+  click.echo(f"{report['templates']} templates compiled in {report['templates_ms']} ms"
+             + (f" into {cache.directory}" if cache is not None else " (JINJA_BYTECODE_CACHE is off)"))
+  click.echo(f"locale data loaded in {report['locale_ms']} ms")
+  pools = ", ".join(f"{bind} {count}" for bind, count in report["connections"].items())
+  click.echo(f"connections opened in {report['connections_ms']} ms: {pools}")
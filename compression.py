@@ -0,0 +1,249 @@
+import re
+import zlib
+
+from flask import current_app, request
+from jinja2.ext import Extension
+from werkzeug.http import parse_accept_header
+
+#----------------------------------------------------------------------------#
+# Response compression.
+#----------------------------------------------------------------------------#
+
+# A WSGI middleware compressing text responses with brotli or gzip,
+# whichever the client prefers per Accept-Encoding (brotli needs the brotli
+# package). A response is left alone when:
+#
+# * it is smaller than COMPRESSION_MIN_SIZE, where the headers would cost
+#   more than compression saves;
+# * it is not a text type, or already has a Content-Encoding (the
+#   precompressed asset bundles);
+# * it is partial, says Cache-Control: no-transform, or its view is
+#   decorated with @no_compression.
+#
+# Streamed responses (no Content-Length) are compressed as they go and
+# flushed every FLUSH_BYTES of input, so they keep streaming. Strong ETags of compressed
+# responses are made weak, since the bytes on the wire differ from the
+# identity encoding.
+
+COMPRESSIBLE = (
+  "text/", "application/json", "application/javascript", "application/x-ndjson",
+  "application/xml", "image/svg+xml",
+)
+
+ENVIRON_KEY = "fyyur.compress"
+
+FLUSH_BYTES = 16 * 1024
+
+
+def no_compression(view):
+  """Marks a view whose responses are never compressed."""
+  view.compress = False
+  return view
+
+
+def _brotli():
+  try:
+    import brotli
+  except ImportError:
+    return None
+  return brotli
+
+
+class _Gzip:
+
+  def __init__(self, level):
+    self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+  def compress(self, data):
+    return self._compressor.compress(data)
+
+  def flush(self):
+    return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+  def finish(self):
+    return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+
+  def __init__(self, brotli, quality):
+    self._compressor = brotli.Compressor(quality=quality)
+
+  def compress(self, data):
+    return self._compressor.process(data)
+
+  def flush(self):
+    return self._compressor.flush()
+
+  def finish(self):
+    return self._compressor.finish()
+
+
+def negotiate(accept_encoding, brotli_available=True):
+  """The encoding to use for an Accept-Encoding header: br, gzip or None."""
+  accept = parse_accept_header(accept_encoding or "")
+  candidates = (("br", 1), ("gzip", 0)) if brotli_available else (("gzip", 0),)
+  # highest quality wins, ties go to brotli
+  quality, _, encoding = max(
+    (accept.quality(encoding), preference, encoding) for encoding, preference in candidates)
+  return encoding if quality > 0 else None
+
+
+class CompressionMiddleware:
+
+  def __init__(self, wsgi_app, min_size=1024, level=6, brotli_quality=4):
+    self.wsgi_app = wsgi_app
+    self.min_size = min_size
+    self.level = level
+    self.brotli_quality = brotli_quality
+    self.brotli = _brotli()
+
+  def _compressor(self, encoding):
+    if encoding == "br":
+      return _Brotli(self.brotli, self.brotli_quality)
+    return _Gzip(self.level)
+
+  def _should_compress(self, environ, status, headers):
+    if not environ.get(ENVIRON_KEY, True) or environ["REQUEST_METHOD"] == "HEAD":
+      return False
+    code = int(status.split(" ", 1)[0])
+    if code < 200 or code in (204, 206, 304):
+      return False
+    names = {name.lower(): value for name, value in headers}
+    if "content-encoding" in names or "content-range" in names:
+      return False
+    if "no-transform" in names.get("cache-control", "").lower():
+      return False
+    if not names.get("content-type", "").startswith(COMPRESSIBLE):
+      return False
+    length = names.get("content-length")
+    return length is None or int(length) >= self.min_size
+
+  def __call__(self, environ, start_response):
+    encoding = negotiate(environ.get("HTTP_ACCEPT_ENCODING"), self.brotli is not None)
+    if encoding is None:
+      # caches must not serve this identity copy to clients accepting br
+      def varying_start_response(status, headers, exc_info=None):
+        if _is_compressible(headers):
+          headers = _vary(headers)
+        return start_response(status, headers, exc_info)
+
+      return self.wsgi_app(environ, varying_start_response)
+
+    state = {}
+
+    def compressing_start_response(status, headers, exc_info=None):
+      compress = self._should_compress(environ, status, headers)
+      if compress or status.startswith("304"):
+        headers = [(name, _weak(value) if name.lower() == "etag" else value) for name, value in headers]
+      if compress:
+        state["compressor"] = self._compressor(encoding)
+        state["streamed"] = not any(name.lower() == "content-length" for name, _ in headers)
+        headers = [(name, value) for name, value in headers if name.lower() != "content-length"]
+        headers.append(("Content-Encoding", encoding))
+        headers = _vary(headers)
+      elif _is_compressible(headers):
+        headers = _vary(headers)
+      write = start_response(status, headers, exc_info)
+      if not compress:
+        return write
+      return lambda data: write(state["compressor"].compress(data) + state["compressor"].flush())
+
+    body = self.wsgi_app(environ, compressing_start_response)
+    if "compressor" not in state:
+      return body
+    return self._compressed(body, state["compressor"], state["streamed"])
+
+  def _compressed(self, body, compressor, streamed):
+    # streams arrive in small chunks, a row of an export each: flushing each
+    # one would ruin the ratio, so output is flushed every FLUSH_BYTES
+    pending = 0
+    try:
+      for chunk in body:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if streamed and pending >= FLUSH_BYTES:
+          data += compressor.flush()
+          pending = 0
+        if data:
+          yield data
+      yield compressor.finish()
+    finally:
+      if hasattr(body, "close"):
+        body.close()
+
+
+def _weak(etag):
+  return etag if etag.startswith("W/") else "W/" + etag
+
+
+def _is_compressible(headers):
+  return any(name.lower() == "content-type" and value.startswith(COMPRESSIBLE) for name, value in headers)
+
+
+def _vary(headers):
+  for i, (name, value) in enumerate(headers):
+    if name.lower() == "vary":
+      if "accept-encoding" not in value.lower():
+        headers[i] = (name, value + ", Accept-Encoding")
+      return headers
+  return headers + [("Vary", "Accept-Encoding")]
+
+#----------------------------------------------------------------------------#
+# HTML whitespace.
+#----------------------------------------------------------------------------#
+
+# With HTML_MINIFY on, the static text of templates loses its indentation
+# when the templates are compiled, so rendering costs nothing extra. Runs of
+# whitespace holding a line break become one line break, which keeps inline
+# scripts and their // comments intact; other runs become one space.
+# Templates using <pre> or <textarea>, where whitespace shows, are left as
+# they are.
+
+_newline_runs = re.compile(r"\s*\n\s*")
+_space_runs = re.compile(r"[ \t]{2,}")
+_preformatted = re.compile(r"<(pre|textarea)\b", re.I)
+
+
+def minify_html(text):
+  return _space_runs.sub(" ", _newline_runs.sub("\n", text))
+
+
+class HTMLMinifyExtension(Extension):
+
+  def filter_stream(self, stream):
+    if stream.name and not stream.name.endswith(".html"):
+      return stream
+    tokens = list(stream)
+    if any(token.type == "data" and _preformatted.search(token.value) for token in tokens):
+      return tokens
+    return [
+      token.__class__(token.lineno, token.type, minify_html(token.value)) if token.type == "data" else token
+      for token in tokens
+    ]
+
+
+class Compression:
+  """Flask extension installing the middleware and the HTML minifier."""
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.extensions["compression"] = self
+    if app.config.get("HTML_MINIFY", False):
+      app.jinja_env.add_extension(HTMLMinifyExtension)
+    if not app.config.get("COMPRESSION_ENABLED", True):
+      return
+    app.wsgi_app = CompressionMiddleware(
+      app.wsgi_app,
+      min_size=app.config.get("COMPRESSION_MIN_SIZE", 1024),
+      level=app.config.get("COMPRESSION_LEVEL", 6),
+      brotli_quality=app.config.get("COMPRESSION_BROTLI_QUALITY", 4))
+    app.before_request(self._opt_out)
+
+  def _opt_out(self):
+    view = current_app.view_functions.get(request.endpoint)
+    if not getattr(view, "compress", True):
+      request.environ[ENVIRON_KEY] = False
@@ -0,0 +1,74 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import Response, current_app, g, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# A fingerprint function receives the view arguments and returns
+# (state, last_modified): `state` is any repr()-able value that changes
+# whenever the page would render differently, `last_modified` a naive UTC
+# datetime or None. It returns None when the page does not exist, leaving the
+# view to answer 404.
+
+# Cache-Control of responses whose URL changes with their content, such as
+# asset bundles and proxied images: they are never revalidated
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _utc(value):
+  if value is not None and value.tzinfo is not None:
+    value = value.astimezone(timezone.utc).replace(tzinfo=None)
+  return value.replace(microsecond=0) if value is not None else None
+
+
+def make_etag(state):
+  salt = current_app.config.get("ETAG_SALT", "")
+  return hashlib.sha1(f"{salt}:{state!r}".encode("utf-8")).hexdigest()
+
+
+def is_not_modified(etag, last_modified):
+  # If-None-Match takes precedence over If-Modified-Since (RFC 7232, 6) and
+  # compares weakly: compressed responses carry the weak form of the ETag
+  if request.if_none_match:
+    return request.if_none_match.contains_weak(etag)
+  if request.if_modified_since and last_modified is not None:
+    return _utc(last_modified) <= _utc(request.if_modified_since)
+  return False
+
+
+def conditional(fingerprint):
+  """Decorator answering 304 Not Modified before the view runs when the
+  client's copy still matches `fingerprint`."""
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      # pages carrying flash messages are one-offs
+      if request.method not in ("GET", "HEAD") or "_flashes" in session:
+        return view(*args, **kwargs)
+      result = fingerprint(**kwargs)
+      if result is None:
+        return view(*args, **kwargs)
+
+      state, last_modified = result
+      etag = make_etag(state)
+      if is_not_modified(etag, last_modified):
+        response = Response(status=304)
+      else:
+        # the response cache below keeps the ETag with the body it stores and
+        # only serves a body rendered for this same state
+        g.etag = etag
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+      response.set_etag(etag)
+      if last_modified is not None:
+        response.last_modified = _utc(last_modified)
+      # let browsers and the CDN store the page but revalidate every time
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
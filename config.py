@@ -1,12 +1,225 @@
 import os
-SECRET_KEY = os.urandom(32)
+
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+
+def env_int(name, default):
+  value = os.environ.get(name)
+  return int(value) if value not in (None, "") else default
+
+
+def env_bool(name, default):
+  value = os.environ.get(name)
+  if value in (None, ""):
+    return default
+  return value.lower() in ("1", "true", "yes", "on")
+
+
+def database_uri(uri):
+  # SQLAlchemy no longer accepts the postgres:// alias (still handed out by
+  # Heroku), only postgresql://
+  if uri and uri.startswith("postgres://"):
+    return "postgresql://" + uri[len("postgres://"):]
+  return uri
+
+#----------------------------------------------------------------------------#
+# Profiles.
+#----------------------------------------------------------------------------#
+
+# The profile is picked by FYYUR_ENV (development, testing or production).
+# Every setting below can be overridden through the environment variable
+# named next to it.
+
+
+class Config:
+  SECRET_KEY = os.environ.get("SECRET_KEY") or os.urandom(32)
+  DEBUG = False
+  TESTING = False
+
+  # Connect to the database
+  SQLALCHEMY_DATABASE_URI = database_uri(
+    os.environ.get("DATABASE_URL", "postgresql://denistsoi@localhost:5432/fyyur"))
+  # Optional read replica; GET views marked @read_replica are routed to it
+  SQLALCHEMY_REPLICA_URI = database_uri(os.environ.get("DATABASE_REPLICA_URL"))
+  # Seconds a client keeps reading from the primary after one of its writes,
+  # so it never sees replication lag on its own changes
+  REPLICA_STICKY_SECONDS = env_int("REPLICA_STICKY_SECONDS", 5)
+  SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+  # Connections per worker: DB_POOL_SIZE kept open, DB_MAX_OVERFLOW on bursts
+  DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+  DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+  DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)
+  DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+  DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+  # Server side statement timeout in milliseconds, 0 disables it
+  DB_STATEMENT_TIMEOUT = env_int("DB_STATEMENT_TIMEOUT", 0)
+
+  # Number of shows rendered per page of /shows
+  SHOWS_PER_PAGE = env_int("SHOWS_PER_PAGE", 50)
+
+  # Number of artists rendered per page of /artists
+  ARTISTS_PER_PAGE = env_int("ARTISTS_PER_PAGE", 50)
+
+  # Maximum number of results returned by one venue or artist search
+  SEARCH_RESULTS_LIMIT = env_int("SEARCH_RESULTS_LIMIT", 50)
+
+  # Default and maximum page size of the /api/v1 listings
+  API_PAGE_SIZE = env_int("API_PAGE_SIZE", 50)
+  API_MAX_PAGE_SIZE = env_int("API_MAX_PAGE_SIZE", 500)
+
+  # Rows fetched per round trip by the streamed exports
+  EXPORT_BATCH_SIZE = env_int("EXPORT_BATCH_SIZE", 1000)
+
+  # Rows validated and inserted per transaction by the bulk import
+  IMPORT_BATCH_SIZE = env_int("IMPORT_BATCH_SIZE", 1000)
+  # POST /import/<table> needs "Authorization: Bearer IMPORT_TOKEN"; unset,
+  # only `flask import` can import
+  IMPORT_TOKEN = os.environ.get("IMPORT_TOKEN")
+
+  # Per-request timings: Server-Timing headers and /metrics histograms, and
+  # the file that receives one JSON line per request (unset for none)
+  METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+  REQUEST_LOG = os.environ.get("REQUEST_LOG")
+
+  # Warnings and errors of the app outside debug mode (unset for none)
+  ERROR_LOG = os.environ.get("ERROR_LOG", "error.log")
+
+  # Log likely N+1 queries and slow statements with their plan, and check
+  # the @query_budget of views (raising when TESTING)
+  QUERY_DIAGNOSTICS = env_bool("QUERY_DIAGNOSTICS", False)
+  SLOW_QUERY_MS = env_int("SLOW_QUERY_MS", 200)
+  N_PLUS_ONE_THRESHOLD = env_int("N_PLUS_ONE_THRESHOLD", 5)
+
+  # Background jobs of the write handlers: thread (a pool in each process),
+  # inline (run before the response) or off (queued for `flask jobs work`)
+  JOBS_MODE = os.environ.get("JOBS_MODE", "thread")
+  JOBS_WORKERS = env_int("JOBS_WORKERS", 2)
+  JOBS_POLL_SECONDS = env_int("JOBS_POLL_SECONDS", 5)
+  JOBS_LEASE_SECONDS = env_int("JOBS_LEASE_SECONDS", 300)
+  JOBS_MAX_ATTEMPTS = env_int("JOBS_MAX_ATTEMPTS", 5)
+  IMAGE_CHECK_TIMEOUT = env_int("IMAGE_CHECK_TIMEOUT", 5)
+
+  # Image links are shown through /images/<size>, scaled and cached on disk
+  # (in the instance folder unless IMAGE_CACHE_DIR is set). Proxy URLs are
+  # signed with IMAGE_PROXY_KEY, or SECRET_KEY when unset.
+  IMAGE_PROXY = env_bool("IMAGE_PROXY", True)
+  IMAGE_PROXY_KEY = os.environ.get("IMAGE_PROXY_KEY")
+  IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR")
+  IMAGE_CACHE_MAX_BYTES = env_int("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+  IMAGE_FETCH_TIMEOUT = env_int("IMAGE_FETCH_TIMEOUT", 5)
+  IMAGE_MAX_SOURCE_BYTES = env_int("IMAGE_MAX_SOURCE_BYTES", 10 * 1024 * 1024)
+
+  # Mixed into every ETag, so pages a new release renders differently do not
+  # match the ETags browsers and the page cache hold from the old one; unset,
+  # create_app uses the git revision or the hash of the assets manifest
+  ETAG_SALT = os.environ.get("ETAG_SALT")
+
+  # Link the bundles of `flask assets build` when built, else the sources
+  ASSETS_BUNDLED = env_bool("ASSETS_BUNDLED", True)
+
+  # gzip or brotli responses of at least COMPRESSION_MIN_SIZE bytes, and
+  # strip the indentation of templates when HTML_MINIFY is on
+  COMPRESSION_ENABLED = env_bool("COMPRESSION_ENABLED", True)
+  COMPRESSION_MIN_SIZE = env_int("COMPRESSION_MIN_SIZE", 1024)
+  COMPRESSION_LEVEL = env_int("COMPRESSION_LEVEL", 6)
+  COMPRESSION_BROTLI_QUALITY = env_int("COMPRESSION_BROTLI_QUALITY", 4)
+  HTML_MINIFY = env_bool("HTML_MINIFY", False)
+
+  # Compiled templates kept on disk for new workers (instance/jinja unless
+  # JINJA_BYTECODE_CACHE_DIR is set); `flask warmup` fills it
+  JINJA_BYTECODE_CACHE = env_bool("JINJA_BYTECODE_CACHE", True)
+  JINJA_BYTECODE_CACHE_DIR = os.environ.get("JINJA_BYTECODE_CACHE_DIR")
+
+  # Rendered page cache: lru (per worker), redis (shared) or null (disabled)
+  CACHE_TYPE = os.environ.get("CACHE_TYPE", "lru")
+  CACHE_DEFAULT_TTL = env_int("CACHE_DEFAULT_TTL", 60)
+  CACHE_MAX_BYTES = env_int("CACHE_MAX_BYTES", 64 * 1024 * 1024)
+  CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+  # Template fragments of {% cache %} tags, same backends; keys carry the
+  # updated_at of what they show, so entries can live long
+  FRAGMENT_CACHE_TYPE = os.environ.get("FRAGMENT_CACHE_TYPE", "lru")
+  FRAGMENT_CACHE_DEFAULT_TTL = env_int("FRAGMENT_CACHE_DEFAULT_TTL", 3600)
+  FRAGMENT_CACHE_MAX_BYTES = env_int("FRAGMENT_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+  FRAGMENT_CACHE_REDIS_URL = os.environ.get("FRAGMENT_CACHE_REDIS_URL")
+
+  @property
+  def SQLALCHEMY_BINDS(self):
+    if not self.SQLALCHEMY_REPLICA_URI:
+      return None
+    return {"replica": self.SQLALCHEMY_REPLICA_URI}
+
+  @property
+  def SQLALCHEMY_ENGINE_OPTIONS(self):
+    options = {
+      "pool_pre_ping": self.DB_POOL_PRE_PING,
+      "pool_recycle": self.DB_POOL_RECYCLE,
+    }
+    if self.SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+      # SQLite uses a single connection pool that takes no sizing
+      return options
+    options.update({
+      "pool_size": self.DB_POOL_SIZE,
+      "max_overflow": self.DB_MAX_OVERFLOW,
+      "pool_timeout": self.DB_POOL_TIMEOUT,
+    })
+    if self.DB_STATEMENT_TIMEOUT:
+      options["connect_args"] = {
+        "options": f"-c statement_timeout={self.DB_STATEMENT_TIMEOUT}"
+      }
+    return options
+
+
+class DevelopmentConfig(Config):
+  # Enable debug mode.
+  DEBUG = True
+
+
+class TestingConfig(Config):
+  TESTING = True
+  WTF_CSRF_ENABLED = False
+  CACHE_TYPE = os.environ.get("CACHE_TYPE", "null")
+  FRAGMENT_CACHE_TYPE = os.environ.get("FRAGMENT_CACHE_TYPE", "null")
+  QUERY_DIAGNOSTICS = env_bool("QUERY_DIAGNOSTICS", True)
+  JOBS_MODE = os.environ.get("JOBS_MODE", "inline")
+  ERROR_LOG = os.environ.get("ERROR_LOG")
+  SQLALCHEMY_DATABASE_URI = database_uri(
+    os.environ.get("TEST_DATABASE_URL", "postgresql://localhost:5432/fyyur_test"))
+  SQLALCHEMY_REPLICA_URI = database_uri(os.environ.get("TEST_DATABASE_REPLICA_URL"))
+  DB_POOL_SIZE = env_int("DB_POOL_SIZE", 2)
+  DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 0)
+
+
+class ProductionConfig(Config):
+  DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+  DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+  DB_STATEMENT_TIMEOUT = env_int("DB_STATEMENT_TIMEOUT", 5000)
+  HTML_MINIFY = env_bool("HTML_MINIFY", True)
+
+  def __init__(self):
+    # proxied image URLs end up in year long browser caches and in shared
+    # fragment caches, so their signing key must outlive the process
+    if self.IMAGE_PROXY and not (os.environ.get("IMAGE_PROXY_KEY") or os.environ.get("SECRET_KEY")):
+      raise ValueError("the production profile needs IMAGE_PROXY_KEY or SECRET_KEY set, or IMAGE_PROXY off")
+
 
-# Connect to the database
+profiles = {
+  "development": DevelopmentConfig,
+  "testing": TestingConfig,
+  "production": ProductionConfig,
+}
 
 
-SQLALCHEMY_DATABASE_URI = 'postgres://denistsoi@localhost:5432/fyyur'
+def get_config(name=None):
+  """Returns the settings of profile `name`, FYYUR_ENV by default."""
+  name = name or os.environ.get("FYYUR_ENV", "development")
+  try:
+    return profiles[name]()
+  except KeyError:
+    raise ValueError(f"unknown FYYUR_ENV profile {name!r}, expected one of {', '.join(profiles)}")
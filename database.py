@@ -0,0 +1,99 @@
+import os
+import time
+import weakref
+from functools import wraps
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+# Views decorated with @read_replica read from the "replica" bind when
+# SQLALCHEMY_REPLICA_URI is configured. Everything else, and any statement
+# issued while flushing, goes to the primary. A client that just wrote keeps
+# reading from the primary for REPLICA_STICKY_SECONDS so that it sees its own
+# changes despite replication lag.
+
+REPLICA_BIND = "replica"
+
+
+def read_replica(view):
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    if session.get("_primary_until", 0) < time.time():
+      g.use_replica = True
+    return view(*args, **kwargs)
+  return wrapper
+
+
+class RoutingSession(SignallingSession):
+
+  def __init__(self, db, **options):
+    self._db = db
+    SignallingSession.__init__(self, db, **options)
+
+  def _use_replica(self):
+    return (
+      has_request_context()
+      and g.get("use_replica", False)
+      and not g.get("wrote_to_primary", False)
+      and not self._flushing
+      and REPLICA_BIND in (self.app.config.get("SQLALCHEMY_BINDS") or {})
+    )
+
+  def get_bind(self, mapper=None, clause=None, **kwargs):
+    if self._use_replica():
+      return self._db.get_engine(self.app, bind=REPLICA_BIND)
+    return SignallingSession.get_bind(self, mapper, clause)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_write(db_session, flush_context):
+  if has_request_context():
+    g.wrote_to_primary = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def create_engine(self, sa_url, engine_opts):
+    engine = super().create_engine(sa_url, engine_opts)
+    _engines.add(engine)
+    return engine
+
+  def init_app(self, app):
+    super().init_app(app)
+
+    @app.after_request
+    def stick_to_primary(response):
+      if g.get("wrote_to_primary", False):
+        session["_primary_until"] = time.time() + app.config.get("REPLICA_STICKY_SECONDS", 5)
+      return response
+
+#----------------------------------------------------------------------------#
+# Forking.
+#----------------------------------------------------------------------------#
+
+# A server that imports the app before forking its workers (gunicorn
+# --preload) hands each worker a copy of the parent's connection pools. Two
+# processes talking over one socket corrupt each other's sessions, so a
+# forked child forgets the pooled connections it inherited, leaving them
+# open for the parent, and opens its own on first use.
+
+_engines = weakref.WeakSet()
+
+
+def dispose_engines():
+  """Makes the engines of this process open new connections; the inherited
+  ones are dropped without being closed (close=False needs SQLAlchemy 1.4.33)."""
+  for engine in list(_engines):
+    engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+  os.register_at_fork(after_in_child=dispose_engines)
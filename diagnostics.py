@@ -0,0 +1,183 @@
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Query diagnostics.
+#----------------------------------------------------------------------------#
+
+# Opt-in with QUERY_DIAGNOSTICS. While on, every SQL statement is recorded:
+#
+# * statements of the same shape repeated N_PLUS_ONE_THRESHOLD times within
+#   one request are logged as a likely N+1, with the line of app code that
+#   issued the first of them;
+# * statements slower than SLOW_QUERY_MS are logged with their EXPLAIN plan;
+# * views declaring a @query_budget log when they run more statements, and
+#   raise QueryBudgetExceeded when the app is TESTING.
+
+log = logging.getLogger("fyyur.queries")
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_spaces = re.compile(r"\s+")
+_in_lists = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|:\w+)(?:\s*,\s*(?:\?|%\([^)]*\)s|:\w+))*\s*\)")
+
+
+class QueryBudgetExceeded(AssertionError):
+  pass
+
+
+def query_budget(statements):
+  """Declares the most SQL statements one request to the view may run."""
+  def decorator(view):
+    view.query_budget = statements
+    return view
+  return decorator
+
+
+def statement_shape(statement):
+  # statements differing only in literals or IN list lengths share a shape
+  shape = _literals.sub("?", statement)
+  shape = _in_lists.sub("(?)", shape)
+  return _spaces.sub(" ", shape).strip()
+
+
+def _caller():
+  # the innermost frame of this project, outside of installed packages
+  here = os.path.abspath(__file__)
+  root = os.path.dirname(here)
+  for frame in reversed(traceback.extract_stack()[:-2]):
+    # code compiled at runtime, as SQLAlchemy's session proxies are, has no
+    # file: "<string>" would otherwise resolve into the working directory
+    if frame.filename.startswith("<"):
+      continue
+    filename = os.path.abspath(frame.filename)
+    if filename.startswith(root) and "site-packages" not in filename and filename != here:
+      return f"{os.path.relpath(filename, root)}:{frame.lineno} in {frame.name}"
+  return "unknown"
+
+
+class RequestQueries:
+
+  def __init__(self):
+    self.shapes = Counter()
+    self.callers = {}
+
+  def record(self, statement):
+    shape = statement_shape(statement)
+    self.shapes[shape] += 1
+    if shape not in self.callers:
+      self.callers[shape] = _caller()
+
+  @property
+  def count(self):
+    return sum(self.shapes.values())
+
+
+def explain(conn, cursor, statement, parameters):
+  """Returns the plan of a statement, read on a cursor of its connection."""
+  if conn.dialect.name == "postgresql":
+    prefix, savepoint = "EXPLAIN ", True
+  elif conn.dialect.name == "sqlite":
+    prefix, savepoint = "EXPLAIN QUERY PLAN ", False
+  else:
+    return None
+  # a failing EXPLAIN must not abort the request's transaction
+  explain_cursor = cursor.connection.cursor()
+  try:
+    if savepoint:
+      explain_cursor.execute("SAVEPOINT fyyur_explain")
+    try:
+      explain_cursor.execute(prefix + statement, parameters)
+      return "\n".join(" ".join(str(column) for column in row) for row in explain_cursor.fetchall())
+    except Exception as error:
+      if savepoint:
+        explain_cursor.execute("ROLLBACK TO SAVEPOINT fyyur_explain")
+      return f"EXPLAIN failed: {error}"
+    finally:
+      if savepoint:
+        explain_cursor.execute("RELEASE SAVEPOINT fyyur_explain")
+  finally:
+    explain_cursor.close()
+
+
+def _current_queries():
+  if has_request_context():
+    return g.get("request_queries")
+  return None
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault("diagnostics_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+  starts = conn.info.get("diagnostics_start")
+  elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+  queries = _current_queries()
+  if queries is not None:
+    queries.record(statement)
+
+  if not has_app_context() or elapsed * 1000 < current_app.config.get("SLOW_QUERY_MS", 200):
+    return
+  plan = None
+  if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+    plan = explain(conn, cursor, statement, parameters)
+  log.warning(
+    "slow statement, %.1f ms%s:\n%s%s",
+    elapsed * 1000,
+    f" in {request.endpoint}" if has_request_context() else "",
+    statement,
+    f"\nplan:\n{plan}" if plan else ""
+  )
+
+
+class QueryDiagnostics:
+  """Flask extension running the checks above when QUERY_DIAGNOSTICS is on."""
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.extensions["query_diagnostics"] = self
+    if not app.config.get("QUERY_DIAGNOSTICS", False):
+      return
+    if not event.contains(Engine, "before_cursor_execute", _before_execute):
+      event.listen(Engine, "before_cursor_execute", _before_execute)
+      event.listen(Engine, "after_cursor_execute", _after_execute)
+    app.before_request(self._start)
+    app.after_request(self._finish)
+
+  def _start(self):
+    g.request_queries = RequestQueries()
+
+  def _finish(self, response):
+    queries = g.pop("request_queries", None)
+    if queries is None:
+      return response
+
+    threshold = current_app.config.get("N_PLUS_ONE_THRESHOLD", 5)
+    for shape, count in queries.shapes.items():
+      if count >= threshold:
+        log.warning(
+          "possible N+1 in %s: %d statements of one shape, first run at %s:\n%s",
+          request.endpoint, count, queries.callers[shape], shape)
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, "query_budget", None)
+    if budget is not None and queries.count > budget:
+      message = (
+        f"{request.endpoint} ran {queries.count} SQL statements, its budget is {budget}:\n"
+        + "\n".join(f"{count} x {shape}" for shape, count in queries.shapes.most_common())
+      )
+      if current_app.testing:
+        raise QueryBudgetExceeded(message)
+      log.warning(message)
+    return response
@@ -0,0 +1,32 @@
+from flask_moment import Moment
+
+from assets import Assets
+from cache import FragmentCache, ResponseCache
+from compression import Compression
+from diagnostics import QueryDiagnostics
+from images import ImageProxy
+from jobs import JobQueue
+from metrics import RequestMetrics
+from models import Job, db
+from search import SearchService
+
+#----------------------------------------------------------------------------#
+# Extensions.
+#----------------------------------------------------------------------------#
+
+# Created without an app so that views, jobs and commands can import them;
+# create_app() in app.py binds each one to the app it builds, in this order.
+# Whatever they keep per app (cache backends, counters, threads) lives in
+# that app's `extensions` and is looked up through current_app, so apps
+# built one after the other, as in tests, do not share it.
+
+moment = Moment()
+search_service = SearchService(db)
+response_cache = ResponseCache()
+fragment_cache = FragmentCache()
+request_metrics = RequestMetrics()
+query_diagnostics = QueryDiagnostics()
+image_proxy = ImageProxy()
+static_assets = Assets()
+compression = Compression()
+jobs = JobQueue(db=db, model=Job)
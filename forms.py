@@ -229,3 +229,23 @@ class ArtistForm(Form):
     seeking_description = StringField(
         'seeking_description'
     )
+
+class ArtistFilterForm(Form):
+    # read from the query string of /artists, so no CSRF token
+    class Meta:
+        csrf = False
+
+    city = StringField(
+        'city'
+    )
+    state = SelectField(
+        'state', default='',
+        choices=[('', 'Any state')] + ArtistForm.state.kwargs['choices']
+    )
+    genre = SelectField(
+        'genre', default='',
+        choices=[('', 'Any genre')] + ArtistForm.genres.kwargs['choices']
+    )
+    seeking_venue = BooleanField(
+        'seeking_venue'
+    )
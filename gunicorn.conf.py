@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+
+#----------------------------------------------------------------------------#
+# gunicorn.
+#----------------------------------------------------------------------------#
+
+# `gunicorn` picks this file up from the working directory. The app is built
+# once in the master and forked into the workers, which share its memory and
+# start serving at once. The pooled database connections are not shared:
+# each worker drops the ones it inherited and opens its own (see
+# dispose_engines in database.py), and the job threads start per worker.
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("BIND", "0.0.0.0:" + os.environ.get("PORT", "8000"))
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+preload_app = True
+
+
+def when_ready(server):
+  # compiled once in the master, inherited by every worker
+  from startup import compile_templates
+  app = server.app.wsgi()
+  with app.app_context():
+    compile_templates(app)
+
+
+def post_worker_init(worker):
+  # after the fork, so that the connections and threads belong to this worker
+  from extensions import jobs
+  from models import db
+  from startup import touch_pools
+  touch_pools(db, worker.wsgi)
+  with worker.wsgi.app_context():
+    jobs.start()
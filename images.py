@@ -0,0 +1,402 @@
+import functools
+import hashlib
+import hmac
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import socket
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from flask import Response, abort, current_app, request, url_for
+
+from conditional import IMMUTABLE
+from diagnostics import query_budget
+
+#----------------------------------------------------------------------------#
+# Image proxy.
+#----------------------------------------------------------------------------#
+
+# Venues and artists link their image on whatever host the user picked. The
+# pages show those images through /images/<size> instead. The proxy fetches
+# each link once and scales it down to the box the page shows it in. It then
+# keeps the result on disk and serves it with a year long, immutable
+# Cache-Control. Page load time no longer depends on third-party hosts or on
+# full-size originals.
+#
+# Proxy URLs carry an HMAC of the link and size, so the endpoint only fetches
+# links that the app itself rendered. Scaling needs Pillow; without it the
+# originals are cached and served as they are.
+
+log = logging.getLogger("fyyur.images")
+
+# name -> the (width, height) box an image is scaled down to fit
+SIZES = {
+  # .tile img, the shows on listings and detail pages
+  "tile": (340, 200),
+  # the image next to the details of a venue or artist
+  "detail": (560, 500),
+}
+
+# served from our own origin, so nothing that can carry script (SVG)
+CONTENT_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/avif")
+
+
+class ImageFetchError(Exception):
+  pass
+
+
+def sign(key, url, size):
+  if isinstance(key, str):
+    key = key.encode("utf-8")
+  message = f"{size}\n{url}".encode("utf-8")
+  return hmac.new(key, message, hashlib.sha256).hexdigest()[:32]
+
+
+def check_public_url(url):
+  """Returns the addresses the host of an http(s) URL resolves to. Raises
+  ImageFetchError for other URLs and for hosts with any non-public address:
+  links are user input and must never reach the internal network."""
+  parts = urllib.parse.urlsplit(url)
+  if parts.scheme not in ("http", "https") or not parts.hostname:
+    raise ImageFetchError(f"{url} is not an http(s) URL")
+  try:
+    addresses = socket.getaddrinfo(
+      parts.hostname, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM)
+  except (socket.gaierror, UnicodeError, ValueError) as error:
+    raise ImageFetchError(f"{parts.hostname} does not resolve: {error}")
+  checked = []
+  for *_, sockaddr in addresses:
+    address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+    if not address.is_global:
+      raise ImageFetchError(f"{parts.hostname} resolves to the non-public address {address}")
+    checked.append(str(address))
+  return checked
+
+
+def _pinned(connection_class):
+  # a connection to the address given, not to a second lookup of the host,
+  # which a rebinding DNS server could answer with an internal address;
+  # Host and TLS server name stay those of the URL
+  class Pinned(connection_class):
+
+    def __init__(self, host, address, **kwargs):
+      super().__init__(host, **kwargs)
+      self._create_connection = lambda target, *args: socket.create_connection((address, target[1]), *args)
+
+  return Pinned
+
+
+_PINNED = {
+  http.client.HTTPConnection: _pinned(http.client.HTTPConnection),
+  http.client.HTTPSConnection: _pinned(http.client.HTTPSConnection),
+}
+
+
+class _PinnedOpen:
+  # checks the host of every request, redirects included, and connects to
+  # the address checked
+
+  def do_open(self, http_class, req, **kwargs):
+    address = check_public_url(req.full_url)[0]
+    return super().do_open(functools.partial(_PINNED[http_class], address=address), req, **kwargs)
+
+
+class _PinnedHTTPHandler(_PinnedOpen, urllib.request.HTTPHandler):
+  pass
+
+
+class _PinnedHTTPSHandler(_PinnedOpen, urllib.request.HTTPSHandler):
+  pass
+
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+
+  def redirect_request(self, req, fp, code, msg, headers, newurl):
+    # refuses other schemes before another handler could open them
+    check_public_url(newurl)
+    return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# no proxies from the environment: the connection must go to the address
+# that was checked
+_opener = urllib.request.build_opener(
+  urllib.request.ProxyHandler({}), _PinnedHTTPHandler, _PinnedHTTPSHandler, _CheckedRedirects)
+
+
+def open_url(request, timeout=5):
+  """Opens an http(s) URL or Request like urlopen, but only ever connects to
+  public addresses, checked once per request and redirect and then used for
+  the connection. Raises ImageFetchError for other URLs."""
+  if isinstance(request, str):
+    request = urllib.request.Request(request)
+  # the handlers check the host; other schemes would reach other handlers
+  if request.type not in ("http", "https"):
+    raise ImageFetchError(f"{request.full_url} is not an http(s) URL")
+  return _opener.open(request, timeout=timeout)
+
+
+def fetch_url(url, timeout=5, max_bytes=10 * 1024 * 1024):
+  """The default fetcher: returns the body and content type of an image."""
+  request = urllib.request.Request(url, headers={"User-Agent": "fyyur-image-proxy"})
+  try:
+    with open_url(request, timeout=timeout) as response:
+      content_type = response.headers.get_content_type()
+      if content_type not in CONTENT_TYPES:
+        raise ImageFetchError(f"{url} is {content_type}, not a supported image type")
+      body = response.read(max_bytes + 1)
+  except (urllib.error.URLError, OSError, ValueError) as error:
+    raise ImageFetchError(f"{url} could not be fetched: {error}")
+  if len(body) > max_bytes:
+    raise ImageFetchError(f"{url} is larger than {max_bytes} bytes")
+  return body, content_type
+
+
+def thumbnail(body, content_type, box):
+  """Scales an image down to fit `box`, keeping its format where possible."""
+  try:
+    from PIL import Image
+  except ImportError:
+    return body, content_type
+  try:
+    image = Image.open(io.BytesIO(body))
+    if getattr(image, "is_animated", False) or image.format not in ("JPEG", "PNG", "GIF", "WEBP"):
+      return body, content_type
+    if image.width <= box[0] and image.height <= box[1]:
+      return body, content_type
+    format = image.format
+    image.thumbnail(box)
+    output = io.BytesIO()
+    if format == "JPEG":
+      image.convert("RGB").save(output, "JPEG", quality=85, optimize=True, progressive=True)
+    else:
+      image.save(output, format, optimize=True)
+  except Exception as error:
+    # Pillow raises all sorts on broken files; the original is still useful
+    log.info("could not scale a %s image: %s", content_type, error)
+    return body, content_type
+  return output.getvalue(), Image.MIME[format]
+
+#----------------------------------------------------------------------------#
+# Disk cache.
+#----------------------------------------------------------------------------#
+
+
+def _digest(data):
+  return hashlib.sha256(data).hexdigest()
+
+
+class DiskCache:
+  """Thumbnails on disk, content addressed and bounded by total size.
+
+  objects/ holds every distinct image once, named by the SHA-256 of its
+  bytes; keys/ maps a key (size and link) to an object and its content type.
+  Files are written to a temporary name and renamed, so worker processes can
+  share the directory. Reads touch the object, and once the objects exceed
+  `max_bytes` the least recently read are removed down to 90% of it.
+  """
+
+  def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.bytes = None
+    self._lock = threading.Lock()
+
+  def _path(self, kind, name):
+    return os.path.join(self.directory, kind, name[:2], name)
+
+  def _write(self, path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+      with os.fdopen(fd, "wb") as file:
+        file.write(data)
+      os.replace(temporary, path)
+    except BaseException:
+      os.unlink(temporary)
+      raise
+
+  def get(self, key):
+    """Returns (digest, content type, body) stored under `key`, or None."""
+    key_path = self._path("keys", _digest(key.encode("utf-8")))
+    try:
+      with open(key_path) as file:
+        digest, content_type = file.read().split(" ", 1)
+      object_path = self._path("objects", digest)
+      with open(object_path, "rb") as file:
+        body = file.read()
+      os.utime(object_path)
+    except FileNotFoundError:
+      return None
+    except ValueError:
+      # a key file cut short; the next put rewrites it
+      return None
+    return digest, content_type, body
+
+  def put(self, key, body, content_type):
+    digest = _digest(body)
+    object_path = self._path("objects", digest)
+    if not os.path.exists(object_path):
+      self._write(object_path, body)
+      self._grew(len(body))
+    self._write(self._path("keys", _digest(key.encode("utf-8"))), f"{digest} {content_type}".encode("utf-8"))
+    return digest
+
+  def _objects(self):
+    root = os.path.join(self.directory, "objects")
+    for directory, _, names in os.walk(root):
+      for name in names:
+        if not name.startswith(".tmp-"):
+          path = os.path.join(directory, name)
+          try:
+            yield path, os.stat(path)
+          except FileNotFoundError:
+            pass
+
+  def _grew(self, size):
+    with self._lock:
+      if self.bytes is None:
+        self.bytes = sum(stat.st_size for _, stat in self._objects())
+      else:
+        self.bytes += size
+      if self.bytes > self.max_bytes:
+        self._evict()
+
+  def _evict(self):
+    # other processes write here too, so the scan also corrects self.bytes
+    objects = sorted(self._objects(), key=lambda entry: entry[1].st_mtime)
+    total = sum(stat.st_size for _, stat in objects)
+    target = self.max_bytes * 0.9
+    removed = 0
+    for path, stat in objects:
+      if total <= target:
+        break
+      try:
+        os.unlink(path)
+      except FileNotFoundError:
+        pass
+      total -= stat.st_size
+      removed += 1
+    self.bytes = total
+    if removed:
+      self._drop_dangling_keys()
+    log.info("image cache evicted %d objects, %d bytes left", removed, total)
+
+  def _drop_dangling_keys(self):
+    root = os.path.join(self.directory, "keys")
+    for directory, _, names in os.walk(root):
+      for name in names:
+        path = os.path.join(directory, name)
+        try:
+          with open(path) as file:
+            digest = file.read().split(" ", 1)[0]
+          if not os.path.exists(self._path("objects", digest)):
+            os.unlink(path)
+        except (FileNotFoundError, ValueError):
+          pass
+
+#----------------------------------------------------------------------------#
+# Flask extension.
+#----------------------------------------------------------------------------#
+
+
+class ProxyState:
+  """The fetcher and disk cache of the image proxy for one app."""
+
+  def __init__(self, fetcher, cache):
+    self.fetcher = fetcher
+    self.cache = cache
+
+
+class ImageProxy:
+  """Serves scaled copies of image links, see the top of this module.
+
+  `fetcher(url)` returns the body and content type of a link, or raises
+  ImageFetchError; pass one in to run offline, as tests do. Each app bound
+  with init_app() keeps its fetcher and disk cache in app.extensions.
+  """
+
+  def __init__(self, app=None, fetcher=None):
+    self.fetcher = fetcher
+    self._locks = {}
+    self._locks_lock = threading.Lock()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    fetcher = self.fetcher or functools.partial(
+      fetch_url,
+      timeout=app.config.get("IMAGE_FETCH_TIMEOUT", 5),
+      max_bytes=app.config.get("IMAGE_MAX_SOURCE_BYTES", 10 * 1024 * 1024))
+    cache = DiskCache(
+      app.config.get("IMAGE_CACHE_DIR") or os.path.join(app.instance_path, "images"),
+      app.config.get("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    app.extensions["image_proxy"] = ProxyState(fetcher, cache)
+    app.add_template_global(self.url, "image_url")
+
+    @query_budget(0)
+    def image(size):
+      # scaled copies of the image links, rendered as image_url(link, size)
+      return self.response(size)
+
+    app.add_url_rule("/images/<size>", "image", image)
+
+  @property
+  def cache(self):
+    return current_app.extensions["image_proxy"].cache
+
+  @property
+  def key(self):
+    return current_app.config.get("IMAGE_PROXY_KEY") or current_app.config["SECRET_KEY"]
+
+  def url(self, link, size):
+    """The proxied URL of an image link, for templates as image_url()."""
+    if not link or not current_app.config.get("IMAGE_PROXY", True):
+      return link
+    return url_for("image", size=size, url=link, sig=sign(self.key, link, size))
+
+  def _lock_for(self, key):
+    # one fetch per link and size at a time in this process
+    with self._locks_lock:
+      return self._locks.setdefault(key, threading.Lock())
+
+  def response(self, size):
+    """Answers a request to the proxy endpoint for `size`."""
+    link = request.args.get("url", "")
+    if size not in SIZES or not link:
+      abort(404)
+    if not hmac.compare_digest(request.args.get("sig", ""), sign(self.key, link, size)):
+      abort(403)
+
+    state = current_app.extensions["image_proxy"]
+    key = f"{size} {link}"
+    cached = state.cache.get(key)
+    if cached is None:
+      with self._lock_for(key):
+        cached = state.cache.get(key)
+        if cached is None:
+          try:
+            body, content_type = state.fetcher(link)
+          except ImageFetchError as error:
+            log.info("image proxy: %s", error)
+            response = Response(status=502)
+            # let the browser retry later, not on every page view
+            response.headers["Cache-Control"] = "public, max-age=300"
+            return response
+          body, content_type = thumbnail(body, content_type, SIZES[size])
+          digest = state.cache.put(key, body, content_type)
+          cached = digest, content_type, body
+      with self._locks_lock:
+        self._locks.pop(key, None)
+
+    digest, content_type, body = cached
+    response = Response(body, mimetype=content_type)
+    response.set_etag(digest)
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response.make_conditional(request)
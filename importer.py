@@ -0,0 +1,147 @@
+import csv
+import json
+
+from werkzeug.datastructures import MultiDict
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Records are read from CSV or NDJSON, validated with the same WTForms form as
+# the matching create page, and inserted batch_size rows at a time with one
+# executemany per batch, each batch in its own transaction. A batch the
+# database rejects is retried row by row so that only the offending rows are
+# reported. Subclasses name the form and the columns to insert, and may
+# resolve references for a whole batch at once.
+
+# at most this many row errors are kept in a report, all are counted
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_records(stream, format):
+  """Yields (line, record, error) for every record of a text stream."""
+  if format == "csv":
+    reader = csv.DictReader(stream)
+    for record in reader:
+      # the line a record ends on, the header being line 1
+      yield reader.line_num, record, None
+  elif format == "ndjson":
+    for line, text in enumerate(stream, start=1):
+      if not text.strip():
+        continue
+      try:
+        record = json.loads(text)
+      except ValueError as error:
+        yield line, None, f"invalid JSON: {error}"
+        continue
+      if not isinstance(record, dict):
+        yield line, None, "expected a JSON object"
+        continue
+      yield line, record, None
+  else:
+    raise ValueError(f"unknown import format {format!r}, expected csv or ndjson")
+
+
+class ImportReport:
+
+  def __init__(self):
+    self.rows = 0
+    self.inserted = 0
+    self.failed = 0
+    self.errors = []
+
+  def error(self, line, errors):
+    self.failed += 1
+    if len(self.errors) < MAX_REPORTED_ERRORS:
+      self.errors.append({"line": line, "errors": errors})
+
+  def to_dict(self):
+    return {
+      "rows": self.rows,
+      "inserted": self.inserted,
+      "failed": self.failed,
+      "errors": self.errors
+    }
+
+
+class Importer:
+  form_class = None
+  # columns inserted, read from the validated form
+  fields = ()
+  # form fields holding lists, written as "a;b" in CSV
+  list_fields = ("genres",)
+
+  def __init__(self, session, table, batch_size=1000):
+    self.session = session
+    self.table = table
+    self.batch_size = batch_size
+
+  def formdata(self, record):
+    formdata = MultiDict()
+    for key, value in record.items():
+      if value is None or (value == "" and key in self.list_fields):
+        continue
+      if key in self.list_fields and isinstance(value, str):
+        value = [item.strip() for item in value.split(";") if item.strip()]
+      for item in value if isinstance(value, list) else [value]:
+        formdata.add(key, item if isinstance(item, bool) else str(item))
+    return formdata
+
+  def begin_batch(self, records):
+    """Called with the batch's records before any is validated."""
+
+  def values(self, form, record):
+    """Returns the row to insert; raises ValueError to reject the record."""
+    return {field: form[field].data for field in self.fields}
+
+  def after_batch(self, rows):
+    """Called with the inserted rows, inside the batch's transaction."""
+
+  def run(self, records, report=None):
+    report = report or ImportReport()
+    batch = []
+    for record in records:
+      report.rows += 1
+      batch.append(record)
+      if len(batch) >= self.batch_size:
+        self._flush(batch, report)
+        batch = []
+    if batch:
+      self._flush(batch, report)
+    return report
+
+  def _flush(self, batch, report):
+    self.begin_batch([record for _, record, error in batch if error is None])
+    rows = []
+    for line, record, error in batch:
+      if error is not None:
+        report.error(line, {"record": [error]})
+        continue
+      form = self.form_class(formdata=self.formdata(record), meta={"csrf": False})
+      if not form.validate():
+        report.error(line, form.errors)
+        continue
+      try:
+        rows.append((line, self.values(form, record)))
+      except ValueError as error:
+        report.error(line, {"record": [str(error)]})
+    if not rows:
+      return
+
+    try:
+      self._insert([values for _, values in rows])
+      report.inserted += len(rows)
+    except Exception:
+      self.session.rollback()
+      for line, values in rows:
+        try:
+          self._insert([values])
+          report.inserted += 1
+        except Exception as error:
+          self.session.rollback()
+          report.error(line, {"database": [str(getattr(error, "orig", error))]})
+
+  def _insert(self, rows):
+    self.session.execute(self.table.insert(), rows)
+    self.after_batch(rows)
+    self.session.commit()
@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#----------------------------------------------------------------------------#
+
+# Side effects of a write that the response need not wait for are queued as
+# jobs. enqueue() adds a row to the job table in the writer's own session, so
+# a job exists exactly when the write committed, and no broker is needed.
+#
+# Once the session commits, its jobs are handed to a thread pool of the same
+# process (JOBS_MODE "thread"), or run right away in the request thread
+# ("inline", the testing default). Running them where they were queued keeps
+# per-process state such as the lru page cache correct. A poller thread in
+# every process picks up jobs left over by a crashed or restarted worker,
+# and `flask jobs work` runs a dedicated worker.
+#
+# Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED and a conditional
+# UPDATE, so each runs once however many workers poll.
+# Failed jobs are retried with exponential backoff up to JOBS_MAX_ATTEMPTS,
+# unless they raise PermanentJobError.
+
+log = logging.getLogger("fyyur.jobs")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class PermanentJobError(Exception):
+  """Raised by a handler when retrying cannot help."""
+
+
+class JobsState:
+  """The thread pool and poller of the job queue in one app."""
+
+  def __init__(self):
+    self.pool = None
+    self.poller = None
+    self.lock = threading.Lock()
+
+
+class JobQueue:
+  """Handlers, enqueue() and the runners; each app bound with init_app()
+  keeps its threads in a JobsState in app.extensions."""
+
+  def __init__(self, app=None, db=None, model=None):
+    self.handlers = {}
+    self.db = db
+    self.model = model
+    self._states = weakref.WeakSet()
+    self._listening = False
+    if hasattr(os, "register_at_fork"):
+      os.register_at_fork(after_in_child=self._forget_threads)
+    if app is not None:
+      self.init_app(app, db, model)
+
+  def init_app(self, app, db=None, model=None):
+    self.db = db or self.db
+    self.model = model or self.model
+    state = app.extensions["jobs"] = JobsState()
+    self._states.add(state)
+
+    queue = self
+
+    if not self._listening:
+      # once per session registry, however many apps share it
+      @event.listens_for(self.db.session, "after_commit")
+      def run_committed(session):
+        jobs = session.info.pop("jobs", [])
+        if jobs:
+          queue.dispatch([job.id for job in jobs])
+
+      @event.listens_for(self.db.session, "after_rollback")
+      def drop_rolled_back(session):
+        session.info.pop("jobs", None)
+
+      self._listening = True
+
+    @app.before_request
+    def start_poller():
+      # started by the first request a worker serves, or earlier by gunicorn's
+      # post_worker_init; the check is all later requests pay
+      if state.poller is None:
+        queue.start()
+
+  def handler(self, name):
+    """Decorator registering the function run for jobs called `name`."""
+    def decorator(fn):
+      self.handlers[name] = fn
+      return fn
+    return decorator
+
+  def enqueue(self, name, **payload):
+    """Queues a job in the current transaction; it runs once that commits."""
+    if name not in self.handlers:
+      raise ValueError(f"no job handler named {name!r}")
+    session = self.db.session
+    job = self.model(name=name, payload=json.dumps(payload, sort_keys=True))
+    session.add(job)
+    session.info.setdefault("jobs", []).append(job)
+    return job
+
+  #--------------------------------------------------------------------------#
+  # Running.
+  #--------------------------------------------------------------------------#
+
+  @property
+  def mode(self):
+    return current_app.config.get("JOBS_MODE", "thread")
+
+  def _forget_threads(self):
+    # a forked worker inherits the objects but not the threads behind them
+    for state in list(self._states):
+      state.pool = None
+      state.poller = None
+      state.lock = threading.Lock()
+
+  def start(self):
+    # threads do not survive a fork, so they start in each worker on demand
+    if self.mode != "thread":
+      return
+    app = current_app._get_current_object()
+    state = app.extensions["jobs"]
+    with state.lock:
+      if state.pool is None:
+        state.pool = ThreadPoolExecutor(
+          max_workers=app.config.get("JOBS_WORKERS", 2), thread_name_prefix="fyyur-job")
+      if state.poller is None or not state.poller.is_alive():
+        state.poller = threading.Thread(target=self._poll, args=(app,), name="fyyur-job-poller", daemon=True)
+        state.poller.start()
+
+  def dispatch(self, job_ids):
+    # jobs queued in a request run under that request's app
+    app = current_app._get_current_object()
+    if self.mode == "inline":
+      # in a thread of its own, so that the job gets a session of its own
+      thread = threading.Thread(target=lambda: [self.run_job(job_id, app=app) for job_id in job_ids])
+      thread.start()
+      thread.join()
+    elif self.mode == "thread":
+      self.start()
+      pool = app.extensions["jobs"].pool
+      for job_id in job_ids:
+        pool.submit(self.run_job, job_id, app=app)
+
+  def _poll(self, app):
+    interval = app.config.get("JOBS_POLL_SECONDS", 5)
+    while True:
+      time.sleep(interval)
+      try:
+        self.work(max_jobs=100, grace=interval, app=app)
+      except Exception:
+        log.exception("job poller failed")
+
+  def work(self, max_jobs=None, grace=0, app=None):
+    """Runs due jobs until there are none left or max_jobs ran.
+
+    Jobs younger than `grace` seconds are left to the process that queued
+    them. Returns the number of jobs run.
+    """
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+      if not self.run_job(grace=grace, app=app):
+        return ran
+      ran += 1
+    return ran
+
+  def run_job(self, job_id=None, grace=0, app=None):
+    """Claims and runs job `job_id`, or the next due job; returns False when
+    there was nothing to claim."""
+    with (app or current_app._get_current_object()).app_context():
+      try:
+        claimed = self._claim(job_id, grace)
+        if claimed is None:
+          return False
+        job_id, name, payload, attempts = claimed
+        try:
+          self.handlers[name](**json.loads(payload))
+          self.db.session.rollback()
+          self._finish(job_id, DONE, last_error=None)
+        except Exception as error:
+          self.db.session.rollback()
+          self._fail(job_id, name, payload, attempts, error)
+        return True
+      finally:
+        self.db.session.remove()
+
+  def _claim(self, job_id, grace):
+    Job = self.model
+    session = self.db.session
+    now = datetime.utcnow()
+    if job_id is None:
+      # running jobs whose lease ran out belong to a worker that died
+      lease = timedelta(seconds=current_app.config.get("JOBS_LEASE_SECONDS", 300))
+      session.query(Job).filter(Job.status == RUNNING, Job.locked_at < now - lease).update(
+        {"status": QUEUED, "locked_at": None}, synchronize_session=False)
+      query = session.query(Job).filter(
+        Job.status == QUEUED,
+        Job.run_after <= now,
+        Job.created_at <= now - timedelta(seconds=grace)
+      ).order_by(Job.id)
+    else:
+      query = session.query(Job).filter(Job.id == job_id, Job.status == QUEUED)
+    job = query.limit(1).with_for_update(skip_locked=True).first()
+    if job is None:
+      session.commit()
+      return None
+    # the status check makes the claim safe where FOR UPDATE is ignored
+    claimed = session.query(Job).filter(Job.id == job.id, Job.status == QUEUED).update(
+      {"status": RUNNING, "locked_at": now, "attempts": Job.attempts + 1},
+      synchronize_session=False)
+    session.commit()
+    if not claimed:
+      return None
+    session.refresh(job)
+    return job.id, job.name, job.payload, job.attempts
+
+  def _finish(self, job_id, status, **values):
+    Job = self.model
+    self.db.session.query(Job).filter(Job.id == job_id).update(
+      {"status": status, "locked_at": None, "finished_at": datetime.utcnow(), **values},
+      synchronize_session=False)
+    self.db.session.commit()
+
+  def _fail(self, job_id, name, payload, attempts, error):
+    Job = self.model
+    message = "".join(traceback.format_exception_only(type(error), error)).strip()
+    max_attempts = current_app.config.get("JOBS_MAX_ATTEMPTS", 5)
+    if isinstance(error, PermanentJobError) or attempts >= max_attempts:
+      log.warning("job %s %s(%s) failed: %s", job_id, name, payload, message)
+      self._finish(job_id, FAILED, last_error=message)
+      return
+    delay = 2 ** attempts
+    log.info("job %s %s failed, retrying in %ss: %s", job_id, name, delay, message)
+    self.db.session.query(Job).filter(Job.id == job_id).update({
+      "status": QUEUED,
+      "locked_at": None,
+      "last_error": message,
+      "run_after": datetime.utcnow() + timedelta(seconds=delay)
+    }, synchronize_session=False)
+    self.db.session.commit()
+
+  def counts(self):
+    """Number of jobs per status."""
+    Job = self.model
+    rows = self.db.session.query(Job.status, self.db.func.count(Job.id)).group_by(Job.status)
+    return {status: count for status, count in rows}
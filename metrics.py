@@ -0,0 +1,213 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, signals_available, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#----------------------------------------------------------------------------#
+
+# Every request records its wall time, the number and total time of the SQL
+# statements it ran (on any engine, replica included) and the time spent
+# rendering templates. The figures are sent back in a Server-Timing header,
+# logged as one JSON line on the "fyyur.requests" logger and aggregated into
+# per-endpoint histograms rendered in the Prometheus text format.
+#
+# Histograms live in each worker process; Prometheus sums them per instance.
+# Template timing relies on Flask's signals and so needs blinker installed.
+
+request_log = logging.getLogger("fyyur.requests")
+
+# seconds; the last, implicit bucket is +Inf
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+
+  def __init__(self, name, help, buckets, labels):
+    self.name = name
+    self.help = help
+    self.buckets = tuple(buckets)
+    self.labels = labels
+    # label values -> [bucket counts..., sum, count]
+    self._series = {}
+    self._lock = threading.Lock()
+
+  def observe(self, value, *labels):
+    index = bisect_left(self.buckets, value)
+    with self._lock:
+      series = self._series.get(labels)
+      if series is None:
+        series = self._series[labels] = [0] * (len(self.buckets) + 3)
+      series[index] += 1
+      series[-2] += value
+      series[-1] += 1
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+    with self._lock:
+      series = sorted((labels, list(values)) for labels, values in self._series.items())
+    for labels, values in series:
+      label_text = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(self.labels, labels))
+      cumulative = 0
+      for bound, count in zip(self.buckets + ("+Inf",), values):
+        cumulative += count
+        lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+      lines.append(f"{self.name}_sum{{{label_text}}} {values[-2]}")
+      lines.append(f"{self.name}_count{{{label_text}}} {values[-1]}")
+    return "\n".join(lines)
+
+
+def _escape(value):
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_stats(prefix, stats, help=""):
+  """Renders the numeric values of a stats dict as gauges named prefix_key."""
+  lines = []
+  for key, value in sorted(stats.items()):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+      continue
+    name = f"{prefix}_{key}"
+    lines += [f"# HELP {name} {help or key.replace('_', ' ')}", f"# TYPE {name} gauge", f"{name} {value}"]
+  return "\n".join(lines)
+
+
+class RequestTimings:
+  """Figures collected while one request runs, kept on flask.g."""
+
+  def __init__(self):
+    self.start = time.perf_counter()
+    self.statements = 0
+    self.sql_time = 0.0
+    self.template_time = 0.0
+    self._template_starts = []
+
+  def duration(self):
+    return time.perf_counter() - self.start
+
+
+def current_timings():
+  if has_request_context():
+    return g.get("request_timings")
+  return None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+  if current_timings() is not None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+  timings = current_timings()
+  starts = conn.info.get("query_start")
+  if timings is not None and starts:
+    timings.statements += 1
+    timings.sql_time += time.perf_counter() - starts.pop()
+
+
+def _before_render(app, template, context, **extra):
+  timings = current_timings()
+  if timings is not None:
+    timings._template_starts.append(time.perf_counter())
+
+
+def _rendered(app, template, context, **extra):
+  timings = current_timings()
+  if timings is not None and timings._template_starts:
+    elapsed = time.perf_counter() - timings._template_starts.pop()
+    # only the outermost render counts, nested ones are part of it
+    if not timings._template_starts:
+      timings.template_time += elapsed
+
+
+class RequestMetrics:
+  """Flask extension recording RequestTimings for every request."""
+
+  def __init__(self, app=None):
+    labels = ("endpoint", "method")
+    self.request_duration = Histogram(
+      "fyyur_request_duration_seconds", "Wall time of a request.", DURATION_BUCKETS, labels)
+    self.sql_duration = Histogram(
+      "fyyur_request_sql_duration_seconds", "Time spent in SQL per request.", DURATION_BUCKETS, labels)
+    self.sql_statements = Histogram(
+      "fyyur_request_sql_statements", "SQL statements run per request.", STATEMENT_BUCKETS, labels)
+    self.template_duration = Histogram(
+      "fyyur_request_template_duration_seconds", "Template render time per request.", DURATION_BUCKETS, labels)
+    self._responses = {}
+    self._lock = threading.Lock()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.extensions["request_metrics"] = self
+    if not app.config.get("METRICS_ENABLED", True):
+      return
+    app.before_request(self._start)
+    app.after_request(self._finish)
+    if signals_available:
+      before_render_template.connect(_before_render, app)
+      template_rendered.connect(_rendered, app)
+
+  def _start(self):
+    g.request_timings = RequestTimings()
+
+  def _finish(self, response):
+    timings = g.pop("request_timings", None)
+    if timings is None:
+      return response
+    duration = timings.duration()
+    endpoint = request.endpoint or "unmatched"
+    labels = (endpoint, request.method)
+    self.request_duration.observe(duration, *labels)
+    self.sql_duration.observe(timings.sql_time, *labels)
+    self.sql_statements.observe(timings.statements, *labels)
+    self.template_duration.observe(timings.template_time, *labels)
+    with self._lock:
+      key = labels + (str(response.status_code),)
+      self._responses[key] = self._responses.get(key, 0) + 1
+
+    response.headers.add(
+      "Server-Timing",
+      f'app;dur={duration * 1000:.1f}, '
+      f'db;dur={timings.sql_time * 1000:.1f};desc="{timings.statements} statements", '
+      f'tpl;dur={timings.template_time * 1000:.1f}'
+    )
+    request_log.info(json.dumps({
+      "method": request.method,
+      "path": request.path,
+      "endpoint": endpoint,
+      "status": response.status_code,
+      "duration_ms": round(duration * 1000, 2),
+      "sql_statements": timings.statements,
+      "sql_ms": round(timings.sql_time * 1000, 2),
+      "template_ms": round(timings.template_time * 1000, 2)
+    }))
+    return response
+
+  def render(self):
+    """The Prometheus text exposition of every metric."""
+    lines = [
+      "# HELP fyyur_requests_total Requests answered.",
+      "# TYPE fyyur_requests_total counter"
+    ]
+    with self._lock:
+      responses = sorted(self._responses.items())
+    for (endpoint, method, status), count in responses:
+      lines.append(
+        f'fyyur_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",status="{status}"}} {count}')
+    sections = ["\n".join(lines)] + [
+      histogram.render() for histogram in
+      (self.request_duration, self.sql_duration, self.sql_statements, self.template_duration)
+    ]
+    return "\n".join(sections) + "\n"
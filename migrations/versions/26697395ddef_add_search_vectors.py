@@ -0,0 +1,62 @@
+"""add search vectors
+
+Revision ID: 26697395ddef
+Revises: 3b0effcaa06a
+Create Date: 2026-10-18 09:12:41.305117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '26697395ddef'
+down_revision = '3b0effcaa06a'
+branch_labels = None
+depends_on = None
+
+# name weighs most, then location, then genres
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}city, '') || ' ' || coalesce({row}state, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string({row}genres, ' '), '')), 'C')
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute("""
+    CREATE OR REPLACE FUNCTION fyyur_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+      NEW.search_vector := {vector};
+      RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """.format(vector=SEARCH_VECTOR.format(row='NEW.')))
+
+    for table in ('Venue', 'Artist'):
+        prefix = table.lower()
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute('UPDATE "{table}" SET search_vector = {vector}'.format(
+            table=table, vector=SEARCH_VECTOR.format(row='')))
+        op.execute("""
+        CREATE TRIGGER {prefix}_search_vector_update
+        BEFORE INSERT OR UPDATE OF name, city, state, genres ON "{table}"
+        FOR EACH ROW EXECUTE PROCEDURE fyyur_search_vector_update()
+        """.format(prefix=prefix, table=table))
+        op.create_index('ix_{}_search_vector'.format(prefix), table, ['search_vector'],
+                        postgresql_using='gin')
+        op.create_index('ix_{}_name_trgm'.format(prefix), table, ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        prefix = table.lower()
+        op.drop_index('ix_{}_name_trgm'.format(prefix), table_name=table)
+        op.drop_index('ix_{}_search_vector'.format(prefix), table_name=table)
+        op.execute('DROP TRIGGER IF EXISTS {prefix}_search_vector_update ON "{table}"'.format(
+            prefix=prefix, table=table))
+        op.drop_column(table, 'search_vector')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_vector_update()')
@@ -0,0 +1,50 @@
+"""add show counters
+
+Revision ID: 613b17a6dbaa
+Revises: a9170fb3602b
+Create Date: 2026-10-18 15:02:11.730942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '613b17a6dbaa'
+down_revision = 'a9170fb3602b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('is_past', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.execute("""
+    UPDATE "Show" SET is_past = true
+    WHERE start_time <= (now() AT TIME ZONE 'utc')
+    """)
+    op.create_index('ix_show_upcoming_start_time', 'Show', ['start_time'],
+                    postgresql_where=sa.text('NOT is_past'))
+
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute("""
+        UPDATE "{table}" SET
+          upcoming_shows_count = counts.upcoming,
+          past_shows_count = counts.past
+        FROM (
+          SELECT {key} AS id,
+            count(*) FILTER (WHERE NOT is_past) AS upcoming,
+            count(*) FILTER (WHERE is_past) AS past
+          FROM "Show" GROUP BY {key}
+        ) AS counts
+        WHERE "{table}".id = counts.id
+        """.format(table=table, key=key))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_index('ix_show_upcoming_start_time', table_name='Show')
+    op.drop_column('Show', 'is_past')
@@ -0,0 +1,28 @@
+"""add artist directory indexes
+
+Revision ID: a9170fb3602b
+Revises: 12d2abb8af44
+Create Date: 2026-10-18 14:21:40.518203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9170fb3602b'
+down_revision = '12d2abb8af44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /artists pages on (name, id) and filters on state, city and genre
+    op.create_index('ix_artist_name_id', 'Artist', ['name', 'id'])
+    op.create_index('ix_artist_state_city', 'Artist', ['state', 'city'])
+    op.create_index('ix_artist_genres', 'Artist', ['genres'], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artist_genres', table_name='Artist')
+    op.drop_index('ix_artist_state_city', table_name='Artist')
+    op.drop_index('ix_artist_name_id', table_name='Artist')
@@ -0,0 +1,402 @@
+import hashlib
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import column_property, deferred
+
+from database import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+def partition_shows(rows, counterpart, now=None):
+  # splits joined show rows into upcoming and past against one reference time,
+  # so that every show lands in exactly one bucket
+  now = now or datetime.utcnow()
+  upcoming_shows, past_shows = [], []
+  for row in rows:
+    if row.start_time is None:
+      # outer join row of an entity without any show
+      continue
+    show = {
+      "id": row.show_id,
+      f"{counterpart}_id": getattr(row, f"{counterpart}_id"),
+      f"{counterpart}_name": getattr(row, f"{counterpart}_name"),
+      f"{counterpart}_image_link": getattr(row, f"{counterpart}_image_link"),
+      f"{counterpart}_updated_at": getattr(row, f"{counterpart}_updated_at"),
+      "start_time": row.start_time
+    }
+    if row.start_time > now:
+      upcoming_shows.append(show)
+    else:
+      past_shows.append(show)
+  # rows come ordered by start_time: soonest upcoming first, latest past first
+  past_shows.reverse()
+  return upcoming_shows, past_shows
+
+def latest(*values):
+  values = [value for value in values if value is not None]
+  return max(values) if values else None
+
+def area_version(venues):
+  rendered = [(venue["id"], venue["name"]) for venue in venues]
+  return hashlib.sha1(repr(rendered).encode("utf-8")).hexdigest()[:16]
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+      db.Index('ix_venue_state_city', 'state', 'city'),
+      db.Index('ix_venue_search_vector', 'search_vector', postgresql_using='gin'),
+      db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    
+    image_link = db.Column(db.String(500))
+    website = db.Column(db.String(120))
+    facebook_link = db.Column(db.String(120))
+    
+    genres = db.Column(db.ARRAY(db.String).with_variant(db.JSON, "sqlite"))
+    seeking_talent = db.Column(db.Boolean, default=False)
+    seeking_description = db.Column(db.String)
+
+    # maintained on every show write and by `flask rollover-shows`
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # maintained by a database trigger, see migration 26697395ddef
+    search_vector = deferred(db.Column(TSVECTOR().with_variant(db.Text, 'sqlite')))
+
+    show = db.relationship("Show", backref="venue", lazy=True)
+
+    def __repr__(self):
+      return f"<Venue {self.name} {self.seeking_talent}>"
+
+    @property
+    def area(self):
+      return {
+        "city": self.city,
+        "state": self.state
+      }
+
+    @property
+    def serialize(self):
+      return {
+        "id": self.id,
+        "name": self.name, 
+      }
+
+    @property
+    def complete(self):
+      return Venue.detail(self.id)
+
+    @classmethod
+    def detail(cls, venue_id):
+      # the venue and all of its shows, with their artist, in one statement
+      rows = db.session.query(
+        cls,
+        Show.id.label("show_id"),
+        Show.start_time,
+        Artist.id.label("artist_id"),
+        Artist.name.label("artist_name"),
+        Artist.image_link.label("artist_image_link"),
+        Artist.updated_at.label("artist_updated_at")
+      ).outerjoin(Show, Show.venue_id == cls.id).outerjoin(
+        Artist, Show.artist_id == Artist.id
+      ).filter(cls.id == venue_id).order_by(Show.start_time, Show.id).all()
+      if not rows:
+        return None
+
+      venue = rows[0][0]
+      upcoming_shows, past_shows = partition_shows(rows, "artist")
+      return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "city": venue.city,
+        "state": venue.state,
+        "address": venue.address,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "past_shows_count": len(past_shows)
+      }
+
+    @classmethod
+    def directory(cls):
+      # every venue and its upcoming show count, ordered so that areas can
+      # be grouped without another query
+      rows = db.session.query(
+        cls.id,
+        cls.name,
+        cls.city,
+        cls.state,
+        cls.upcoming_shows_count.label("num_upcoming_shows")
+      ).order_by(cls.state, cls.city, cls.name, cls.id).all()
+
+      areas = []
+      for (state, city), group in groupby(rows, key=lambda row: (row.state, row.city)):
+        group = list(group)
+        venues = [{
+          "id": venue.id,
+          "name": venue.name,
+          "num_upcoming_shows": venue.num_upcoming_shows
+        } for venue in group]
+        areas.append({
+          "city": city,
+          "state": state,
+          "venues": venues,
+          "num_upcoming_shows": sum(v["num_upcoming_shows"] for v in venues),
+          # versions the cached fragment of the area, see venues.html: it
+          # changes with what the fragment shows, also when a venue moves
+          # away or is deleted, which updated_at of the rest would not
+          "version": area_version(venues)
+        })
+      return areas
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+      db.Index('ix_artist_search_vector', 'search_vector', postgresql_using='gin'),
+      db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_artist_name_id', 'name', 'id'),
+      db.Index('ix_artist_state_city', 'state', 'city'),
+      db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.Column(db.ARRAY(db.String(120)).with_variant(db.JSON, "sqlite"))
+    image_link = db.Column(db.String(500))
+    website = db.Column(db.String(120))
+    facebook_link = db.Column(db.String(120))
+    
+    seeking_venue = db.Column(db.Boolean, nullable=True, default=False)
+    seeking_description = db.Column(db.String(120), nullable=True)
+
+    # maintained on every show write and by `flask rollover-shows`
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # maintained by a database trigger, see migration 26697395ddef
+    search_vector = deferred(db.Column(TSVECTOR().with_variant(db.Text, 'sqlite')))
+
+    show = db.relationship("Show", backref="artist", lazy=True)
+
+
+    @property
+    def complete(self):
+      return Artist.detail(self.id)
+
+    @classmethod
+    def detail(cls, artist_id):
+      # the artist and all of their shows, with the venue, in one statement
+      rows = db.session.query(
+        cls,
+        Show.id.label("show_id"),
+        Show.start_time,
+        Venue.id.label("venue_id"),
+        Venue.name.label("venue_name"),
+        Venue.image_link.label("venue_image_link"),
+        Venue.updated_at.label("venue_updated_at")
+      ).outerjoin(Show, Show.artist_id == cls.id).outerjoin(
+        Venue, Show.venue_id == Venue.id
+      ).filter(cls.id == artist_id).order_by(Show.start_time, Show.id).all()
+      if not rows:
+        return None
+
+      artist = rows[0][0]
+      upcoming_shows, past_shows = partition_shows(rows, "venue")
+      return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "image_link": artist.image_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "past_shows_count": len(past_shows)
+      }
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # the counters a show is on; changes keep the old value at hand, see
+    # count_updated_show
+    venue_id = column_property(
+        db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False), active_history=True)
+    artist_id = column_property(
+        db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False), active_history=True)
+    start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow())
+    # set once start_time has passed, and counted as such on venue and artist
+    is_past = column_property(
+        db.Column(db.Boolean, nullable=False, default=False, server_default=db.false()), active_history=True)
+
+    def __repr__(self):
+        return f"<Show {self.start_time}>"
+
+# detail pages filter by venue or artist and partition on start_time, /shows
+# pages on (start_time, id) newest first
+db.Index('ix_show_venue_id_start_time', Show.venue_id, Show.start_time)
+db.Index('ix_show_artist_id_start_time', Show.artist_id, Show.start_time)
+db.Index('ix_show_start_time_id', Show.start_time.desc(), Show.id.desc())
+# the rollover looks up upcoming shows that have started
+db.Index('ix_show_upcoming_start_time', Show.start_time, postgresql_where=db.not_(Show.is_past))
+
+class Job(db.Model):
+    # background work queued by write handlers, see jobs.py
+    __tablename__ = 'Job'
+    __table_args__ = (
+      db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    status = db.Column(db.String(20), nullable=False, default="queued", server_default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.name} {self.status}>"
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+def count_shows(connection, shows, step=1):
+  # adds `step` to the upcoming or past counters of the venue and artist of
+  # each show, a mapping with venue_id, artist_id and is_past, and its own
+  # "step" if it has one. The counts are on the listing pages, so updated_at
+  # moves with them, on the rows whose counts change only.
+  now = datetime.utcnow()
+  for model, key in ((Venue, "venue_id"), (Artist, "artist_id")):
+    totals = {}
+    for show in shows:
+      upcoming, past = totals.get(show[key], (0, 0))
+      change = show.get("step", step)
+      if show["is_past"]:
+        totals[show[key]] = (upcoming, past + change)
+      else:
+        totals[show[key]] = (upcoming + change, past)
+    totals = {entity_id: counts for entity_id, counts in totals.items() if counts != (0, 0)}
+    if not totals:
+      continue
+    table = model.__table__
+    # ordered by id so that concurrent writers lock rows in the same order
+    connection.execute(
+      table.update().where(table.c.id == db.bindparam("entity_id")).values(
+        upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam("upcoming"),
+        past_shows_count=table.c.past_shows_count + db.bindparam("past"),
+        updated_at=now
+      ),
+      [
+        {"entity_id": entity_id, "upcoming": upcoming, "past": past}
+        for entity_id, (upcoming, past) in sorted(totals.items())
+      ]
+    )
+
+def show_counts(show):
+  return {"venue_id": show.venue_id, "artist_id": show.artist_id, "is_past": show.is_past}
+
+@event.listens_for(Show, "before_insert")
+@event.listens_for(Show, "before_update")
+def set_show_is_past(mapper, connection, show):
+  start_time = show.start_time
+  if isinstance(start_time, str):
+    import dateutil.parser
+    start_time = dateutil.parser.parse(start_time)
+  show.is_past = start_time <= datetime.utcnow()
+
+@event.listens_for(Show, "after_insert")
+def count_inserted_show(mapper, connection, show):
+  count_shows(connection, [show_counts(show)])
+
+@event.listens_for(Show, "after_update")
+def count_updated_show(mapper, connection, show):
+  # a show given another venue, artist or start time leaves the counters it
+  # was on for the new ones
+  state = db.inspect(show)
+  before = {}
+  for key, value in show_counts(show).items():
+    deleted = state.attrs[key].history.deleted
+    before[key] = deleted[0] if deleted else value
+  if before != show_counts(show):
+    count_shows(connection, [{**before, "step": -1}, {**show_counts(show), "step": 1}])
+
+@event.listens_for(Show, "after_delete")
+def count_deleted_show(mapper, connection, show):
+  count_shows(connection, [show_counts(show)], step=-1)
+
+def rollover_shows(now=None, batch_size=1000):
+  # moves shows that have started from the upcoming to the past counters,
+  # batch_size shows per transaction; returns how many were moved
+  now = now or datetime.utcnow()
+  moved = 0
+  while True:
+    shows = db.session.query(Show.id, Show.venue_id, Show.artist_id).filter(
+      Show.is_past.is_(False), Show.start_time <= now
+    ).order_by(Show.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    if not shows:
+      return moved
+    Show.query.filter(Show.id.in_([show.id for show in shows])).update(
+      {"is_past": True}, synchronize_session=False)
+    count_shows(db.session.connection(), [
+      {**show._asdict(), "is_past": is_past, "step": step}
+      for show in shows for is_past, step in ((False, -1), (True, 1))
+    ])
+    db.session.commit()
+    moved += len(shows)
+
+def recount_shows():
+  # recomputes every counter from the Show table, for rows inserted without
+  # count_shows, e.g. by `flask seed`
+  for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    def shows(is_past):
+      return db.select([db.func.count(Show.id)]).where(
+        db.and_(key == model.id, Show.is_past.is_(is_past))).scalar_subquery()
+    db.session.execute(model.__table__.update().where(db.or_(
+      model.upcoming_shows_count != shows(False), model.past_shows_count != shows(True)
+    )).values(
+      upcoming_shows_count=shows(False),
+      past_shows_count=shows(True),
+      updated_at=datetime.utcnow()
+    ))
+  db.session.commit()
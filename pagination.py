@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+#----------------------------------------------------------------------------#
+# Keyset pagination helpers.
+#----------------------------------------------------------------------------#
+
+# Cursors are opaque, url-safe tokens holding the sort key of the last row on
+# a page. Datetimes are tagged so they survive the round trip through JSON.
+
+
+def _default(value):
+  if isinstance(value, datetime):
+    return {"$dt": value.isoformat()}
+  raise TypeError(f"{type(value).__name__} can not be used in a cursor")
+
+
+def _object_hook(obj):
+  if "$dt" in obj:
+    return datetime.fromisoformat(obj["$dt"])
+  return obj
+
+
+def encode_cursor(*values):
+  raw = json.dumps(values, default=_default, separators=(",", ":"))
+  return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, size):
+  """Returns the values held by `cursor`, or None if it is missing.
+
+  Raises ValueError if the cursor is malformed or holds the wrong number of
+  values.
+  """
+  if not cursor:
+    return None
+  try:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")), object_hook=_object_hook)
+  except (ValueError, TypeError) as error:
+    raise ValueError("invalid cursor") from error
+  if not isinstance(values, list) or len(values) != size:
+    raise ValueError("invalid cursor")
+  return values
+
+
+def keyset_filter(columns, values, descending=False):
+  """Builds the WHERE clause selecting rows that sort after `values`.
+
+  A row-value comparison, (a, b) > (x, y), lets PostgreSQL start the scan of a
+  composite index on (a, b) right at the cursor instead of filtering from the
+  first row. All columns must sort in the same direction.
+  """
+  if descending:
+    return tuple_(*columns) < tuple_(*values)
+  return tuple_(*columns) > tuple_(*values)
+
+
+def paginate(query, columns, cursor, per_page, descending=False):
+  """Applies keyset pagination to `query`.
+
+  `query` must already be ordered by `columns`. Returns the rows of the page
+  and the cursor of the next one (None on the last page).
+  """
+  values = decode_cursor(cursor, len(columns))
+  if values is not None:
+    query = query.filter(keyset_filter(columns, values, descending))
+  rows = query.limit(per_page + 1).all()
+  if len(rows) <= per_page:
+    return rows, None
+  rows = rows[:per_page]
+  last = rows[-1]
+  return rows, encode_cursor(*(getattr(last, column.key) for column in columns))
@@ -0,0 +1,183 @@
+import re
+import threading
+from difflib import SequenceMatcher
+
+from flask import current_app
+from sqlalchemy import func, or_, text
+
+#----------------------------------------------------------------------------#
+# Search service.
+#----------------------------------------------------------------------------#
+
+# Venues and artists are searched through one service. On PostgreSQL it ranks
+# matches with the `search_vector` column and the pg_trgm index added by
+# migration 26697395ddef. Other databases (SQLite in tests) fall back to an
+# index kept in process memory.
+#
+# Callers hand in a `base` query selecting the result columns of the model,
+# one row per venue or artist. The service adds matching, filters, ranking and paging,
+# and returns the total number of matches with the rows of the page.
+
+_token = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+  return _token.findall(text.lower()) if text else []
+
+
+class PostgresBackend:
+  # minimum pg_trgm similarity for a fuzzy name match
+  similarity_threshold = 0.3
+
+  def search(self, model, base, term, filters, limit, offset):
+    query = base
+    order = []
+    if term:
+      # `name % term` can use the trigram index where a similarity() call
+      # can not; it compares against pg_trgm.similarity_threshold, set for
+      # this transaction only
+      base.session.execute(
+        text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+        {"threshold": str(self.similarity_threshold)}
+      )
+      vector = model.search_vector
+      tsquery = func.plainto_tsquery("simple", term)
+      query = query.filter(or_(
+        vector.op("@@")(tsquery),
+        model.name.op("%")(term),
+        model.name.ilike(f"%{term}%")
+      ))
+      order.append((func.ts_rank(vector, tsquery) + func.similarity(model.name, term)).desc())
+    query = _apply_filters(model, query, filters)
+    rows = query.add_columns(
+      func.count().over().label("total")
+    ).order_by(*order, model.name, model.id).limit(limit).offset(offset).all()
+
+    if rows:
+      return rows[0].total, rows
+    if offset:
+      # paged past the last match, the window total is not available
+      return query.order_by(None).count(), rows
+    return 0, rows
+
+
+def _apply_filters(model, query, filters):
+  if filters.get("city"):
+    query = query.filter(func.lower(model.city) == filters["city"].lower())
+  if filters.get("state"):
+    query = query.filter(model.state == filters["state"].upper())
+  if filters.get("genre"):
+    query = query.filter(model.genres.any(filters["genre"]))
+  return query
+
+
+class InMemoryBackend:
+  # minimum difflib ratio for a fuzzy name match
+  similarity_threshold = 0.6
+
+  def __init__(self):
+    self._indexes = {}
+    self._lock = threading.Lock()
+
+  def invalidate(self, model=None):
+    with self._lock:
+      if model is None:
+        self._indexes.clear()
+      else:
+        self._indexes.pop(model, None)
+
+  def _index(self, model, session):
+    with self._lock:
+      index = self._indexes.get(model)
+      if index is None:
+        index = self._indexes[model] = self._build(model, session)
+      return index
+
+  def _build(self, model, session):
+    documents, postings = {}, {}
+    rows = session.query(model.id, model.name, model.city, model.state, model.genres)
+    for row in rows:
+      genres = [genre.lower() for genre in row.genres or []]
+      documents[row.id] = {
+        "name": (row.name or "").lower(),
+        "city": (row.city or "").lower(),
+        "state": (row.state or "").upper(),
+        "genres": genres
+      }
+      for token in tokenize(" ".join([row.name or "", row.city or "", row.state or ""] + genres)):
+        postings.setdefault(token, set()).add(row.id)
+    return documents, postings
+
+  def _score(self, document, term, hits):
+    score = 0.0
+    if term in document["name"]:
+      score += 2.0
+    score += hits
+    ratio = SequenceMatcher(None, term, document["name"]).ratio()
+    if ratio >= self.similarity_threshold:
+      score += ratio
+    return score
+
+  def search(self, model, base, term, filters, limit, offset):
+    documents, postings = self._index(model, base.session)
+    term = (term or "").strip().lower()
+    tokens = tokenize(term)
+
+    ranked = []
+    for entity_id, document in documents.items():
+      if filters.get("city") and document["city"] != filters["city"].lower():
+        continue
+      if filters.get("state") and document["state"] != filters["state"].upper():
+        continue
+      if filters.get("genre") and filters["genre"].lower() not in document["genres"]:
+        continue
+      if term:
+        hits = sum(1 for token in tokens if entity_id in postings.get(token, ()))
+        score = self._score(document, term, hits)
+        if not score:
+          continue
+      else:
+        score = 0.0
+      ranked.append((-score, document["name"], entity_id))
+    ranked.sort()
+
+    page = [entity_id for _, _, entity_id in ranked[offset:offset + limit]]
+    if not page:
+      return len(ranked), []
+    rows = {row.id: row for row in base.filter(model.id.in_(page))}
+    return len(ranked), [rows[entity_id] for entity_id in page if entity_id in rows]
+
+
+class SearchService:
+  """Searches with the backend fitting the database of the current app,
+  picked on first use and kept in app.extensions. A backend handed to the
+  constructor is used by every app."""
+
+  def __init__(self, db, backend=None):
+    self.db = db
+    self._backend = backend
+
+  @property
+  def backend(self):
+    backend = current_app.extensions.get("search")
+    if backend is None:
+      backend = self._backend
+      if backend is None:
+        if self.db.engine.dialect.name == "postgresql":
+          backend = PostgresBackend()
+        else:
+          backend = InMemoryBackend()
+      current_app.extensions["search"] = backend
+    return backend
+
+  def search(self, model, base, term, city=None, state=None, genre=None, limit=50, offset=0):
+    """Returns (total, rows) for the page of `base` rows matching `term`."""
+    filters = {"city": city, "state": state, "genre": genre}
+    return self.backend.search(model, base, (term or "").strip(), filters, limit, offset)
+
+  def invalidate(self, model=None):
+    # the PostgreSQL index is maintained by triggers, only the in-process
+    # fallback has to be told about writes
+    invalidate = getattr(self.backend, "invalidate", None)
+    if invalidate is not None:
+      invalidate(model)
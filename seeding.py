@@ -0,0 +1,128 @@
+from datetime import timedelta
+from itertools import islice
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# Generates venues, artists and shows that look like the real thing, for
+# benchmarks and local development. Output is reproducible for a given
+# random.Random. Shows are spread over the last year and the next six
+# months, and they favour some venues and artists over others the way real
+# bookings do, so detail pages range from empty to very long.
+
+CITIES = (
+  ("New York", "NY"), ("Brooklyn", "NY"), ("Los Angeles", "CA"), ("San Francisco", "CA"),
+  ("Oakland", "CA"), ("San Diego", "CA"), ("Chicago", "IL"), ("Houston", "TX"),
+  ("Austin", "TX"), ("Dallas", "TX"), ("Phoenix", "AZ"), ("Philadelphia", "PA"),
+  ("Pittsburgh", "PA"), ("Seattle", "WA"), ("Portland", "OR"), ("Denver", "CO"),
+  ("Boston", "MA"), ("Nashville", "TN"), ("Memphis", "TN"), ("New Orleans", "LA"),
+  ("Atlanta", "GA"), ("Miami", "FL"), ("Orlando", "FL"), ("Detroit", "MI"),
+  ("Minneapolis", "MN"), ("Kansas City", "MO"), ("St. Louis", "MO"), ("Las Vegas", "NV"),
+  ("Salt Lake City", "UT"), ("Washington", "DC"), ("Baltimore", "MD"), ("Charlotte", "NC"),
+)
+
+GENRES = (
+  "Alternative", "Blues", "Classical", "Country", "Electronic", "Folk", "Funk",
+  "Hip-Hop", "Heavy Metal", "Instrumental", "Jazz", "Musical Theatre", "Pop",
+  "Punk", "R&B", "Reggae", "Rock n Roll", "Soul", "Other",
+)
+
+ADJECTIVES = (
+  "Blue", "Golden", "Velvet", "Electric", "Silver", "Midnight", "Crimson", "Wild",
+  "Rusty", "Neon", "Hollow", "Lucky", "Broken", "Quiet", "Burning", "Little",
+  "Grand", "Lonesome", "Paper", "Iron", "Copper", "Drifting", "Howling", "Secret",
+)
+
+NOUNS = (
+  "Lantern", "Owl", "Anchor", "Harbor", "Fox", "Orchard", "Canyon", "Magpie",
+  "Engine", "Comet", "Raven", "Garden", "River", "Tiger", "Mirror", "Prairie",
+  "Crow", "Compass", "Meadow", "Wolf", "Signal", "Pine", "Echo", "Tide",
+)
+
+VENUE_KINDS = ("Lounge", "Hall", "Room", "Club", "Tavern", "Ballroom", "Theater", "Saloon", "Cafe")
+
+STREETS = ("Main St", "Market St", "Mission St", "Broadway", "Valencia St", "Oak Ave", "Elm St", "2nd Ave")
+
+
+def chunked(rows, size):
+  """Splits an iterable into lists of at most `size` items."""
+  rows = iter(rows)
+  while True:
+    chunk = list(islice(rows, size))
+    if not chunk:
+      return
+    yield chunk
+
+
+def _slug(name):
+  return "".join(c if c.isalnum() else "-" for c in name.lower()).strip("-")
+
+
+def _phone(rng):
+  return f"{rng.randint(201, 989)}-555-{rng.randint(0, 9999):04d}"
+
+
+def _common(rng, kind, number, name):
+  city, state = rng.choice(CITIES)
+  slug = _slug(name)
+  return {
+    "name": name,
+    "city": city,
+    "state": state,
+    "phone": _phone(rng),
+    "genres": rng.sample(GENRES, rng.randint(1, 3)),
+    "image_link": f"https://picsum.photos/seed/{kind}-{number}/300/300",
+    "website": f"https://www.{slug}.example.com",
+    "facebook_link": f"https://www.facebook.com/{slug}",
+  }
+
+
+def venue_rows(count, rng):
+  for number in range(1, count + 1):
+    name = f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(VENUE_KINDS)}"
+    row = _common(rng, "venue", number, name)
+    seeking = rng.random() < 0.3
+    row.update({
+      "address": f"{rng.randint(1, 3999)} {rng.choice(STREETS)}",
+      "seeking_talent": seeking,
+      "seeking_description": "Looking for local acts on weeknights." if seeking else None,
+    })
+    yield row
+
+
+def artist_rows(count, rng):
+  for number in range(1, count + 1):
+    name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}s"
+    if rng.random() < 0.5:
+      name = f"The {name}"
+    row = _common(rng, "artist", number, name)
+    seeking = rng.random() < 0.4
+    row.update({
+      "seeking_venue": seeking,
+      "seeking_description": "Touring this season, get in touch." if seeking else None,
+    })
+    yield row
+
+
+def _popular(rng, ids):
+  # skewed towards the head of `ids`: a tenth of them gets nearly half the
+  # shows, and the tail only a few each
+  return ids[int(len(ids) * rng.random() ** 3)]
+
+
+def show_rows(count, venue_ids, artist_ids, rng, now):
+  # shuffled copies so popularity does not follow insertion order
+  venue_ids, artist_ids = list(venue_ids), list(artist_ids)
+  rng.shuffle(venue_ids)
+  rng.shuffle(artist_ids)
+  for _ in range(count):
+    # evening slots, a year back to six months ahead
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=rng.randint(-365, 180))
+    start_time = day + timedelta(hours=rng.choice((18, 19, 20, 21, 22)), minutes=rng.choice((0, 30)))
+    yield {
+      "venue_id": _popular(rng, venue_ids),
+      "artist_id": _popular(rng, artist_ids),
+      "start_time": start_time,
+      "is_past": start_time <= now,
+    }
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+
+#----------------------------------------------------------------------------#
+# Cold start.
+#----------------------------------------------------------------------------#
+
+# A fresh worker pays for compiling every template on its first render and
+# for opening database connections on its first requests. Compiled templates
+# are kept on disk (JINJA_BYTECODE_CACHE_DIR, the instance folder by default)
+# and shared by all workers and restarts. warm_up() fills that cache, opens
+# the connection pools and loads the babel locale data; `flask warmup` runs
+# it after a deploy, and a server hook can run it in each new worker.
+
+
+def enable_bytecode_cache(app):
+  """Stores compiled templates on disk, unless JINJA_BYTECODE_CACHE is off."""
+  if not app.config.get("JINJA_BYTECODE_CACHE", True):
+    return None
+  directory = app.config.get("JINJA_BYTECODE_CACHE_DIR") or os.path.join(app.instance_path, "jinja")
+  os.makedirs(directory, exist_ok=True)
+  # the bytecode depends on the extensions too (HTML_MINIFY rewrites the
+  # templates), not only on the source the cache checks
+  extensions = ",".join(sorted(app.jinja_env.extensions))
+  variant = hashlib.sha1(extensions.encode("utf-8")).hexdigest()[:8]
+  app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory, f"__fyyur_{variant}_%s.cache")
+  return app.jinja_env.bytecode_cache
+
+
+def compile_templates(app):
+  """Loads every template, compiling those not in the bytecode cache yet.
+  Returns the names of the templates loaded."""
+  names = app.jinja_env.list_templates(filter_func=lambda name: not name.startswith("."))
+  for name in names:
+    app.jinja_env.get_template(name)
+  return names
+
+
+def touch_pools(db, app):
+  """Opens every connection the pools keep, primary and replica, so the
+  first requests do not wait for connects. Returns connections per bind."""
+  binds = [None] + list(app.config.get("SQLALCHEMY_BINDS") or {})
+  opened = {}
+  for bind in binds:
+    engine = db.get_engine(app, bind)
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+      for _ in range(size):
+        connection = engine.connect()
+        connection.execute(text("SELECT 1"))
+        connections.append(connection)
+    finally:
+      # back to the pool, which keeps them open
+      for connection in connections:
+        connection.close()
+    opened[bind or "primary"] = len(connections)
+  return opened
+
+
+def warm_up(app, db):
+  """Runs every step above; returns what each did and how long it took."""
+  report = {}
+  with app.app_context():
+    started = time.perf_counter()
+    report["templates"] = len(compile_templates(app))
+    report["templates_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    # the first formatted date loads the locale data from disk
+    app.jinja_env.filters["datetime"](datetime.utcnow(), "full")
+    report["locale_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    report["connections"] = touch_pools(db, app)
+    report["connections_ms"] = round((time.perf_counter() - started) * 1000, 1)
+  return report
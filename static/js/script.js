@@ -23,7 +23,40 @@ const handleDelete = (resource) => {
     })
 }
 
+// Lists ending in a ".more-items" item load their next page when it scrolls
+// into view; the item links to the full next page for browsers without JS.
+const loadMoreOnScroll = (listSelector) => {
+  const list = document.querySelector(listSelector);
+  if (!list || !("IntersectionObserver" in window)) return;
+
+  const observer = new IntersectionObserver((entries) => {
+    entries.forEach((entry) => {
+      if (!entry.isIntersecting) return;
+      const more = entry.target;
+      observer.unobserve(more);
+      fetch(more.dataset.next)
+        .then(response => response.text())
+        .then(html => {
+          more.insertAdjacentHTML("beforebegin", html);
+          more.remove();
+          observeMore();
+        })
+        .catch(error => {
+          // leave the link for the reader to follow by hand
+          console.error(error)
+        })
+    })
+  }, { rootMargin: "400px" });
+
+  const observeMore = () => {
+    const more = list.querySelector(".more-items");
+    if (more) observer.observe(more);
+  }
+  observeMore();
+}
+
 window.onload = () => {
+  loadMoreOnScroll(".artist-items")
   if (window.location.pathname.includes("artist")) {
     let url = window.location.pathname.replace("/edit", "")
     attachClickHandler(".delete-artist", (e) => {
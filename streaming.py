@@ -0,0 +1,75 @@
+import csv
+import json
+from datetime import date, datetime
+
+#----------------------------------------------------------------------------#
+# Streamed JSON encoding.
+#----------------------------------------------------------------------------#
+
+# Large result sets are encoded one row at a time and handed to a streamed
+# Response as a generator, so the encoded document is never held in memory.
+
+
+def json_default(value):
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+  return json.dumps(value, default=json_default, separators=(",", ":"))
+
+
+def json_page(items, **meta):
+  """Yields the JSON document {"data": [...items], **meta} in chunks."""
+  yield '{"data":['
+  for i, item in enumerate(items):
+    yield ("," if i else "") + dumps(item)
+  yield "]"
+  for key, value in meta.items():
+    yield "," + dumps(key) + ":" + dumps(value)
+  yield "}"
+
+#----------------------------------------------------------------------------#
+# NDJSON and CSV rows.
+#----------------------------------------------------------------------------#
+
+# Exports write one line per row so they can be streamed straight from a
+# server side cursor. In CSV, lists are joined with ";" and booleans written
+# as true/false, the format read back by the importer.
+
+
+class _Echo:
+  # file-like object handing csv.writer output back to the caller
+  def write(self, value):
+    return value
+
+
+def _csv_value(value):
+  if value is None:
+    return ""
+  if isinstance(value, bool):
+    return "true" if value else "false"
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  if isinstance(value, (list, tuple)):
+    return ";".join(str(item) for item in value)
+  return value
+
+
+def ndjson_lines(columns, rows):
+  for row in rows:
+    yield dumps(dict(zip(columns, row))) + "\n"
+
+
+def csv_lines(columns, rows):
+  writer = csv.writer(_Echo())
+  yield writer.writerow(columns)
+  for row in rows:
+    yield writer.writerow([_csv_value(value) for value in row])
+
+
+FORMATS = {
+  "ndjson": (ndjson_lines, "application/x-ndjson"),
+  "csv": (csv_lines, "text/csv"),
+}
@@ -0,0 +1,86 @@
+import urllib.error
+import urllib.request
+
+from flask import current_app
+
+from extensions import fragment_cache, jobs, response_cache, search_service
+from images import ImageFetchError, open_url
+from jobs import PermanentJobError
+from models import Artist, Show, Venue, db
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+
+# Keys of the cached pages that render a venue or an artist: their own page,
+# the listings, and the pages of their counterparts in shows.
+
+def venue_pages(venue_id):
+  artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+  return ["venues", "shows", f"venue:{venue_id}"] + [f"artist:{row.artist_id}" for row in artist_ids]
+
+def artist_pages(artist_id):
+  venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return ["artists", "artists-page", "shows", f"artist:{artist_id}"] + [f"venue:{row.venue_id}" for row in venue_ids]
+
+# Prefixes of the cached template fragments of a venue or artist, dropped
+# with it when it is deleted or edited. See FragmentCache.
+
+def venue_fragments(venue_id):
+  return [f"venue:{venue_id}:"]
+
+def artist_fragments(artist_id):
+  return [f"artist:{artist_id}:"]
+
+#----------------------------------------------------------------------------#
+# Jobs.
+#----------------------------------------------------------------------------#
+
+# Side effects of the write handlers, run after their commit by the job
+# queue. Show counters are not among them: they change in the transaction
+# of the write, see count_shows.
+
+SEARCHABLE = {"Venue": Venue, "Artist": Artist}
+
+@jobs.handler("invalidate_pages")
+def invalidate_pages(keys=(), venue_id=None, artist_id=None):
+  # the pages of a venue or artist are looked up when the job runs
+  keys = list(keys)
+  if venue_id is not None:
+    keys += venue_pages(venue_id)
+    fragment_cache.invalidate(*venue_fragments(venue_id))
+  if artist_id is not None:
+    keys += artist_pages(artist_id)
+    fragment_cache.invalidate(*artist_fragments(artist_id))
+  response_cache.invalidate(*keys)
+
+@jobs.handler("refresh_search")
+def refresh_search(model):
+  search_service.invalidate(SEARCHABLE[model])
+
+@jobs.handler("validate_image_link")
+def validate_image_link(model, id):
+  # raises when the link does not answer with an image
+  entity = SEARCHABLE[model].query.get(id)
+  if entity is None or not entity.image_link:
+    return
+  timeout = current_app.config.get("IMAGE_CHECK_TIMEOUT", 5)
+  for method in ("HEAD", "GET"):
+    try:
+      # the image proxy's guard: public addresses only, redirects included
+      with open_url(urllib.request.Request(entity.image_link, method=method), timeout=timeout) as response:
+        content_type = response.headers.get("Content-Type", "")
+        break
+    except urllib.error.HTTPError as error:
+      # some hosts refuse HEAD, and server errors may pass
+      if error.code == 405 and method == "HEAD":
+        continue
+      if error.code >= 500:
+        raise
+      raise PermanentJobError(f"{model} {id} image_link {entity.image_link} answered {error.code}")
+    except ValueError as error:
+      raise PermanentJobError(f"{model} {id} image_link {entity.image_link} is not a URL: {error}")
+    except ImageFetchError as error:
+      raise PermanentJobError(f"{model} {id} image_link {error}")
+  if not content_type.startswith("image/"):
+    raise PermanentJobError(f"{model} {id} image_link {entity.image_link} is {content_type or 'untyped'}, not an image")
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+from sqlalchemy import event
+
+# Settings are read when config.py is imported: the tests run on an
+# in-memory SQLite database unless TEST_DATABASE_URL names another one.
+os.environ.setdefault("TEST_DATABASE_URL", "sqlite://")
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+
+@pytest.fixture
+def app():
+  """An app of the testing profile with empty tables, in its app context."""
+  app = create_app("testing")
+  with app.app_context():
+    db.create_all()
+    yield app
+    db.session.remove()
+    db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+  """The SQL statements run while the test runs, in order."""
+  executed = []
+
+  def record(connection, cursor, statement, parameters, context, executemany):
+    executed.append(statement)
+
+  event.listen(db.engine, "before_cursor_execute", record)
+  yield executed
+  event.remove(db.engine, "before_cursor_execute", record)
@@ -0,0 +1,140 @@
+import re
+
+from cache import CacheState, LRUCache, RedisCache
+from extensions import response_cache
+from models import Venue, db
+
+
+class StandInRedis:
+  """The part of the redis-py client RedisCache uses, kept in a dict."""
+
+  def __init__(self):
+    self.values = {}
+    self.expiries = {}
+
+  def get(self, key):
+    return self.values.get(key)
+
+  def set(self, key, value, ex=None):
+    self.values[key] = value.encode("utf-8") if isinstance(value, str) else value
+    self.expiries[key] = ex
+
+  def delete(self, *keys):
+    for key in keys:
+      self.values.pop(key, None)
+
+  def scan_iter(self, match="*"):
+    pattern = re.compile(redis_glob(match), re.DOTALL)
+    return [key for key in list(self.values) if pattern.fullmatch(key)]
+
+
+def redis_glob(match):
+  """Translates a Redis MATCH pattern to a regular expression: * ? and
+  [...] as in fnmatch, but a backslash makes the next character literal."""
+  parts, chars = [], iter(match)
+  for char in chars:
+    if char == "\\":
+      parts.append(re.escape(next(chars, "\\")))
+    elif char == "*":
+      parts.append(".*")
+    elif char == "?":
+      parts.append(".")
+    elif char == "[":
+      members = []
+      for char in chars:
+        if char == "]":
+          break
+        members.append(re.escape(next(chars, "\\") if char == "\\" else char))
+      parts.append(f"[{''.join(members)}]")
+    else:
+      parts.append(re.escape(char))
+  return "".join(parts)
+
+
+def test_redis_cache_prefixes_its_keys():
+  client = StandInRedis()
+  cache = RedisCache(client, prefix="test:", default_ttl=30)
+  cache.set("venue:1", b"page")
+  cache.set("venue:1?page=2", b"second page", ttl=5)
+  cache.set("venues", b"listing")
+
+  assert client.get("test:venue:1") == b"page"
+  assert client.expiries == {"test:venue:1": 30, "test:venue:1?page=2": 5, "test:venues": 30}
+  cache.delete_prefix("venue:1?")
+  assert cache.get("venue:1?page=2") is None and cache.get("venue:1") == b"page"
+  cache.clear()
+  assert client.values == {}
+
+
+def test_invalidating_a_page_keeps_pages_with_longer_ids(app):
+  client = StandInRedis()
+  app.extensions["response_cache"] = CacheState(RedisCache(client))
+  for key in ["venue:1", "venue:1?page=2", "venue:10", "venue:10?page=2", "venue:1x"]:
+    app.extensions["response_cache"].backend.set(key, b"page")
+
+  response_cache.invalidate("venue:1")
+  assert sorted(client.values) == ["fyyur:venue:10", "fyyur:venue:10?page=2", "fyyur:venue:1x"]
+
+
+def test_lru_cache_evicts_least_recently_used_over_its_byte_cap():
+  cache = LRUCache(max_bytes=10, default_ttl=0)
+  cache.set("a", b"aaaa")
+  cache.set("b", b"bbbb")
+  cache.get("a")
+  cache.set("c", b"cccc")
+  assert cache.get("b") is None
+  assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+  assert cache.bytes == 8
+  assert not cache.set("d", b"x" * 11)
+
+
+def test_pages_are_served_from_redis_until_a_write(app, client, statements):
+  app.extensions["response_cache"] = CacheState(RedisCache(StandInRedis()))
+  db.session.add(Venue(name="The Musical Hop", city="San Francisco", state="CA", genres=["Jazz"]))
+  db.session.commit()
+
+  first = client.get("/venues")
+  rendered = len(statements)
+  del statements[:]
+  second = client.get("/venues")
+  assert first.status_code == second.status_code == 200
+  assert second.data == first.data
+  # only the fingerprint behind the ETag, no rendering
+  assert len(statements) < rendered
+  assert response_cache.stats()["hits"] == 1
+
+  venue = Venue.query.one()
+  response = client.post(f"/venues/{venue.id}/edit", data={
+    "name": "The Musical Hop Reopened", "city": "San Francisco", "state": "CA", "address": "1015 Folsom Street",
+    "phone": "123-123-1234", "genres": ["Jazz"], "facebook_link": "", "seeking_description": ""
+  })
+  assert response.status_code == 302
+  assert response_cache.stats()["invalidations"] > 0
+  assert b"The Musical Hop Reopened" in client.get("/venues").data
+
+
+def test_cached_pages_follow_their_etag(app, client):
+  # a write this worker was not told about, as one made by another worker
+  app.extensions["response_cache"] = CacheState(LRUCache())
+  db.session.add(Venue(name="The Musical Hop", city="San Francisco", state="CA", genres=["Jazz"]))
+  db.session.commit()
+  first = client.get("/venues")
+
+  db.session.add(Venue(name="Park Square Live Music & Coffee", city="San Francisco", state="CA", genres=["Jazz"]))
+  db.session.commit()
+  second = client.get("/venues")
+  assert second.headers["ETag"] != first.headers["ETag"]
+  assert b"Park Square Live Music" in second.data
+  assert response_cache.stats()["hits"] == 0
+
+
+def test_a_new_release_does_not_match_old_etags(app, client):
+  db.session.add(Venue(name="The Musical Hop", city="San Francisco", state="CA", genres=["Jazz"]))
+  db.session.commit()
+  assert app.config["ETAG_SALT"]
+  first = client.get("/venues")
+
+  app.config["ETAG_SALT"] = "next release"
+  second = client.get("/venues", headers={"If-None-Match": first.headers["ETag"]})
+  assert second.status_code == 200
+  assert second.headers["ETag"] != first.headers["ETag"]
@@ -0,0 +1,76 @@
+import gzip
+
+import pytest
+
+from compression import negotiate
+from models import Venue, db
+
+
+@pytest.fixture
+def venues(app):
+  db.session.add_all([
+    Venue(name=f"The Musical Hop {i}", city="San Francisco", state="CA", genres=["Jazz"]) for i in range(300)
+  ])
+  db.session.commit()
+
+
+@pytest.mark.parametrize("accept_encoding, brotli_available, encoding", [
+  ("gzip, deflate, br", True, "br"),
+  ("gzip, deflate, br", False, "gzip"),
+  ("gzip;q=1.0, br;q=0.5", True, "gzip"),
+  ("*", True, "br"),
+  ("br;q=0, gzip;q=0", True, None),
+  ("identity", True, None),
+  (None, True, None),
+])
+def test_encodings_are_negotiated(accept_encoding, brotli_available, encoding):
+  assert negotiate(accept_encoding, brotli_available) == encoding
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_pages_are_compressed_as_accepted(venues, client, encoding):
+  # brotli is optional, see compression.py
+  decompress = pytest.importorskip("brotli").decompress if encoding == "br" else gzip.decompress
+  identity = client.get("/venues")
+  response = client.get("/venues", headers={"Accept-Encoding": encoding})
+  assert identity.headers.get("Content-Encoding") is None
+  assert response.headers["Content-Encoding"] == encoding
+  assert "Accept-Encoding" in response.headers["Vary"] and "Accept-Encoding" in identity.headers["Vary"]
+  assert decompress(response.data) == identity.data
+  assert len(response.data) < len(identity.data)
+
+
+def test_compressed_pages_carry_a_weak_etag(venues, client):
+  identity = client.get("/venues")
+  response = client.get("/venues", headers={"Accept-Encoding": "gzip"})
+  assert not identity.headers["ETag"].startswith("W/")
+  assert response.headers["ETag"] == "W/" + identity.headers["ETag"]
+
+  for etag in (response.headers["ETag"], identity.headers["ETag"]):
+    revalidated = client.get("/venues", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == response.headers["ETag"]
+    assert revalidated.headers.get("Content-Encoding") is None
+
+
+def test_streamed_exports_are_compressed_as_they_go(venues, client):
+  # each read to its end before the next request, as the stream holds the
+  # request context
+  identity = client.get("/export/venues").data
+  response = client.get("/export/venues", headers={"Accept-Encoding": "gzip"})
+  assert response.headers["Content-Encoding"] == "gzip"
+  assert "Content-Length" not in response.headers
+  assert len(identity) > 16 * 1024
+  assert gzip.decompress(response.data) == identity
+
+
+def test_head_requests_small_responses_and_metrics_are_not_compressed(venues, client):
+  head = client.head("/venues", headers={"Accept-Encoding": "gzip"})
+  assert head.status_code == 200 and head.headers.get("Content-Encoding") is None
+
+  metrics = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+  assert metrics.status_code == 200 and metrics.headers.get("Content-Encoding") is None
+  assert metrics.data.startswith(b"#")
+
+  stats = client.get("/cache/stats", headers={"Accept-Encoding": "gzip"})
+  assert len(stats.data) < 1024 and stats.headers.get("Content-Encoding") is None
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Artist, Show, Venue, db, recount_shows, rollover_shows
+
+LONG_AGO = datetime(2020, 1, 1)
+
+
+@pytest.fixture
+def listed(app):
+  """Two venues and two artists with no shows, last updated long ago."""
+  venues = [Venue(name=name, city="San Francisco", state="CA") for name in ("The Musical Hop", "The Dueling Pianos Bar")]
+  artists = [Artist(name=name, city="San Francisco", state="CA") for name in ("Guns N Petals", "Matt Quevedo")]
+  db.session.add_all(venues + artists)
+  db.session.commit()
+  ids = {"venues": [venue.id for venue in venues], "artists": [artist.id for artist in artists]}
+  age()
+  return ids
+
+
+def age():
+  for model in (Venue, Artist):
+    model.query.update({"updated_at": LONG_AGO}, synchronize_session=False)
+  db.session.commit()
+
+
+def counts(model, id):
+  db.session.expire_all()
+  entity = model.query.get(id)
+  return entity.upcoming_shows_count, entity.past_shows_count
+
+
+def touched(model, id):
+  db.session.expire_all()
+  return model.query.get(id).updated_at != LONG_AGO
+
+
+def test_inserted_and_deleted_shows_are_counted(listed):
+  venue, artist = listed["venues"][0], listed["artists"][0]
+  soon, earlier = datetime.utcnow() + timedelta(days=7), datetime.utcnow() - timedelta(days=7)
+  db.session.add_all([
+    Show(venue_id=venue, artist_id=artist, start_time=soon),
+    Show(venue_id=venue, artist_id=artist, start_time=soon),
+    Show(venue_id=venue, artist_id=artist, start_time=earlier),
+  ])
+  db.session.commit()
+  assert counts(Venue, venue) == counts(Artist, artist) == (2, 1)
+  assert touched(Venue, venue) and not touched(Venue, listed["venues"][1])
+
+  db.session.delete(Show.query.filter_by(is_past=True).one())
+  db.session.commit()
+  assert counts(Venue, venue) == counts(Artist, artist) == (2, 0)
+
+
+def test_reassigned_shows_move_between_counters(listed):
+  first, second = listed["venues"]
+  artist, other_artist = listed["artists"]
+  show = Show(venue_id=first, artist_id=artist, start_time=datetime.utcnow() + timedelta(days=7))
+  db.session.add(show)
+  db.session.commit()
+  show_id = show.id
+  age()
+
+  Show.query.get(show_id).venue_id = second
+  db.session.commit()
+  assert counts(Venue, first) == (0, 0) and counts(Venue, second) == (1, 0)
+  assert touched(Venue, first) and touched(Venue, second)
+  # the artist's counts did not change
+  assert counts(Artist, artist) == (1, 0) and not touched(Artist, artist)
+
+  age()
+  Show.query.get(show_id).artist_id = other_artist
+  db.session.commit()
+  assert counts(Artist, artist) == (0, 0) and counts(Artist, other_artist) == (1, 0)
+  assert not touched(Venue, second)
+
+
+def test_rollover_moves_started_shows_to_the_past(listed):
+  venue, artist = listed["venues"][0], listed["artists"][0]
+  start_time = datetime.utcnow() + timedelta(hours=1)
+  db.session.add_all([
+    Show(venue_id=venue, artist_id=artist, start_time=start_time),
+    Show(venue_id=venue, artist_id=artist, start_time=start_time + timedelta(days=7)),
+  ])
+  db.session.commit()
+  age()
+
+  assert rollover_shows(now=start_time - timedelta(minutes=1)) == 0
+  assert not touched(Venue, venue)
+  assert rollover_shows(now=start_time + timedelta(hours=2), batch_size=1) == 1
+  assert counts(Venue, venue) == counts(Artist, artist) == (1, 1)
+  assert touched(Venue, venue) and touched(Artist, artist)
+  assert Show.query.filter_by(is_past=True).count() == 1
+
+
+def test_recount_leaves_correct_counters_alone(listed):
+  venue, artist = listed["venues"][0], listed["artists"][0]
+  db.session.add(Show(venue_id=venue, artist_id=artist, start_time=datetime.utcnow() + timedelta(days=7)))
+  db.session.commit()
+  Venue.query.filter_by(id=venue).update({"upcoming_shows_count": 5}, synchronize_session=False)
+  db.session.commit()
+  age()
+
+  recount_shows()
+  assert counts(Venue, venue) == (1, 0) and touched(Venue, venue)
+  assert not touched(Artist, artist) and not touched(Venue, listed["venues"][1])
+
+
+def test_shows_created_through_the_form_are_counted(listed, client):
+  venue, artist = listed["venues"][0], listed["artists"][0]
+  for start_time, message in (("2030-06-01 20:00:00", "Show was successfully listed!"),
+                              ("not a date", "An error occurred. Show could not be listed.")):
+    response = client.post("/shows/create", data={"venue_id": venue, "artist_id": artist, "start_time": start_time})
+    assert response.status_code == 200 and message in response.get_data(as_text=True)
+  assert counts(Venue, venue) == counts(Artist, artist) == (1, 0)
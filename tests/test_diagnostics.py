@@ -0,0 +1,59 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from diagnostics import QueryBudgetExceeded, query_budget, statement_shape
+from models import db
+
+
+@pytest.fixture
+def counting_view(app):
+  """GET /statements/<n> runs n statements on a budget of 2."""
+  @query_budget(2)
+  def statements(n):
+    for number in range(n):
+      db.session.execute(text(f"SELECT {number}"))
+    return "ok"
+
+  app.add_url_rule("/statements/<int:n>", "statements", statements)
+  return app.test_client()
+
+
+def test_within_budget(counting_view):
+  assert counting_view.get("/statements/2").status_code == 200
+
+
+def test_over_budget_raises_in_testing(counting_view):
+  with pytest.raises(QueryBudgetExceeded) as raised:
+    counting_view.get("/statements/3")
+  assert "statements ran 3 SQL statements, its budget is 2" in str(raised.value)
+  assert "3 x SELECT ?" in str(raised.value)
+
+
+def test_over_budget_only_logs_outside_testing(app, counting_view, caplog):
+  app.testing = False
+  with caplog.at_level(logging.WARNING, logger="fyyur.queries"):
+    assert counting_view.get("/statements/3").status_code == 200
+  assert "its budget is 2" in caplog.text
+
+
+def test_repeated_shapes_are_reported_as_n_plus_one(app, caplog):
+  app.config["N_PLUS_ONE_THRESHOLD"] = 3
+
+  def lookups():
+    for number in range(3):
+      db.session.execute(text("SELECT :number"), {"number": number})
+    return "ok"
+
+  app.add_url_rule("/lookups", "lookups", lookups)
+  with caplog.at_level(logging.WARNING, logger="fyyur.queries"):
+    assert app.test_client().get("/lookups").status_code == 200
+  assert "possible N+1 in lookups: 3 statements of one shape" in caplog.text
+  assert "test_diagnostics.py" in caplog.text
+
+
+def test_statement_shapes_ignore_literals_and_in_list_lengths():
+  assert statement_shape("SELECT * FROM \"Show\" WHERE id IN (?, ?, ?) AND name = 'x'") == \
+    statement_shape("SELECT * FROM \"Show\"\n WHERE id IN (?) AND name = 'y'")
+  assert statement_shape("SELECT 1") != statement_shape("SELECT 1 FROM \"Venue\"")
@@ -0,0 +1,67 @@
+import pytest
+
+from app import create_app
+from config import get_config
+from models import Venue, db
+
+
+@pytest.fixture
+def workers(tmp_path):
+  """Two apps on one database, each with its own lru fragment cache, as two
+  worker processes have."""
+  apps = []
+  for _ in range(2):
+    config = get_config("testing")
+    config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'fyyur.db'}"
+    config.FRAGMENT_CACHE_TYPE = "lru"
+    apps.append(create_app(config))
+  with apps[0].app_context():
+    db.create_all()
+    for name, city in (("Alpha Hall", "San Francisco"), ("Beta Club", "San Francisco"), ("Gamma Room", "Oakland")):
+      db.session.add(Venue(name=name, city=city, state="CA", genres=["Jazz"]))
+    db.session.commit()
+  yield apps
+  with apps[0].app_context():
+    db.drop_all()
+
+
+def areas_of(client, name):
+  # the areas whose list shows the venue called `name`
+  page = client.get("/venues").data.decode("utf-8")
+  areas = []
+  for section in page.split("<h3>")[1:]:
+    heading, venues = section.split("</h3>", 1)
+    if f"<h5>{name}</h5>" in venues:
+      areas.append(heading.strip())
+  return areas
+
+
+def venue_id(app, name):
+  with app.app_context():
+    return Venue.query.filter_by(name=name).one().id
+
+
+def test_moved_venue_leaves_its_area_in_other_workers(workers):
+  writer, reader = (app.test_client() for app in workers)
+  assert areas_of(reader, "Alpha Hall") == ["San Francisco, CA"]
+
+  response = writer.post(f"/venues/{venue_id(workers[0], 'Alpha Hall')}/edit", data={
+    "name": "Alpha Hall", "city": "Los Angeles", "state": "CA", "address": "1 Main Street",
+    "phone": "123-123-1234", "genres": ["Jazz"], "facebook_link": "", "seeking_description": ""
+  })
+  assert response.status_code == 302
+
+  for _ in range(2):
+    assert areas_of(reader, "Alpha Hall") == ["Los Angeles, CA"]
+  assert areas_of(reader, "Beta Club") == ["San Francisco, CA"]
+
+
+def test_deleted_venue_leaves_its_area_in_other_workers(workers):
+  writer, reader = (app.test_client() for app in workers)
+  assert areas_of(reader, "Alpha Hall") == ["San Francisco, CA"]
+
+  response = writer.delete(f"/venues/{venue_id(workers[0], 'Alpha Hall')}")
+  assert response.status_code == 200
+
+  assert areas_of(reader, "Alpha Hall") == []
+  assert areas_of(reader, "Beta Club") == ["San Francisco, CA"]
@@ -0,0 +1,176 @@
+import http.server
+import io
+import os
+import socket
+import threading
+
+import pytest
+from PIL import Image
+
+from extensions import image_proxy
+from images import IMMUTABLE, SIZES, DiskCache, ImageFetchError, check_public_url, open_url
+from models import Venue, db
+
+LINK = "https://images.example.com/hall.png"
+
+
+def png(width, height):
+  output = io.BytesIO()
+  Image.new("RGB", (width, height), "purple").save(output, "PNG")
+  return output.getvalue()
+
+
+@pytest.fixture
+def fetched(app, tmp_path):
+  """Serves the proxy from an offline fetcher and a temporary disk cache;
+  lists the links fetched."""
+  links = []
+
+  def fetcher(link):
+    links.append(link)
+    if "missing" in link:
+      raise ImageFetchError(f"{link} answered 404")
+    return png(1200, 900), "image/png"
+
+  state = app.extensions["image_proxy"]
+  state.fetcher = fetcher
+  state.cache = DiskCache(str(tmp_path))
+  return links
+
+
+def proxied(link, size):
+  return image_proxy.url(link, size)
+
+
+def test_scales_images_into_their_box_once(app, client, fetched):
+  with app.test_request_context():
+    url = proxied(LINK, "tile")
+
+  response = client.get(url)
+  assert response.status_code == 200
+  assert response.mimetype == "image/png"
+  assert response.headers["Cache-Control"] == IMMUTABLE
+  width, height = Image.open(io.BytesIO(response.data)).size
+  assert width <= SIZES["tile"][0] and height <= SIZES["tile"][1]
+
+  again = client.get(url)
+  assert again.data == response.data
+  assert fetched == [LINK]
+
+  revalidated = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+  assert revalidated.status_code == 304
+
+
+def test_refuses_unsigned_links_and_unknown_sizes(app, client, fetched):
+  with app.test_request_context():
+    url = proxied(LINK, "tile")
+  assert client.get(url.replace("tile", "detail")).status_code == 403
+  assert client.get(url.replace("images.example.com", "intranet")).status_code == 403
+  assert client.get(url.replace("tile", "poster")).status_code == 404
+  assert fetched == []
+
+
+def test_failed_fetches_are_retried_later(app, client, fetched):
+  with app.test_request_context():
+    url = proxied("https://images.example.com/missing.png", "detail")
+  response = client.get(url)
+  assert response.status_code == 502
+  assert response.headers["Cache-Control"] == "public, max-age=300"
+
+
+def test_pages_link_proxied_images(client, fetched):
+  venue = Venue(name="The Musical Hop", city="San Francisco", state="CA", genres=["Jazz"], image_link=LINK)
+  db.session.add(venue)
+  db.session.commit()
+  page = client.get(f"/venues/{venue.id}").data.decode("utf-8")
+  assert "/images/detail?url=https" in page
+  assert f'src="{LINK}"' not in page
+
+
+@pytest.mark.parametrize("link", [
+  "http://127.0.0.1/admin.png",
+  "http://10.0.0.8/image.png",
+  "http://[::1]/image.png",
+  "file:///etc/passwd",
+])
+def test_private_and_non_http_links_are_never_fetched(link):
+  with pytest.raises(ImageFetchError):
+    check_public_url(link)
+
+
+@pytest.fixture
+def rebinding(monkeypatch):
+  """Resolves images.example.com to a public address once and to loopback
+  after that, and routes connections to the public address to a local
+  server; lists the addresses connected to and the Host headers served."""
+  seen = {"connected": [], "hosts": []}
+
+  class Handler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+      seen["hosts"].append(self.headers["Host"])
+      if self.path == "/moved.png":
+        self.send_response(302)
+        self.send_header("Location", "http://127.0.0.1/admin.png")
+        self.end_headers()
+        return
+      body = png(10, 10)
+      self.send_response(200)
+      self.send_header("Content-Type", "image/png")
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, *args):
+      pass
+
+  server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  lookups = []
+  getaddrinfo, create_connection = socket.getaddrinfo, socket.create_connection
+
+  def resolve(host, port, *args, **kwargs):
+    if host != "images.example.com":
+      return getaddrinfo(host, port, *args, **kwargs)
+    lookups.append(host)
+    address = "93.184.216.34" if len(lookups) == 1 else "127.0.0.1"
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+  def connect(target, *args, **kwargs):
+    seen["connected"].append(target[0])
+    if target[0] == "93.184.216.34":
+      target = server.server_address
+    return create_connection(target, *args, **kwargs)
+
+  monkeypatch.setattr(socket, "getaddrinfo", resolve)
+  monkeypatch.setattr(socket, "create_connection", connect)
+  yield seen
+  server.shutdown()
+  server.server_close()
+
+
+def test_fetches_connect_to_the_checked_address(rebinding):
+  with open_url("http://images.example.com/hall.png") as response:
+    assert response.headers["Content-Type"] == "image/png"
+  assert rebinding["connected"] == ["93.184.216.34"]
+  assert rebinding["hosts"] == ["images.example.com"]
+
+
+def test_redirects_to_private_addresses_are_refused(rebinding):
+  with pytest.raises(ImageFetchError):
+    open_url("http://images.example.com/moved.png")
+  assert rebinding["connected"] == ["93.184.216.34"]
+
+
+def test_disk_cache_evicts_least_recently_read(tmp_path):
+  cache = DiskCache(str(tmp_path), max_bytes=250)
+  cache.put("tile a", b"a" * 100, "image/png")
+  cache.put("tile b", b"b" * 100, "image/png")
+  for directory, _, names in os.walk(tmp_path / "objects"):
+    for name in names:
+      os.utime(os.path.join(directory, name), (1, 1))
+  cache.get("tile a")
+  cache.put("tile c", b"c" * 100, "image/png")
+  assert cache.get("tile b") is None
+  assert cache.get("tile a")[2] == b"a" * 100
+  assert cache.get("tile c")[1] == "image/png"
@@ -0,0 +1,158 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import jobs
+from jobs import DONE, FAILED, QUEUED, RUNNING, PermanentJobError
+from models import Job, Venue, db
+
+
+@pytest.fixture
+def calls(app):
+  """Registers the handlers "record", "flaky" and "broken" for the test;
+  lists the payloads they were called with."""
+  received = []
+
+  def record(**payload):
+    received.append(payload)
+
+  def flaky(**payload):
+    received.append(payload)
+    raise ConnectionError("host did not answer")
+
+  def broken(**payload):
+    received.append(payload)
+    raise PermanentJobError("cannot succeed")
+
+  handlers = {"record": record, "flaky": flaky, "broken": broken}
+  jobs.handlers.update(handlers)
+  yield received
+  for name in handlers:
+    jobs.handlers.pop(name)
+
+
+def job(job_id):
+  db.session.expire_all()
+  return Job.query.get(job_id)
+
+
+def test_jobs_run_once_their_transaction_commits(calls):
+  queued = jobs.enqueue("record", venue_id=3)
+  assert calls == []
+  db.session.commit()
+  assert calls == [{"venue_id": 3}]
+  assert job(queued.id).status == DONE
+
+
+def test_rolled_back_jobs_never_run(calls):
+  jobs.enqueue("record", venue_id=3)
+  db.session.rollback()
+  db.session.commit()
+  assert calls == []
+  assert Job.query.count() == 0
+
+
+def test_unknown_handlers_are_refused(app):
+  with pytest.raises(ValueError):
+    jobs.enqueue("no such job")
+
+
+def test_failures_are_retried_with_backoff(calls):
+  queued = jobs.enqueue("flaky")
+  db.session.commit()
+  job_id = queued.id
+  failed = job(job_id)
+  assert (failed.status, failed.attempts) == (QUEUED, 1)
+  assert "ConnectionError: host did not answer" in failed.last_error
+  assert timedelta(seconds=1) < failed.run_after - datetime.utcnow() <= timedelta(seconds=2)
+
+  # not due yet
+  assert jobs.work() == 0
+  Job.query.filter_by(id=job_id).update({"run_after": datetime.utcnow() - timedelta(seconds=1)})
+  db.session.commit()
+  assert jobs.work() == 1
+  retried = job(job_id)
+  assert retried.attempts == 2
+  assert timedelta(seconds=3) < retried.run_after - datetime.utcnow() <= timedelta(seconds=4)
+
+
+def test_retries_stop_at_max_attempts(app, calls):
+  app.config["JOBS_MAX_ATTEMPTS"] = 1
+  queued = jobs.enqueue("flaky")
+  db.session.commit()
+  assert job(queued.id).status == FAILED
+
+
+def test_permanent_errors_fail_at_once(calls):
+  queued = jobs.enqueue("broken")
+  db.session.commit()
+  failed = job(queued.id)
+  assert (failed.status, failed.attempts) == (FAILED, 1)
+  assert "cannot succeed" in failed.last_error
+  assert failed.finished_at is not None
+
+
+def test_expired_leases_are_reclaimed(app, calls):
+  app.config["JOBS_LEASE_SECONDS"] = 60
+  stale = Job(name="record", payload='{"venue_id": 1}', status=RUNNING, attempts=1,
+              locked_at=datetime.utcnow() - timedelta(seconds=61))
+  held = Job(name="record", payload='{"venue_id": 2}', status=RUNNING, attempts=1,
+             locked_at=datetime.utcnow() - timedelta(seconds=30))
+  db.session.add_all([stale, held])
+  db.session.commit()
+  stale_id, held_id = stale.id, held.id
+
+  assert jobs.work() == 1
+  assert calls == [{"venue_id": 1}]
+  assert (job(stale_id).status, job(stale_id).attempts) == (DONE, 2)
+  assert job(held_id).status == RUNNING
+
+
+def test_young_jobs_are_left_to_their_process(calls):
+  db.session.add(Job(name="record", payload="{}"))
+  db.session.commit()
+  assert jobs.work(grace=60) == 0
+  assert jobs.work() == 1
+
+
+PRIVATE_LINK = "http://127.0.0.1/hall.png"
+
+
+def image_checks():
+  return [(row.payload, row.status, row.last_error) for row in Job.query.filter_by(name="validate_image_link")]
+
+
+def test_image_links_of_new_and_edited_venues_are_checked(client):
+  form = {
+    "name": "The Musical Hop", "city": "San Francisco", "state": "CA", "address": "1015 Folsom Street",
+    "phone": "123-123-1234", "genres": ["Jazz"], "facebook_link": "", "seeking_description": "",
+    "image_link": PRIVATE_LINK
+  }
+  assert client.post("/venues/create", data=form).status_code == 200
+  venue_id = Venue.query.one().id
+  [(payload, status, error)] = image_checks()
+  assert payload == f'{{"id": {venue_id}, "model": "Venue"}}'
+  # checked like the image proxy's links, no request leaves for a private address
+  assert status == FAILED and "non-public address 127.0.0.1" in error
+
+  # an unchanged link is not checked again
+  client.post(f"/venues/{venue_id}/edit", data=dict(form, name="The Musical Hop Reopened"))
+  assert len(image_checks()) == 1
+  client.post(f"/venues/{venue_id}/edit", data=dict(form, image_link="http://10.0.0.8/hall.png"))
+  assert len(image_checks()) == 2
+
+
+def test_image_links_of_imported_artists_are_checked(app, client):
+  app.config["IMPORT_TOKEN"] = "import-secret"
+  records = (
+    '{"name": "Guns N Petals", "city": "San Francisco", "state": "CA", "phone": "326-123-5000", '
+    '"genres": ["Rock n Roll"], "facebook_link": "https://www.facebook.com/GunsNPetals", "image_link": "%s"}\n'
+    '{"name": "Matt Quevedo", "city": "New York", "state": "NY", "phone": "300-400-5000", "genres": ["Jazz"], '
+    '"facebook_link": "https://www.facebook.com/mattquevedo923251523"}\n'
+  ) % PRIVATE_LINK
+  response = client.post("/import/artists", data={"file": (io.BytesIO(records.encode("utf-8")), "artists.ndjson")},
+                         headers={"Authorization": "Bearer import-secret"})
+  assert response.get_json()["inserted"] == 2, response.get_json()
+  [(payload, status, _)] = image_checks()
+  assert '"model": "Artist"' in payload and status == FAILED
@@ -0,0 +1,78 @@
+from extensions import search_service
+from models import Artist, Venue, db
+from search import InMemoryBackend
+
+
+def add(model, name, city="San Francisco", state="CA", genres=("Jazz",)):
+  entity = model(name=name, city=city, state=state, genres=list(genres))
+  db.session.add(entity)
+  db.session.commit()
+  return entity
+
+
+def search(model, term, **filters):
+  base = db.session.query(model.id, model.name)
+  count, rows = search_service.search(model, base, term, **filters)
+  return count, [row.name for row in rows]
+
+
+def test_sqlite_falls_back_to_the_in_process_index(app):
+  assert isinstance(search_service.backend, InMemoryBackend)
+
+
+def test_name_matches_rank_first(app):
+  add(Artist, "Matt Quevedo", city="New York", state="NY", genres=["Jazz"])
+  add(Artist, "The Wild Sax Band", genres=["Jazz", "Classical"])
+  add(Artist, "Guns N Petals", genres=["Rock n Roll"])
+
+  assert search(Artist, "band") == (1, ["The Wild Sax Band"])
+  # genres are indexed too, and equal scores sort by name
+  assert search(Artist, "jazz") == (2, ["Matt Quevedo", "The Wild Sax Band"])
+  assert search(Artist, "wild sax")[1][0] == "The Wild Sax Band"
+
+
+def test_misspelt_names_match(app):
+  add(Venue, "The Musical Hop")
+  add(Venue, "Park Square Live Music & Coffee")
+  assert search(Venue, "musicl hop") == (1, ["The Musical Hop"])
+
+
+def test_filters_and_paging(app):
+  for number in range(5):
+    add(Venue, f"Hall {number}", city="San Francisco", state="CA")
+  add(Venue, "Dueling Pianos Bar", city="New York", state="NY", genres=["Classical"])
+
+  assert search(Venue, "", city="new york") == (1, ["Dueling Pianos Bar"])
+  assert search(Venue, "", state="ca")[0] == 5
+  assert search(Venue, "", genre="classical") == (1, ["Dueling Pianos Bar"])
+  count, page = search(Venue, "hall", limit=2, offset=2)
+  assert (count, page) == (5, ["Hall 2", "Hall 3"])
+
+
+def test_writes_reach_the_index_through_the_search_form(client):
+  add(Artist, "Guns N Petals")
+  assert search(Artist, "petals")[0] == 1
+
+  response = client.post("/artists/create", data={
+    "name": "Petals Of Fire", "city": "Austin", "state": "TX", "phone": "512-555-0100",
+    "genres": ["Rock n Roll"], "facebook_link": "", "seeking_description": ""
+  })
+  assert response.status_code == 200
+
+  response = client.post("/artists/search", data={"search_term": "petals"})
+  assert response.status_code == 200
+  assert b"Guns N Petals" in response.data and b"Petals Of Fire" in response.data
+
+
+def test_the_artist_directory_filters_by_genre(client):
+  add(Artist, "Matt Quevedo", city="New York", state="NY", genres=["Jazz"])
+  add(Artist, "The Wild Sax Band", genres=["Classical", "Jazz"])
+  add(Artist, "Guns N Petals", genres=["Rock n Roll"])
+  add(Artist, "The Jazz Cats", genres=["Blues"])
+
+  response = client.get("/artists?genre=Jazz")
+  assert response.status_code == 200
+  assert b"Matt Quevedo" in response.data and b"The Wild Sax Band" in response.data
+  assert b"Guns N Petals" not in response.data and b"The Jazz Cats" not in response.data
+  page = client.get("/artists?genre=Jazz&state=CA").data
+  assert b"The Wild Sax Band" in page and b"Matt Quevedo" not in page
@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Artist, Show, Venue, db
+
+TOKEN = "import-secret"
+LATER = datetime(2030, 5, 21, 21, 30)
+
+
+@pytest.fixture
+def listed(app):
+  """A venue, an artist and a show between them; returns their ids."""
+  app.config["IMPORT_TOKEN"] = TOKEN
+  venue = Venue(
+    name="The Musical Hop", city="San Francisco", state="CA", address="1015 Folsom Street",
+    phone="123-123-1234", genres=["Jazz", "Reggae"], facebook_link="https://www.facebook.com/TheMusicalHop",
+    seeking_talent=True, seeking_description="We are on the lookout for a local artist."
+  )
+  artist = Artist(
+    name="Guns N Petals", city="San Francisco", state="CA", phone="326-123-5000", genres=["Rock n Roll"],
+    facebook_link="https://www.facebook.com/GunsNPetals", seeking_venue=False
+  )
+  db.session.add_all([venue, artist])
+  db.session.flush()
+  db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=LATER))
+  db.session.commit()
+  return {"venue": venue.id, "artist": artist.id}
+
+
+def upload(client, table, text, filename, token=TOKEN):
+  headers = {"Authorization": f"Bearer {token}"} if token else {}
+  return client.post(
+    f"/import/{table}", data={"file": (io.BytesIO(text.encode("utf-8")), filename)}, headers=headers)
+
+
+def imported(model, fields):
+  # the listed row and its imported copy, as the columns both should share
+  rows = model.query.order_by(model.id).all()
+  return [{field: getattr(row, field) for field in fields} for row in rows]
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_exports_import_back_as_they_were(listed, client, format):
+  for table, model, fields in (
+    ("venues", Venue, ("name", "city", "state", "address", "phone", "genres", "facebook_link",
+                       "seeking_talent", "seeking_description")),
+    ("artists", Artist, ("name", "city", "state", "phone", "genres", "facebook_link", "seeking_venue")),
+    ("shows", Show, ("venue_id", "artist_id", "start_time")),
+  ):
+    exported = client.get(f"/export/{table}?format={format}")
+    assert exported.status_code == 200
+    response = upload(client, table, exported.get_data(as_text=True), f"{table}.{format}")
+    assert response.status_code == 200
+    assert response.get_json() == {"rows": 1, "inserted": 1, "failed": 0, "errors": []}
+    original, copy = imported(model, fields)
+    assert copy == original
+
+  db.session.expire_all()
+  assert Venue.query.get(listed["venue"]).upcoming_shows_count == 2
+
+
+def test_rejected_rows_are_reported_by_line(listed, client):
+  records = "\n".join([
+    json.dumps({"venue_id": listed["venue"], "artist_id": listed["artist"], "start_time": "2030-06-01 20:00:00"}),
+    json.dumps({"venue_id": 9999, "artist_id": listed["artist"], "start_time": "2030-06-01 20:00:00"}),
+    "{not json",
+    json.dumps({"venue_id": listed["venue"], "artist_id": listed["artist"], "start_time": "next friday"}),
+  ])
+  report = upload(client, "shows", records, "shows.ndjson").get_json()
+  assert (report["rows"], report["inserted"], report["failed"]) == (4, 1, 3)
+  assert [error["line"] for error in report["errors"]] == [2, 3, 4]
+  assert "unknown venue_id 9999" in json.dumps(report["errors"][0])
+  assert "invalid JSON" in json.dumps(report["errors"][1])
+  assert "start_time" in report["errors"][2]["errors"]
+
+
+def test_shows_can_name_their_venue_and_artist(listed, client):
+  db.session.add(Venue(name="The Dueling Pianos Bar", city="New York", state="NY"))
+  db.session.commit()
+  output = io.StringIO()
+  writer = csv.writer(output)
+  writer.writerow(["venue_name", "artist_name", "start_time"])
+  writer.writerow(["The Dueling Pianos Bar", "Guns N Petals", "2030-06-01 20:00:00"])
+  writer.writerow(["The Musical Hop", "Guns N Petals", "2030-06-01 20:00:00"])
+  writer.writerow(["", "Guns N Petals", "2030-06-01 20:00:00"])
+
+  report = upload(client, "shows", output.getvalue(), "shows.csv").get_json()
+  assert (report["inserted"], report["failed"]) == (2, 1)
+  assert "venue_id or venue_name is required" in json.dumps(report["errors"])
+  assert Show.query.filter_by(venue_id=listed["venue"]).count() == 2
+
+  db.session.add(Venue(name="The Musical Hop", city="New York", state="NY"))
+  db.session.commit()
+  report = upload(client, "shows", output.getvalue(), "shows.csv").get_json()
+  assert (report["inserted"], report["failed"]) == (1, 2)
+  assert "ambiguous" in json.dumps(report["errors"])
+
+
+def test_exports_can_start_at_an_update_time(listed, client):
+  Venue.query.update({"updated_at": datetime(2020, 1, 1)}, synchronize_session=False)
+  db.session.add(Venue(name="Park Square Live Music & Coffee", city="San Francisco", state="CA"))
+  db.session.commit()
+  since = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+
+  lines = client.get(f"/export/venues?updated_since={since}").get_data(as_text=True).splitlines()
+  assert [json.loads(line)["name"] for line in lines] == ["Park Square Live Music & Coffee"]
+  assert client.get("/export/venues?updated_since=yesterday").status_code == 400
+  assert client.get(f"/export/shows?updated_since={since}").status_code == 400
+
+
+def test_imports_need_the_token(listed, client, app):
+  record = json.dumps({"venue_id": listed["venue"], "artist_id": listed["artist"], "start_time": "2030-06-01 20:00:00"})
+  assert upload(client, "shows", record, "shows.ndjson", token=None).status_code == 401
+  assert upload(client, "shows", record, "shows.ndjson", token="guess").status_code == 401
+  app.config["IMPORT_TOKEN"] = None
+  assert upload(client, "shows", record, "shows.ndjson").status_code == 401
+  assert Show.query.count() == 1
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from models import Artist, Show, Venue, db
+
+
+def add_venues(areas, per_area=3):
+  artist = Artist(name="The Wild Sax Band", city="San Francisco", state="CA", genres=["Jazz"])
+  db.session.add(artist)
+  for area in range(areas):
+    for number in range(per_area):
+      venue = Venue(name=f"Hall {area}-{number}", city=f"City {area}", state="CA", genres=["Jazz"])
+      db.session.add(venue)
+      db.session.flush()
+      db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.utcnow() + timedelta(days=1)))
+  db.session.commit()
+
+
+def test_directory_statements_do_not_grow_with_areas(client, statements):
+  add_venues(1)
+  del statements[:]
+  response = client.get("/venues")
+  assert response.status_code == 200
+  one_area = len(statements)
+
+  add_venues(24)
+  del statements[:]
+  response = client.get("/venues")
+  assert response.status_code == 200
+  assert b"City 23" in response.data
+  assert len(statements) == one_area
+
+
+def test_directory_counts_upcoming_shows(client):
+  add_venues(2, per_area=2)
+  directory = Venue.directory()
+  assert [(area["city"], len(area["venues"])) for area in directory] == [("City 0", 2), ("City 1", 2)]
+  assert all(venue["num_upcoming_shows"] == 1 for area in directory for venue in area["venues"])
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from flask import current_app, request
+
+from extensions import search_service
+from models import Artist, Show, Venue, db, latest
+
+#----------------------------------------------------------------------------#
+# Blueprints.
+#----------------------------------------------------------------------------#
+
+# One blueprint per part of the site. Their endpoints are prefixed with the
+# blueprint name, e.g. url_for("venues.show_venue", venue_id=1).
+
+def register_blueprints(app):
+  from views.api import api
+  from views.artists import artists
+  from views.main import main
+  from views.shows import shows
+  from views.transfer import transfer
+  from views.venues import venues
+  for blueprint in (main, venues, artists, shows, api, transfer):
+    app.register_blueprint(blueprint)
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_entities(model, term):
+  # ranked matches with their upcoming show counts; the result window is
+  # requested by the search form and capped by SEARCH_RESULTS_LIMIT
+  max_limit = current_app.config.get("SEARCH_RESULTS_LIMIT", 50)
+  limit = max(min(request.values.get("limit", max_limit, type=int), max_limit), 1)
+  offset = max(request.values.get("offset", 0, type=int), 0)
+
+  base = db.session.query(
+    model.id,
+    model.name,
+    model.upcoming_shows_count.label("num_upcoming_shows")
+  )
+
+  count, rows = search_service.search(
+    model,
+    base,
+    term,
+    city=request.values.get("city"),
+    state=request.values.get("state"),
+    genre=request.values.get("genre"),
+    limit=limit,
+    offset=offset
+  )
+  return {
+    "count": count,
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "num_of_upcoming_shows": row.num_upcoming_shows
+    } for row in rows]
+  }
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+# Fingerprints of the read-only pages, each one aggregate query that is much
+# cheaper than rendering. A show passing its start time changes a detail page
+# as much as an edit does, so the latest passed show counts towards
+# Last-Modified.
+
+def detail_fingerprint(model, entity_id, show_key, counterpart, counterpart_key):
+  now = datetime.utcnow()
+  row = db.session.query(
+    model.updated_at,
+    db.func.max(counterpart.updated_at).label("counterparts_updated_at"),
+    db.func.count(Show.id).label("shows"),
+    db.func.max(Show.id).label("last_show_id"),
+    db.func.max(db.case((Show.start_time <= now, Show.start_time))).label("last_passed")
+  ).outerjoin(Show, show_key == model.id).outerjoin(
+    counterpart, counterpart_key == counterpart.id
+  ).filter(model.id == entity_id).group_by(model.id).first()
+  if row is None:
+    return None
+  return tuple(row), latest(row.updated_at, row.counterparts_updated_at, row.last_passed)
+
+def venue_fingerprint(venue_id):
+  return detail_fingerprint(Venue, venue_id, Show.venue_id, Artist, Show.artist_id)
+
+def artist_fingerprint(artist_id):
+  return detail_fingerprint(Artist, artist_id, Show.artist_id, Venue, Show.venue_id)
+
+def listing_fingerprint(model):
+  row = db.session.query(
+    db.func.count(model.id),
+    db.func.max(model.id),
+    db.func.max(model.updated_at)
+  ).one()
+  return tuple(row), row[2]
+
+def shows_fingerprint():
+  row = db.session.query(
+    db.func.count(Show.id),
+    db.func.max(Show.id),
+    db.session.query(db.func.max(Venue.updated_at)).scalar_subquery(),
+    db.session.query(db.func.max(Artist.updated_at)).scalar_subquery()
+  ).one()
+  return tuple(row), latest(row[2], row[3])
@@ -0,0 +1,123 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from database import read_replica
+from diagnostics import query_budget
+from models import Artist, Show, Venue, db
+from pagination import paginate
+from streaming import dumps, json_page
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+ENTITY_FIELDS = (
+  "id", "name", "city", "state", "phone", "genres", "image_link", "website",
+  "facebook_link", "seeking_description", "created_at", "updated_at"
+)
+
+# Columns a client may select with ?fields=a,b per resource. A page is one
+# query selecting only those columns (plus the sort key), encoded row by row.
+API_FIELDS = {
+  "venues": {
+    **{name: getattr(Venue, name) for name in ENTITY_FIELDS},
+    "address": Venue.address,
+    "seeking_talent": Venue.seeking_talent
+  },
+  "artists": {
+    **{name: getattr(Artist, name) for name in ENTITY_FIELDS},
+    "seeking_venue": Artist.seeking_venue
+  },
+  "shows": {
+    "id": Show.id,
+    "start_time": Show.start_time,
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name.label("venue_name"),
+    "venue_image_link": Venue.image_link.label("venue_image_link"),
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name.label("artist_name"),
+    "artist_image_link": Artist.image_link.label("artist_image_link")
+  }
+}
+
+def api_error(status, message):
+  return jsonify({"error": {"status": status, "message": message}}), status
+
+def requested_fields(available):
+  # raises ValueError on fields the resource does not have
+  fields = request.args.get("fields")
+  if not fields:
+    return list(available)
+  fields = [field.strip() for field in fields.split(",") if field.strip()]
+  unknown = [field for field in fields if field not in available]
+  if unknown:
+    raise ValueError(f"unknown fields: {', '.join(unknown)}")
+  return fields
+
+def api_page(resource, sort_columns, descending=False, joins=()):
+  available = API_FIELDS[resource]
+  try:
+    fields = requested_fields(available)
+  except ValueError as error:
+    return api_error(400, str(error))
+  max_limit = current_app.config.get("API_MAX_PAGE_SIZE", 500)
+  limit = max(min(request.args.get("limit", current_app.config.get("API_PAGE_SIZE", 50), type=int), max_limit), 1)
+
+  selected = list(dict.fromkeys(fields + [column.key for column in sort_columns]))
+  query = db.session.query(*(available[name] for name in selected))
+  for target, onclause in joins:
+    query = query.join(target, onclause)
+  query = query.order_by(*(column.desc() if descending else column for column in sort_columns))
+  try:
+    rows, next_cursor = paginate(query, sort_columns, request.args.get("cursor"), limit, descending)
+  except ValueError:
+    return api_error(400, "invalid cursor")
+
+  items = ({name: getattr(row, name) for name in fields} for row in rows)
+  return Response(json_page(items, next_cursor=next_cursor), mimetype="application/json")
+
+def api_entity(entity):
+  if entity is None:
+    return api_error(404, "not found")
+  try:
+    fields = requested_fields(entity)
+  except ValueError as error:
+    return api_error(400, str(error))
+  return Response(dumps({name: entity[name] for name in fields}), mimetype="application/json")
+
+@api.route('/venues')
+@query_budget(1)
+@read_replica
+def api_venues():
+  return api_page("venues", (Venue.id,))
+
+@api.route('/venues/<int:venue_id>')
+@query_budget(1)
+@read_replica
+def api_venue(venue_id):
+  return api_entity(Venue.detail(venue_id))
+
+@api.route('/artists')
+@query_budget(1)
+@read_replica
+def api_artists():
+  return api_page("artists", (Artist.id,))
+
+@api.route('/artists/<int:artist_id>')
+@query_budget(1)
+@read_replica
+def api_artist(artist_id):
+  return api_entity(Artist.detail(artist_id))
+
+@api.route('/shows')
+@query_budget(1)
+@read_replica
+def api_shows():
+  # newest first, like /shows
+  return api_page(
+    "shows",
+    (Show.start_time, Show.id),
+    descending=True,
+    joins=((Venue, Show.venue_id == Venue.id), (Artist, Show.artist_id == Artist.id))
+  )
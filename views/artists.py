@@ -0,0 +1,218 @@
+import json
+import re
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from sqlalchemy.dialects.postgresql import array
+
+from conditional import conditional
+from database import read_replica
+from diagnostics import query_budget
+from extensions import jobs, response_cache
+from forms import ArtistFilterForm, ArtistForm
+from models import Artist, db
+from pagination import paginate
+from views import artist_fingerprint, listing_fingerprint, search_entities
+
+artists = Blueprint('artists', __name__, url_prefix='/artists')
+
+#  ----------------------------------------------------------------
+#  Artists
+#  ----------------------------------------------------------------
+@artists.route('')
+@query_budget(2)
+@read_replica
+@conditional(lambda: listing_fingerprint(Artist))
+@response_cache.cached("artists")
+def index():
+  form, artists, next_cursor = artist_directory()
+  return render_template(
+    'pages/artists.html',
+    form=form,
+    artists=artists,
+    filters=artist_filters(),
+    next_cursor=next_cursor
+  )
+
+@artists.route('/page')
+@query_budget(2)
+@read_replica
+@conditional(lambda: listing_fingerprint(Artist))
+@response_cache.cached("artists-page")
+def artist_items():
+  # the next page of /artists as list items, appended by the infinite scroll
+  form, artists, next_cursor = artist_directory()
+  return render_template(
+    'pages/artist_items.html',
+    artists=artists,
+    filters=artist_filters(),
+    next_cursor=next_cursor
+  )
+
+def artist_filters():
+  # the filters in the query string, carried over to the next page's links
+  return {key: value for key, value in request.args.items() if key != "cursor" and value}
+
+def artist_directory():
+  # names of the artists matching the filters, keyset paged on (name, id)
+  form = ArtistFilterForm(request.args)
+  if not form.validate():
+    abort(400)
+
+  query = db.session.query(Artist.id, Artist.name)
+  if form.city.data:
+    query = query.filter(Artist.city == form.city.data)
+  if form.state.data:
+    query = query.filter(Artist.state == form.state.data)
+  if form.genre.data:
+    query = query.filter(has_genre(form.genre.data))
+  if form.seeking_venue.data:
+    query = query.filter(Artist.seeking_venue.is_(True))
+  query = query.order_by(Artist.name, Artist.id)
+
+  try:
+    artists, next_cursor = paginate(
+      query,
+      (Artist.name, Artist.id),
+      request.args.get("cursor"),
+      current_app.config.get("ARTISTS_PER_PAGE", 50)
+    )
+  except ValueError:
+    abort(400)
+  return form, artists, next_cursor
+
+def has_genre(genre):
+  # @> rather than ANY() so that the GIN index on genres applies; elsewhere
+  # (SQLite) genres are JSON text, searched for the quoted genre
+  if db.engine.dialect.name == "postgresql":
+    return Artist.genres.op("@>")(array([genre]))
+  quoted = re.sub(r"([\\%_])", r"\\\1", json.dumps(genre))
+  return db.cast(Artist.genres, db.Text).like(f"%{quoted}%", escape="\\")
+
+@artists.route('/search', methods=['POST'])
+@query_budget(3)
+def search_artists():
+  term = request.form.get("search_term", " ")
+  response = search_entities(Artist, term)
+
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@artists.route('/<int:artist_id>')
+@query_budget(2)
+@read_replica
+@conditional(artist_fingerprint)
+@response_cache.cached("artist:{artist_id}")
+def show_artist(artist_id):
+  # shows the venue page with the given venue_id
+  artist = Artist.detail(artist_id)
+  if artist is None:
+    abort(404)
+  return render_template("pages/show_artist.html", artist=artist)
+
+#  ----------------------------------------------------------------
+#  Update
+#  ----------------------------------------------------------------
+@artists.route('/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  form = ArtistForm()
+  artist = Artist.detail(artist_id)
+  if artist is None:
+    abort(404)
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@artists.route('/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  form = ArtistForm(request.form)
+  try:
+      artist = Artist.query.filter_by(id = artist_id).first()
+
+      artist.name = form.name.data
+      artist.city = form.city.data
+      artist.state = form.state.data
+      artist.phone = form.phone.data
+      artist.genres = form.genres.data
+      artist.facebook_link = form.facebook_link.data
+      if "image_link" in request.form:
+        artist.image_link = form.image_link.data or None
+      artist.seeking_venue = form.seeking_venue.data
+      artist.seeking_description = form.seeking_description.data
+
+      artist.updated_at = datetime.utcnow()
+
+      jobs.enqueue("refresh_search", model="Artist")
+      jobs.enqueue("invalidate_pages", artist_id=artist_id)
+      if artist.image_link and db.inspect(artist).attrs.image_link.history.has_changes():
+        jobs.enqueue("validate_image_link", model="Artist", id=artist_id)
+      db.session.commit()
+      # on successful db insert, flash success
+      flash('Artist ' + request.form['name'] + ' was succesfully edited!')
+  except:
+      flash('An error occurred. Artist ' +
+            request.form['name'] + "could not be listed")
+      db.session.rollback()
+  finally:
+      db.session.close()
+  
+  return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+@artists.route('/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  try:
+      artist = Artist.query.get(artist_id)
+      db.session.delete(artist)
+      jobs.enqueue("refresh_search", model="Artist")
+      jobs.enqueue("invalidate_pages", artist_id=int(artist_id))
+      db.session.commit()
+      flash('artist was successfully deleted!')
+  except:
+      flash("An error occurred. artist could not be deleted")
+      db.session.rollback()
+  finally:
+      db.session.close()
+  return render_template('pages/home.html')
+
+#  ----------------------------------------------------------------
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artists.route('/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@artists.route('/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  form = ArtistForm(request.form)
+  try:
+      new_artist = Artist(
+        name=request.form["name"],
+        city=request.form["city"],
+        state=request.form["state"],
+        phone=request.form["phone"],
+        genres=request.form.getlist("genres"),
+        facebook_link=request.form["facebook_link"],
+        image_link=request.form.get("image_link") or None,
+        
+        seeking_venue=form["seeking_venue"].data,
+        seeking_description=request.form["seeking_description"]
+      )
+
+      db.session.add(new_artist)
+      if new_artist.image_link:
+        # the job names the artist by id
+        db.session.flush()
+        jobs.enqueue("validate_image_link", model="Artist", id=new_artist.id)
+      jobs.enqueue("refresh_search", model="Artist")
+      jobs.enqueue("invalidate_pages", keys=["artists", "artists-page"])
+      db.session.commit()
+      # on successful db insert, flash success
+      flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  except:
+      flash('An error occurred. Venue ' +
+            request.form['name'] + "could not be listed")
+      db.session.rollback()
+  finally:
+      db.session.close()
+
+  return render_template('pages/home.html')
@@ -0,0 +1,37 @@
+from flask import Blueprint, Response, jsonify, render_template
+
+from compression import no_compression
+from extensions import fragment_cache, request_metrics, response_cache
+from metrics import render_stats
+
+main = Blueprint('main', __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@main.route('/')
+def index():
+  return render_template('pages/home.html')
+
+@main.route('/cache/stats')
+def cache_stats():
+  return jsonify({**response_cache.stats(), "fragments": fragment_cache.stats()})
+
+@main.route('/metrics')
+@no_compression
+def metrics():
+  # Prometheus text format, per worker process
+  text = request_metrics.render() + "\n".join([
+    render_stats("fyyur_response_cache", response_cache.stats(), "Response cache statistic of this worker."),
+    render_stats("fyyur_fragment_cache", fragment_cache.stats(), "Fragment cache statistic of this worker.")
+  ]) + "\n"
+  return Response(text, mimetype="text/plain; version=0.0.4")
+
+@main.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@main.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,88 @@
+from flask import Blueprint, abort, current_app, flash, render_template, request
+
+from conditional import conditional
+from database import read_replica
+from diagnostics import query_budget
+from extensions import jobs, response_cache
+from forms import ShowForm
+from models import Artist, Show, Venue, db
+from pagination import paginate
+from views import shows_fingerprint
+
+shows = Blueprint('shows', __name__, url_prefix='/shows')
+
+#  ----------------------------------------------------------------
+#  Shows
+#  ----------------------------------------------------------------
+
+@shows.route('')
+@query_budget(2)
+@read_replica
+@conditional(shows_fingerprint)
+@response_cache.cached("shows")
+def index():
+  # one joined query for the columns the tiles need, paged on (start_time, id)
+  query = db.session.query(
+    Show.id,
+    Show.start_time,
+    Show.venue_id,
+    Venue.name.label("venue_name"),
+    Venue.updated_at.label("venue_updated_at"),
+    Show.artist_id,
+    Artist.name.label("artist_name"),
+    Artist.image_link.label("artist_image_link"),
+    Artist.updated_at.label("artist_updated_at")
+  ).join(Venue, Show.venue_id == Venue.id).join(
+    Artist, Show.artist_id == Artist.id
+  ).order_by(Show.start_time.desc(), Show.id.desc())
+
+  try:
+    shows, next_cursor = paginate(
+      query,
+      (Show.start_time, Show.id),
+      request.args.get("cursor"),
+      current_app.config.get("SHOWS_PER_PAGE", 50),
+      descending=True
+    )
+  except ValueError:
+    abort(400)
+  return render_template('pages/shows.html', shows=shows, next_cursor=next_cursor)
+
+@shows.route('/create')
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@shows.route('/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  form = ShowForm(request.form)
+  if not form.validate():
+      # start_time is parsed by the form, the column takes no strings
+      flash('An error occurred. Show could not be listed.')
+      return render_template('pages/home.html')
+  try:
+      new_show = Show(
+        artist_id=form.artist_id.data,
+        venue_id=form.venue_id.data,
+        start_time=form.start_time.data
+      )
+
+      # inserting counts the show on its venue and artist, see count_shows
+      db.session.add(new_show)
+      jobs.enqueue("invalidate_pages", keys=[
+        "shows",
+        "venues",
+        f"venue:{new_show.venue_id}",
+        f"artist:{new_show.artist_id}"
+      ])
+      db.session.commit()
+      # on successful db insert, flash success
+      flash('Show was successfully listed!')
+  except:
+      flash('An error occurred. Show could not be listed.')
+      db.session.rollback()
+  finally:
+      db.session.close()
+  return render_template('pages/home.html')
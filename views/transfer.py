@@ -0,0 +1,208 @@
+import hmac
+import io
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+
+from database import read_replica
+from extensions import jobs, response_cache, search_service
+from forms import ArtistForm, ShowForm, VenueForm
+from importer import Importer, read_records
+from models import Artist, Show, Venue, count_shows, db
+from streaming import FORMATS
+
+transfer = Blueprint('transfer', __name__)
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+EXPORT_MODELS = {"venues": Venue, "artists": Artist, "shows": Show}
+
+def parse_since(value):
+  # ISO date or datetime, converted to naive UTC like the updated_at columns
+  if not value:
+    return None
+  try:
+    since = datetime.fromisoformat(value)
+  except ValueError:
+    raise ValueError(f"updated_since must be an ISO date or datetime, got {value!r}")
+  if since.tzinfo is not None:
+    since = since.astimezone(timezone.utc).replace(tzinfo=None)
+  return since
+
+def export_rows(table, updated_since=None):
+  # column names and a query streaming every row of the table from a server
+  # side cursor, EXPORT_BATCH_SIZE rows at a time
+  model = EXPORT_MODELS[table]
+  columns = [getattr(model, column.key) for column in model.__table__.columns if column.key != "search_vector"]
+  query = db.session.query(*columns).order_by(model.id)
+  if updated_since is not None:
+    if not hasattr(model, "updated_at"):
+      raise ValueError(f"{table} have no updated_at column, export them in full")
+    query = query.filter(model.updated_at >= updated_since)
+  batch_size = current_app.config.get("EXPORT_BATCH_SIZE", 1000)
+  return [column.key for column in columns], query.execution_options(stream_results=True).yield_per(batch_size)
+
+@transfer.route('/export/<table>')
+@read_replica
+def export(table):
+  format = request.args.get("format", "ndjson")
+  if table not in EXPORT_MODELS or format not in FORMATS:
+    abort(404)
+  try:
+    columns, rows = export_rows(table, parse_since(request.args.get("updated_since")))
+  except ValueError as error:
+    return jsonify({"error": str(error)}), 400
+
+  lines, mimetype = FORMATS[format]
+  return Response(
+    stream_with_context(lines(columns, rows)),
+    mimetype=mimetype,
+    headers={"Content-Disposition": f"attachment; filename={table}.{format}"}
+  )
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+class LinkCheckingImporter(Importer):
+  # imported image links are checked off the request like those of the
+  # forms; the rows carry no ids, so they are looked up by link
+
+  def after_batch(self, rows):
+    links = {row["image_link"] for row in rows if row.get("image_link")}
+    if not links:
+      return
+    ids = self.session.query(self.table.c.id).filter(self.table.c.image_link.in_(links))
+    for row in ids:
+      jobs.enqueue("validate_image_link", model=self.table.name, id=row.id)
+
+class VenueImporter(LinkCheckingImporter):
+  form_class = VenueForm
+  fields = (
+    "name", "city", "state", "address", "phone", "image_link", "genres",
+    "facebook_link", "seeking_talent", "seeking_description"
+  )
+
+class ArtistImporter(LinkCheckingImporter):
+  form_class = ArtistForm
+  fields = (
+    "name", "city", "state", "phone", "image_link", "genres",
+    "facebook_link", "seeking_venue", "seeking_description"
+  )
+
+class ShowImporter(Importer):
+  # shows name their venue and artist by id, or by name when that is unique
+  form_class = ShowForm
+
+  def formdata(self, record):
+    # exports write ISO datetimes, the form reads "%Y-%m-%d %H:%M:%S"
+    start_time = record.get("start_time")
+    if isinstance(start_time, str) and "T" in start_time:
+      try:
+        start_time = datetime.fromisoformat(start_time).strftime("%Y-%m-%d %H:%M:%S")
+        record = dict(record, start_time=start_time)
+      except ValueError:
+        pass
+    return super().formdata(record)
+
+  def begin_batch(self, records):
+    self.venues = self.references(Venue, "venue", records)
+    self.artists = self.references(Artist, "artist", records)
+
+  def references(self, model, prefix, records):
+    # the batch's referenced ids that exist, and ids by name, in two queries
+    ids, names = set(), set()
+    for record in records:
+      value = record.get(f"{prefix}_id")
+      if value not in (None, ""):
+        try:
+          ids.add(int(value))
+        except (TypeError, ValueError):
+          pass
+      elif record.get(f"{prefix}_name"):
+        names.add(record[f"{prefix}_name"])
+    existing = set()
+    if ids:
+      existing = {row.id for row in db.session.query(model.id).filter(model.id.in_(ids))}
+    by_name = {}
+    if names:
+      for row in db.session.query(model.id, model.name).filter(model.name.in_(names)):
+        by_name.setdefault(row.name, []).append(row.id)
+    return existing, by_name
+
+  def resolve(self, references, prefix, record):
+    existing, by_name = references
+    value = record.get(f"{prefix}_id")
+    if value not in (None, ""):
+      try:
+        entity_id = int(value)
+      except (TypeError, ValueError):
+        raise ValueError(f"{prefix}_id must be an integer")
+      if entity_id not in existing:
+        raise ValueError(f"unknown {prefix}_id {entity_id}")
+      return entity_id
+    name = record.get(f"{prefix}_name")
+    if not name:
+      raise ValueError(f"{prefix}_id or {prefix}_name is required")
+    matches = by_name.get(name, [])
+    if not matches:
+      raise ValueError(f"unknown {prefix} {name!r}")
+    if len(matches) > 1:
+      raise ValueError(f"{prefix} name {name!r} is ambiguous, give its {prefix}_id")
+    return matches[0]
+
+  def values(self, form, record):
+    return {
+      "venue_id": self.resolve(self.venues, "venue", record),
+      "artist_id": self.resolve(self.artists, "artist", record),
+      "start_time": form.start_time.data,
+      "is_past": form.start_time.data <= datetime.utcnow()
+    }
+
+  def after_batch(self, rows):
+    # rows are inserted without the ORM, so its events do not count them
+    count_shows(db.session.connection(), rows)
+
+IMPORTERS = {
+  "venues": (VenueImporter, Venue),
+  "artists": (ArtistImporter, Artist),
+  "shows": (ShowImporter, Show)
+}
+
+def import_format(filename):
+  extension = (filename or "").rsplit(".", 1)[-1].lower()
+  return {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(extension)
+
+def run_import(table, stream, format):
+  importer_class, model = IMPORTERS[table]
+  importer = importer_class(db.session, model.__table__, batch_size=current_app.config.get("IMPORT_BATCH_SIZE", 1000))
+  report = importer.run(read_records(stream, format))
+  if report.inserted:
+    search_service.invalidate(model)
+    response_cache.clear()
+  return report
+
+def import_authorized():
+  # a bearer token rather than a session: uploads come from scripts, and a
+  # page elsewhere can not make a browser send the header
+  token = current_app.config.get("IMPORT_TOKEN")
+  scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+  return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(given.encode("utf-8"), token.encode("utf-8"))
+
+@transfer.route('/import/<table>', methods=['POST'])
+def import_upload(table):
+  if table not in IMPORTERS:
+    abort(404)
+  if not import_authorized():
+    return jsonify({"error": "send the IMPORT_TOKEN setting as a bearer token"}), 401, {"WWW-Authenticate": "Bearer"}
+  upload = request.files.get("file")
+  if upload is None:
+    return jsonify({"error": "upload the records as the file field"}), 400
+  format = request.form.get("format") or import_format(upload.filename)
+  if format not in ("csv", "ndjson"):
+    return jsonify({"error": "format must be csv or ndjson"}), 400
+
+  report = run_import(table, io.TextIOWrapper(upload.stream, encoding="utf-8", newline=""), format)
+  return jsonify(report.to_dict())
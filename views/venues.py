@@ -0,0 +1,159 @@
+from datetime import datetime
+
+from flask import Blueprint, abort, flash, jsonify, redirect, render_template, request, url_for
+
+from conditional import conditional
+from database import read_replica
+from diagnostics import query_budget
+from extensions import jobs, response_cache
+from forms import VenueForm
+from models import Venue, db
+from views import listing_fingerprint, search_entities, venue_fingerprint
+
+venues = Blueprint('venues', __name__, url_prefix='/venues')
+
+#  ----------------------------------------------------------------
+#  Venues
+#  ----------------------------------------------------------------
+
+@venues.route('')
+@query_budget(2)
+@read_replica
+@conditional(lambda: listing_fingerprint(Venue))
+@response_cache.cached("venues")
+def index():
+  areas = Venue.directory()
+  return render_template('pages/venues.html', areas=areas, raw=str(areas))
+
+
+@venues.route('/search', methods=['POST'])
+@query_budget(3)
+def search_venues():
+  term = request.form.get("search_term", " ")
+  response = search_entities(Venue, term)
+
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@venues.route('/<int:venue_id>')
+@query_budget(2)
+@read_replica
+@conditional(venue_fingerprint)
+@response_cache.cached("venue:{venue_id}")
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  venue = Venue.detail(venue_id)
+  if venue is None:
+    abort(404)
+  return render_template('pages/show_venue.html', venue=venue)
+
+#  ----------------------------------------------------------------
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@venues.route('/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@venues.route('/create', methods=['POST'])
+def create_venue_submission():
+  form = VenueForm(request.form)
+
+  try:
+      new_venue = Venue(
+        name=request.form["name"],
+        city=request.form["city"],
+        state=request.form["state"],
+        address=request.form["address"],
+        phone=request.form["phone"],
+        genres=request.form.getlist("genres"),
+        facebook_link=request.form["facebook_link"],
+        image_link=request.form.get("image_link") or None,
+        seeking_talent=form["seeking_talent"].data,
+        seeking_description=request.form["seeking_description"]
+      )
+
+      db.session.add(new_venue)
+      if new_venue.image_link:
+        # the job names the venue by id
+        db.session.flush()
+        jobs.enqueue("validate_image_link", model="Venue", id=new_venue.id)
+      jobs.enqueue("refresh_search", model="Venue")
+      jobs.enqueue("invalidate_pages", keys=["venues"])
+      db.session.commit()
+      # on successful db insert, flash success
+      flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  except:
+      flash('An error occurred. Venue ' +
+            request.form['name'] + " could not be listed")
+      db.session.rollback()
+  finally:
+      db.session.close()
+  return render_template('pages/home.html')
+
+
+@venues.route('/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  try:
+      venue = Venue.query.get(venue_id)
+      db.session.delete(venue)
+      jobs.enqueue("refresh_search", model="Venue")
+      jobs.enqueue("invalidate_pages", venue_id=int(venue_id))
+      db.session.commit()
+      flash('Venue was successfully deleted!')
+      jsonify({ "error": None, "data": "ok" })
+  except:
+      flash("An error occurred. Venue could not be deleted")
+      db.session.rollback()
+      jsonify({ "error": 400, "data": None })
+  finally:
+      db.session.close()
+  return render_template('pages/home.html')
+
+#  ----------------------------------------------------------------
+#  Update
+#  ----------------------------------------------------------------
+
+@venues.route('/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  form = VenueForm()
+  venue = Venue.detail(venue_id)
+  if venue is None:
+    abort(404)
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@venues.route('/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  form = VenueForm(request.form)
+  try:
+      venue = Venue.query.get(venue_id)
+
+      venue.name = form.name.data
+      venue.city = form.city.data
+      venue.state = form.state.data
+      venue.address = form.address.data
+      venue.phone = form.phone.data
+      venue.genres = form.genres.data
+      venue.facebook_link = form.facebook_link.data
+      if "image_link" in request.form:
+        venue.image_link = form.image_link.data or None
+      venue.seeking_talent = form.seeking_talent.data
+      venue.seeking_description = form.seeking_description.data
+
+      venue.updated_at = datetime.utcnow()
+
+      jobs.enqueue("refresh_search", model="Venue")
+      jobs.enqueue("invalidate_pages", venue_id=venue_id)
+      if venue.image_link and db.inspect(venue).attrs.image_link.history.has_changes():
+        jobs.enqueue("validate_image_link", model="Venue", id=venue_id)
+      db.session.commit()
+      # on successful db insert, flash success
+      flash('Venue ' + request.form['name'] + ' was succesfully edited!')
+  except:
+      flash('An error occurred. Venue ' +
+            request.form['name'] + "could not be listed")
+      db.session.rollback()
+  finally:
+      db.session.close()
+  
+  return redirect(url_for('venues.show_venue', venue_id=venue_id))
@@ -0,0 +1,4 @@
+from app import create_app
+
+# the app an application server runs, `gunicorn wsgi:app`; see gunicorn.conf.py
+app = create_app()